@@ -2,12 +2,15 @@
 API routes for the course recommendation system
 """
 
+import asyncio
+import json
 import logging
 import os
-from pathlib import Path
-from fastapi import APIRouter, HTTPException, Depends, Request
-from fastapi.responses import FileResponse
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request, Query
+from fastapi.responses import Response, StreamingResponse
+from groq import RateLimitError
+from starlette.background import BackgroundTask
+from typing import List, Optional
 
 from models.schemas import (
     NextQuestionRequest, 
@@ -20,9 +23,13 @@ from models.schemas import (
     ErrorResponse,
     Question
 )
+from services.circuit_breaker import CircuitOpenError
 from services.groq_service import GroqService
+from services.tts_service import AUDIO_FORMATS, TTSService
 from services.session_service import session_manager
 from utils.course_data import course_manager
+from utils.http_cache import etag_matches
+from utils.static_files import StaticFile
 from config.settings import get_settings
 
 # Set up logging
@@ -33,9 +40,25 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Dependency to get services
-def get_groq_service() -> GroqService:
-    """Dependency to get Groq service instance"""
-    return GroqService()
+def get_groq_service(request: Request) -> GroqService:
+    """Dependency to get the shared Groq service instance created at startup"""
+    groq_service = getattr(request.app.state, "groq_service", None)
+    if groq_service is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Groq service is not available"
+        )
+    return groq_service
+
+def get_tts_service(request: Request) -> TTSService:
+    """Dependency to get the shared text to speech service created at startup"""
+    tts_service = getattr(request.app.state, "tts_service", None)
+    if tts_service is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Text to speech is not available"
+        )
+    return tts_service
 
 def get_settings_dependency():
     """Dependency to get settings"""
@@ -58,14 +81,14 @@ async def get_next_question(
     """
     try:
         # Get or create session
-        session_id = request.user_id or session_manager.create_session(request.user_id)
+        session_id = request.user_id or await session_manager.create_session_async(request.user_id)
         
         # Update session with current conversation history if provided
         if request.conversation_history:
-            session_manager.update_session_history(session_id, request.conversation_history)
+            await session_manager.update_session_history_async(session_id, request.conversation_history)
         
         # Get conversation history from session
-        conversation_history = session_manager.get_conversation_history(session_id)
+        conversation_history = await session_manager.get_conversation_history_async(session_id)
         
         # Check if we should provide a recommendation instead of another question
         if groq_service.should_recommend(conversation_history):
@@ -84,9 +107,11 @@ async def get_next_question(
                 detail=f"Maximum number of questions ({settings.max_questions}) reached. Please proceed to get recommendations."
             )
         
-        # Add some processing delay for better UX (simulate AI thinking)
-        import asyncio
-        await asyncio.sleep(0.5)
+        # Pacing is a client-side hint; only demos hold the request open
+        suggested_min_display_ms = settings.question_pacing_ms
+        if settings.server_side_pacing:
+            await asyncio.sleep(settings.question_pacing_ms / 1000)
+            suggested_min_display_ms = 0
         
         # Generate next question using tree navigation
         question = groq_service.generate_next_question(conversation_history, question_number)
@@ -96,7 +121,8 @@ async def get_next_question(
             question=question,
             question_number=question_number,
             total_questions_planned=min(settings.max_questions, question_number + 5),  # Dynamic planning
-            session_id=session_id
+            session_id=session_id,
+            suggested_min_display_ms=suggested_min_display_ms
         )
         
         logger.info(f"Generated question {question_number} for session {session_id}")
@@ -150,23 +176,38 @@ async def get_course_recommendation(
                 detail="No courses available for recommendation"
             )
         
-        # Generate recommendation using tree navigation
-        recommendation_data = groq_service.generate_course_recommendation(
-            request.conversation_history, 
-            available_courses
+        # Rebuilt in the background after the catalog changes, meanwhile the previous index is used
+        similarity_index = course_manager.get_similarity_index()
+        
+        # Complete leaf paths have a prerendered response
+        body = groq_service.get_prerendered_recommendation(
+            request.conversation_history,
+            available_courses,
+            similarity_index
         )
         
         # Get session if user_id provided
         if request.user_id:
-            session_manager.update_session_history(request.user_id, request.conversation_history)
-            session_manager.complete_session(request.user_id)
+            await session_manager.update_session_history_async(request.user_id, request.conversation_history)
+            await session_manager.complete_session_async(request.user_id)
+        
+        if body is not None:
+            logger.info(f"Served prerendered recommendation for {len(request.conversation_history)} questions")
+            return Response(content=body, media_type="application/json")
+        
+        # Generate recommendation using tree navigation
+        recommendation_data = groq_service.generate_course_recommendation(
+            request.conversation_history, 
+            available_courses,
+            similarity_index
+        )
         
         # Create response
         response = RecommendationResponse(
             recommended_course=recommendation_data["recommended_course"],
             confidence_score=recommendation_data["confidence_score"],
             reasoning=recommendation_data["reasoning"],
-            alternative_courses=None  # Could be implemented later
+            alternative_courses=recommendation_data.get("alternative_courses")
         )
         
         logger.info(f"Generated tree-based recommendation for {len(request.conversation_history)} questions")
@@ -181,17 +222,61 @@ async def get_course_recommendation(
             detail=f"Error generating recommendation: {str(e)}"
         )
 
+@router.get("/quiz/tree")
+async def get_quiz_tree(
+    request: Request,
+    answers: List[str] = Query([], alias="answer"),
+    depth: Optional[int] = Query(None, ge=1, le=10),
+    groq_service: GroqService = Depends(get_groq_service)
+):
+    """
+    Get the quiz subtree reachable from the current answers
+    
+    The document lists every reachable node with its question, options
+    (each paired with the ID of the node it leads to) and whether a
+    recommendation is due there, so the client can run the rest of the
+    quiz locally and only call /recommend at the end. It is versioned
+    with an ETag for conditional requests.
+    
+    Args:
+        answers: Answers given so far, in order (repeat `answer=` for each)
+        depth: Maximum number of further answers to include (whole subtree if omitted)
+        
+    Returns:
+        Compact JSON subtree, or 304 if the client's copy is current
+    """
+    try:
+        etag, body = groq_service.get_quiz_subtree(answers, depth)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "public, max-age=3600"
+        }
+        
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        
+        return Response(content=body, media_type="application/json", headers=headers)
+        
+    except Exception as e:
+        logger.error(f"Error building quiz tree: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error building quiz tree: {str(e)}"
+        )
+
 @router.get("/courses")
-async def get_all_courses():
+async def get_all_courses(request: Request):
     """
     Get all available courses
     
+    The response is serialized and compressed once per catalog version
+    and supports ETag / Last-Modified revalidation.
+    
     Returns:
         List of all available courses
     """
     try:
-        courses = course_manager.get_all_courses()
-        return {"courses": courses, "total": len(courses)}
+        return course_manager.get_catalog_body().response(request)
         
     except Exception as e:
         logger.error(f"Error fetching courses: {str(e)}")
@@ -201,22 +286,28 @@ async def get_all_courses():
         )
 
 @router.get("/courses/search")
-async def search_courses(q: str = ""):
+async def search_courses(
+    q: str = "",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
     """
-    Search courses by query
+    Search courses by query, ranked by relevance
     
     Args:
-        q: Search query
+        q: Search query; the last word also matches as a prefix for type-ahead
+        limit: Maximum number of courses to return
+        offset: Number of ranked results to skip
         
     Returns:
-        List of matching courses
+        Page of matching courses with the total match count
     """
     try:
         if not q.strip():
-            return {"courses": [], "total": 0, "query": q}
+            return {"courses": [], "total": 0, "query": q, "limit": limit, "offset": offset}
         
-        courses = course_manager.search_courses(q)
-        return {"courses": courses, "total": len(courses), "query": q}
+        courses, total = course_manager.search_courses(q, limit=limit, offset=offset)
+        return {"courses": courses, "total": total, "query": q, "limit": limit, "offset": offset}
         
     except Exception as e:
         logger.error(f"Error searching courses: {str(e)}")
@@ -225,6 +316,48 @@ async def search_courses(q: str = ""):
             detail=f"Error searching courses: {str(e)}"
         )
 
+@router.get("/courses/filter")
+async def filter_courses(
+    all_tags: List[str] = Query([], alias="all"),
+    any_tags: List[str] = Query([], alias="any"),
+    exclude_tags: List[str] = Query([], alias="exclude"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    facet_limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Filter courses by tags with AND/OR/NOT semantics
+    
+    Args:
+        all_tags: Tags every course must have (repeat `all=` for each tag)
+        any_tags: Tags of which each course must have at least one
+        exclude_tags: Tags no course may have
+        limit: Maximum number of courses to return
+        offset: Number of matching courses to skip
+        facet_limit: Maximum number of tag facets to return
+        
+    Returns:
+        Page of matching courses, total matches and tag counts within the matches
+    """
+    try:
+        result = course_manager.filter_courses(
+            all_tags=all_tags,
+            any_tags=any_tags,
+            exclude_tags=exclude_tags,
+            limit=limit,
+            offset=offset,
+            facet_limit=facet_limit
+        )
+        result.update({"limit": limit, "offset": offset})
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error filtering courses: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error filtering courses: {str(e)}"
+        )
+
 @router.post("/session/create")
 async def create_new_session(user_id: str = None):
     """
@@ -237,7 +370,7 @@ async def create_new_session(user_id: str = None):
         Session ID
     """
     try:
-        session_id = session_manager.create_session(user_id)
+        session_id = await session_manager.create_session_async(user_id)
         return {"session_id": session_id, "message": "Session created successfully"}
         
     except Exception as e:
@@ -259,7 +392,7 @@ async def get_session_info(session_id: str):
         Session information
     """
     try:
-        session = session_manager.get_session(session_id)
+        session = await session_manager.get_session_async(session_id)
         
         if not session:
             raise HTTPException(
@@ -299,7 +432,7 @@ async def delete_session(session_id: str):
         Success message
     """
     try:
-        session = session_manager.get_session(session_id)
+        session = await session_manager.get_session_async(session_id)
         
         if not session:
             raise HTTPException(
@@ -308,7 +441,7 @@ async def delete_session(session_id: str):
             )
         
         # Delete the session
-        session_manager._delete_session(session_id)
+        await session_manager.delete_session_async(session_id)
         
         return {"message": "Session deleted successfully"}
         
@@ -326,12 +459,15 @@ async def cleanup_expired_sessions():
     """
     Cleanup expired sessions (admin endpoint)
     
+    Sessions are also swept automatically in the background; this forces a
+    full sweep that includes sessions created by other workers.
+    
     Returns:
         Cleanup summary
     """
     try:
-        session_manager.cleanup_expired_sessions()
-        return {"message": "Expired sessions cleaned up successfully"}
+        summary = await session_manager.cleanup_expired_sessions_async()
+        return {"message": "Expired sessions cleaned up successfully", **summary}
         
     except Exception as e:
         logger.error(f"Error during cleanup: {str(e)}")
@@ -340,9 +476,48 @@ async def cleanup_expired_sessions():
             detail=f"Error during cleanup: {str(e)}"
         )
 
+@router.get("/sessions/metrics")
+async def get_session_metrics():
+    """
+    Get session cache and expiry sweeper metrics (admin endpoint)
+    
+    Returns:
+        Sweep counters and cache occupancy
+    """
+    return session_manager.get_metrics()
+
+@router.get("/chat/metrics")
+async def get_chat_metrics(groq_service: GroqService = Depends(get_groq_service)):
+    """
+    Get chat context metrics (admin endpoint)
+    
+    Returns:
+        Prompt tokens sent and saved by the context budget, summary counters,
+        first-turn response cache counters, coalesced call counters and the
+        rate limit state of each Groq key
+    """
+    return {
+        **groq_service.chat_context.get_metrics(),
+        "response_cache": groq_service.response_cache.get_metrics(),
+        "single_flight": groq_service.chat_flights.get_metrics(),
+        "groq_keys": groq_service.client_pool.get_metrics()
+    }
+
+async def fold_chat_summary(groq_service: GroqService, session_id: str):
+    """Fold older chat messages into the session's running summary once they exceed the context budget"""
+    try:
+        chat_history, chat_summary = await session_manager.get_chat_context_async(session_id)
+        new_summary = await groq_service.update_chat_summary(chat_history, chat_summary)
+        if new_summary:
+            await session_manager.update_chat_summary_async(session_id, new_summary)
+            logger.info(f"Summarized {new_summary['covered']} chat messages for session {session_id}")
+    except Exception as e:
+        logger.error(f"Error updating chat summary: {str(e)}")
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(
     request: ChatRequest,
+    background_tasks: BackgroundTasks,
     groq_service: GroqService = Depends(get_groq_service)
 ):
     """
@@ -358,28 +533,28 @@ async def chat_with_ai(
         # Get or create chat session
         session_id = request.session_id
         if not session_id:
-            session_id = session_manager.create_chat_session(request.user_id)
+            session_id = await session_manager.create_chat_session_async(request.user_id)
         else:
             # Validate session exists
-            session = session_manager.get_session(session_id)
+            session = await session_manager.get_session_async(session_id)
             if not session:
                 # Create new session if provided session doesn't exist
-                session_id = session_manager.create_chat_session(request.user_id)
+                session_id = await session_manager.create_chat_session_async(request.user_id)
         
-        # Get current chat history
-        chat_history = session_manager.get_chat_history(session_id)
+        # Snapshot current chat history before the new user message is appended
+        chat_history, chat_summary = await session_manager.get_chat_context_async(session_id)
         
         # Add user message to history
-        session_manager.add_chat_message(session_id, "user", request.message)
+        await session_manager.add_chat_message_async(session_id, "user", request.message)
         
         # Generate AI response
-        ai_response = groq_service.generate_chat_response(chat_history, request.message)
+        ai_response = await groq_service.generate_chat_response(chat_history, request.message, chat_summary)
         
         # Add AI response to history
-        session_manager.add_chat_message(session_id, "assistant", ai_response)
+        await session_manager.add_chat_message_async(session_id, "assistant", ai_response)
         
         # Get updated chat history for response
-        updated_history = session_manager.get_chat_history(session_id)
+        updated_history = await session_manager.get_chat_history_async(session_id)
         
         # Convert to ChatMessage objects
         chat_messages = [
@@ -391,6 +566,9 @@ async def chat_with_ai(
             for msg in updated_history
         ]
         
+        # Summarize older turns after the response is sent
+        background_tasks.add_task(fold_chat_summary, groq_service, session_id)
+        
         # Create response
         response = ChatResponse(
             response=ai_response,
@@ -408,6 +586,88 @@ async def chat_with_ai(
             detail=f"Error generating chat response: {str(e)}"
         )
 
+@router.post("/chat/stream")
+async def chat_with_ai_stream(
+    request: ChatRequest,
+    groq_service: GroqService = Depends(get_groq_service)
+):
+    """
+    Chat with AI assistant, streaming the reply as Server-Sent Events
+    
+    Emits a `session` event with the session ID, one `token` event per
+    response fragment, and a final `done` event with the full response.
+    The assistant message is saved to the session when the stream closes.
+    
+    Args:
+        request: ChatRequest containing message and optional session info
+        
+    Returns:
+        StreamingResponse with text/event-stream content
+    """
+    try:
+        # Get or create chat session
+        session_id = request.session_id
+        if not session_id or not await session_manager.get_session_async(session_id):
+            session_id = await session_manager.create_chat_session_async(request.user_id)
+        
+        # Snapshot current chat history before the new user message is appended
+        chat_history, chat_summary = await session_manager.get_chat_context_async(session_id)
+        
+        # Add user message to history
+        await session_manager.add_chat_message_async(session_id, "user", request.message)
+        
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating chat response: {str(e)}"
+        )
+    
+    def sse_event(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    async def event_stream():
+        fragments = []
+        try:
+            yield sse_event("session", {"session_id": session_id})
+            
+            async for fragment in groq_service.stream_chat_response(chat_history, request.message, chat_summary):
+                fragments.append(fragment)
+                yield sse_event("token", {"token": fragment})
+            
+            yield sse_event("done", {"session_id": session_id, "response": "".join(fragments).strip()})
+        
+        except CircuitOpenError:
+            # Groq has been failing; the breaker already counts these, so don't log each one
+            fragments.append("I'm experiencing some technical difficulties. Please try again in a moment.")
+            yield sse_event("error", {"session_id": session_id, "response": fragments[0]})
+            
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            if not fragments:
+                fragments.append("I'm experiencing some technical difficulties. Please try again in a moment.")
+            yield sse_event("error", {"session_id": session_id, "response": "".join(fragments).strip()})
+            
+        finally:
+            # Save whatever the assistant produced once the stream closes
+            if fragments:
+                # Shielded so a client disconnect cannot cancel the write half way
+                await asyncio.shield(
+                    session_manager.add_chat_message_async(session_id, "assistant", "".join(fragments).strip())
+                )
+                logger.info(f"Streamed chat response for session {session_id}")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        },
+        # Runs once the stream has closed and the reply is saved
+        background=BackgroundTask(fold_chat_summary, groq_service, session_id)
+    )
+
 @router.get("/chat/{session_id}/history")
 async def get_chat_history(session_id: str):
     """
@@ -420,7 +680,7 @@ async def get_chat_history(session_id: str):
         Chat history for the session
     """
     try:
-        session = session_manager.get_session(session_id)
+        session = await session_manager.get_session_async(session_id)
         
         if not session:
             raise HTTPException(
@@ -429,7 +689,7 @@ async def get_chat_history(session_id: str):
             )
         
         # Get chat history
-        chat_history = session_manager.get_chat_history(session_id)
+        chat_history = await session_manager.get_chat_history_async(session_id)
         
         # Convert to ChatMessage objects
         chat_messages = [
@@ -457,38 +717,110 @@ async def get_chat_history(session_id: str):
             detail=f"Error fetching chat history: {str(e)}"
         )
 
+@router.get("/tts")
+async def text_to_speech(
+    request: Request,
+    text: str = Query(..., min_length=1),
+    model: Optional[str] = Query(None),
+    voice: Optional[str] = Query(None),
+    response_format: str = Query("wav"),
+    tts_service: TTSService = Depends(get_tts_service)
+):
+    """
+    Get speech audio for a text from the server-side cache
+    
+    Audio is synthesized through Groq on the first request for a text,
+    model, voice and format, and served from disk after that. Quiz
+    questions and options are synthesized at startup. The response
+    supports Range and ETag revalidation, and its X-Cache header is HIT
+    or MISS.
+    
+    Args:
+        text: Text to speak
+        model: TTS model (server default if omitted)
+        voice: Voice (server default if omitted)
+        response_format: wav, mp3, flac, ogg or mulaw
+    
+    Returns:
+        Audio file
+    """
+    try:
+        media_type = AUDIO_FORMATS.get(response_format)
+        if media_type is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported audio format: {response_format}"
+            )
+        if len(text) > tts_service.settings.tts_max_chars:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Text is longer than {tts_service.settings.tts_max_chars} characters"
+            )
+        
+        path, cached = await tts_service.synthesize(text, model, voice, response_format)
+        try:
+            # Opened off the event loop; once open, eviction can no longer break the response
+            audio = await asyncio.to_thread(StaticFile.open, path, media_type, "public, max-age=86400")
+        except FileNotFoundError:
+            # Evicted between synthesis and opening it, so synthesize it again
+            path, cached = await tts_service.synthesize(text, model, voice, response_format)
+            audio = await asyncio.to_thread(StaticFile.open, path, media_type, "public, max-age=86400")
+        
+        response = audio.response(request)
+        response.headers["X-Cache"] = "HIT" if cached else "MISS"
+        return response
+    
+    except HTTPException:
+        raise
+    except (RateLimitError, asyncio.TimeoutError) as e:
+        logger.warning(f"Text to speech unavailable: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Text to speech is busy, please try again shortly"
+        )
+    except Exception as e:
+        logger.error(f"Error synthesizing speech: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error synthesizing speech: {str(e)}"
+        )
+
+@router.get("/tts/metrics")
+async def get_tts_metrics(tts_service: TTSService = Depends(get_tts_service)):
+    """
+    Get text to speech metrics (admin endpoint)
+    
+    Returns:
+        Syntheses made, audio cache counters, coalesced call counters and
+        the rate limit state of each Groq key
+    """
+    return tts_service.get_metrics()
+
+def get_video_file(request: Request, video_format: str):
+    """Get a video file resolved at startup, or None if it is missing"""
+    return getattr(request.app.state, "video_files", {}).get(video_format)
+
 @router.get("/vidmp4")
-async def get_video_mp4():
+async def get_video_mp4(request: Request):
     """
     Serve the recommendation intro video in MP4 format
     
+    Supports Range requests (single and multiple ranges), If-Range and
+    ETag revalidation, so seeking only downloads the bytes needed.
+    
     Returns:
-        MP4 video file
+        MP4 video file or the requested byte ranges
     """
     try:
-        # Get the path to the video file
-        video_path = Path(__file__).parent.parent / "videos" / "recommender-intro.mp4"
+        video = get_video_file(request, "mp4")
         
-        # Check if file exists
-        if not video_path.exists():
-            # Fallback to test video if main video doesn't exist
-            video_path = Path(__file__).parent.parent / "videos" / "test-video.mp4"
-            
-        if not video_path.exists():
+        if video is None:
             raise HTTPException(
                 status_code=404,
                 detail="Video file not found"
             )
         
-        logger.info(f"Serving MP4 video: {video_path}")
-        return FileResponse(
-            path=str(video_path),
-            media_type="video/mp4",
-            headers={
-                "Cache-Control": "public, max-age=3600",
-                "Accept-Ranges": "bytes"
-            }
-        )
+        return video.response(request)
         
     except HTTPException:
         raise
@@ -500,32 +832,26 @@ async def get_video_mp4():
         )
 
 @router.get("/vidwebm")
-async def get_video_webm():
+async def get_video_webm(request: Request):
     """
     Serve the recommendation intro video in WebM format
     
+    Supports Range requests (single and multiple ranges), If-Range and
+    ETag revalidation, so seeking only downloads the bytes needed.
+    
     Returns:
-        WebM video file
+        WebM video file or the requested byte ranges
     """
     try:
-        # Get the path to the video file
-        video_path = Path(__file__).parent.parent / "videos" / "recommender-intro.webm"
+        video = get_video_file(request, "webm")
         
-        if not video_path.exists():
+        if video is None:
             raise HTTPException(
                 status_code=404,
                 detail="WebM video file not found"
             )
         
-        logger.info(f"Serving WebM video: {video_path}")
-        return FileResponse(
-            path=str(video_path),
-            media_type="video/webm",
-            headers={
-                "Cache-Control": "public, max-age=3600",
-                "Accept-Ranges": "bytes"
-            }
-        )
+        return video.response(request)
         
     except HTTPException:
         raise
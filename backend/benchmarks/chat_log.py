@@ -0,0 +1,155 @@
+"""
+Benchmark chat message persistence at growing conversation lengths
+
+Compares the full-session rewrite the file store did before chat logs
+(json.dump with indent=2 on every message) with the appends of
+FileSessionStore and SQLiteSessionStore, including the metadata
+checkpoint every CHAT_LOG_COMPACT_INTERVAL messages. Each turn is a user
+message and an assistant reply. With the default interval of 50 the last
+turn of each run includes a checkpoint.
+
+Bytes written are read from /proc/self/io, so they are only reported on
+Linux.
+
+Usage:
+    python -m benchmarks.chat_log --turns 10 100 1000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from config.settings import get_settings
+from services.session_store import FileSessionStore, SQLiteSessionStore
+
+USER_MESSAGE = "Which of these courses would help me move from web development into data science?"
+ASSISTANT_MESSAGE = (
+    "Since you already know Python from web work, start with a statistics and data analysis course, "
+    "then a hands-on machine learning course. Projects on real datasets will matter more to employers "
+    "than certificates, so pick courses that end with a portfolio project. "
+) * 2
+
+def bytes_written() -> Optional[int]:
+    """Bytes this process has passed to write() so far, or None off Linux"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def new_session() -> Dict:
+    """A chat session as create_chat_session builds it"""
+    now = datetime.now().isoformat()
+    return {
+        "session_id": "benchmark-session",
+        "schema_version": 1,
+        "user_id": None,
+        "session_type": "chat",
+        "chat_history": [],
+        "created_at": now,
+        "last_activity": now,
+        "is_completed": False
+    }
+
+def rewrite_writer(directory: str) -> Tuple[Callable[[Dict, Dict], None], Callable[[], None]]:
+    """Persist a message by rewriting the whole session, as before chat logs"""
+    path = os.path.join(directory, "benchmark-session.json")
+    
+    def write(session: Dict, message: Dict):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(session, f, indent=2, ensure_ascii=False)
+    
+    return write, lambda: None
+
+def append_writer(store) -> Tuple[Callable[[Dict, Dict], None], Callable[[], None]]:
+    """Persist a message by appending it, checkpointing metadata like SessionManager"""
+    store.save(new_session())
+    
+    def write(session: Dict, message: Dict):
+        store.append_message(session["session_id"], message)
+        if len(session["chat_history"]) % get_settings().chat_log_compact_interval == 0:
+            store.compact(session)
+    
+    return write, store.close
+
+def run(turns: int, make_writer: Callable) -> Dict:
+    """
+    Write a conversation of `turns` turns to a fresh directory
+    
+    Args:
+        turns: Number of user/assistant turns
+        make_writer: Builds the persistence and close functions for a directory
+    
+    Returns:
+        Bytes written per message, mean and last-turn latency in ms per message
+    """
+    directory = tempfile.mkdtemp(prefix="talkify-bench-")
+    try:
+        write, close = make_writer(directory)
+        session = new_session()
+        timings = []
+        before = bytes_written()
+        for _ in range(turns):
+            for role, content in (("user", USER_MESSAGE), ("assistant", ASSISTANT_MESSAGE)):
+                message = {"role": role, "content": content, "timestamp": datetime.now().isoformat()}
+                session["chat_history"].append(message)
+                session["last_activity"] = message["timestamp"]
+                start = time.perf_counter()
+                write(session, message)
+                timings.append((time.perf_counter() - start) * 1000)
+        after = bytes_written()
+        close()
+        messages = len(timings)
+        return {
+            "bytes_per_message": None if before is None else (after - before) / messages,
+            "mean_ms": statistics.fmean(timings),
+            "last_turn_ms": statistics.fmean(timings[-2:])
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def file_writer(directory: str) -> Tuple[Callable[[Dict, Dict], None], Callable[[], None]]:
+    """Append writer over a file store in the directory"""
+    return append_writer(FileSessionStore(directory))
+
+def sqlite_writer(directory: str) -> Tuple[Callable[[Dict, Dict], None], Callable[[], None]]:
+    """Append writer over a SQLite store in the directory"""
+    return append_writer(SQLiteSessionStore(os.path.join(directory, "sessions.db")))
+
+def format_bytes(value: Optional[float]) -> str:
+    """Format a byte count for the table"""
+    if value is None:
+        return "n/a"
+    return f"{value / 1024:.1f} KB" if value >= 1024 else f"{value:.0f} B"
+
+def main():
+    """Run every writer at every conversation length"""
+    parser = argparse.ArgumentParser(description="Benchmark chat message persistence")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000], help="Conversation lengths in turns")
+    args = parser.parse_args()
+    
+    writers: List = [
+        ("full rewrite", rewrite_writer),
+        ("file append", file_writer),
+        ("sqlite append", sqlite_writer)
+    ]
+    print(f"{'turns':>5} {'writer':<14} {'written/msg':>12} {'mean/msg':>10} {'last turn/msg':>14}")
+    for turns in args.turns:
+        for label, make_writer in writers:
+            result = run(turns, make_writer)
+            print(f"{turns:>5} {label:<14} {format_bytes(result['bytes_per_message']):>12} "
+                  f"{result['mean_ms']:>7.3f} ms {result['last_turn_ms']:>11.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark compiled quiz tree lookups against the old nested dict walk
+
+For each depth, times resolving every answer path of that length with
+the dict walk GroqService used to do, with GroqService._navigate_tree
+(which builds the answer tuple from the history) and with
+CompiledQuizTree.resolve alone, and checks they land on the same node.
+
+Usage:
+    python -m benchmarks.quiz_navigation --number 20000
+"""
+
+import argparse
+import os
+import timeit
+from typing import Any, Dict, List
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from models.schemas import QuestionAnswer, QuestionType
+from services.groq_service import GroqService
+
+def dict_walk(quiz_tree: Dict[str, Any], conversation_history: List[QuestionAnswer]) -> Dict[str, Any]:
+    """The navigation GroqService used before the tree was compiled"""
+    current_node = quiz_tree
+    for qa in conversation_history:
+        if "options" in current_node and qa.answer in current_node["options"]:
+            current_node = current_node["options"][qa.answer]
+        else:
+            break
+    return current_node
+
+def best_us(statement, number: int, repeat: int) -> float:
+    """Best time of a callable in microseconds per call"""
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e6
+
+def main():
+    """Time each navigation at every depth of the tree"""
+    parser = argparse.ArgumentParser(description="Benchmark quiz tree navigation")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is reported")
+    args = parser.parse_args()
+    
+    service = GroqService()
+    histories: Dict[int, List[List[QuestionAnswer]]] = {}
+    for node in service.quiz_engine.nodes:
+        if node.depth:
+            histories.setdefault(node.depth, []).append([
+                QuestionAnswer(question="", answer=answer, question_type=QuestionType.MULTIPLE_CHOICE)
+                for answer in node.path
+            ])
+    
+    print(f"{'depth':>5} {'paths':>6} {'dict walk':>12} {'_navigate_tree':>15} {'resolve':>12}")
+    for depth, paths in sorted(histories.items()):
+        for history in paths:
+            # Both must land on the same node
+            assert dict_walk(service.quiz_tree, history).get("question") == service._navigate_tree(history).question
+        
+        number = max(1, args.number // len(paths))
+        walk = best_us(lambda: [dict_walk(service.quiz_tree, history) for history in paths], number, args.repeat) / len(paths)
+        compiled = best_us(lambda: [service._navigate_tree(history) for history in paths], number, args.repeat) / len(paths)
+        answers = [tuple(qa.answer for qa in history) for history in paths]
+        lookup = best_us(lambda: [service.quiz_engine.resolve(path) for path in answers], number, args.repeat) / len(paths)
+        print(f"{depth:>5} {len(paths):>6} {walk:>9.2f} us {compiled:>12.2f} us {lookup:>9.2f} us")
+
+if __name__ == "__main__":
+    main()
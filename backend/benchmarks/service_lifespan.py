@@ -0,0 +1,134 @@
+"""
+Benchmark a GroqService built per request against the shared lifespan instance
+
+Sends /next-question requests in-process through the ASGI app, once with
+the dependency overridden to build a new GroqService per call (the old
+behaviour) and once with the instance created at startup. No server or
+Groq account is needed; no model calls are made.
+
+Usage:
+    python -m benchmarks.service_lifespan --requests 200
+"""
+
+import argparse
+import asyncio
+import atexit
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+# Settings are read at import, so point them at a throwaway session store first
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+os.environ["SESSION_DIR"] = tempfile.mkdtemp(prefix="talkify-bench-")
+atexit.register(shutil.rmtree, os.environ["SESSION_DIR"], True)
+os.environ["SESSION_SWEEP_INTERVAL_SECONDS"] = "0"
+
+import httpx
+
+from api.routes import get_groq_service
+from main import app
+from services.groq_service import GroqService
+
+# Request logging would dominate the timings
+logging.disable(logging.INFO)
+
+def measure_construction(count: int) -> dict:
+    """
+    Time and trace the allocations of building GroqService instances
+    
+    Args:
+        count: Number of instances to build
+    
+    Returns:
+        Median construction time in ms and bytes allocated per instance
+    """
+    timings = []
+    instances = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(count):
+        start = time.perf_counter()
+        instances.append(GroqService())
+        timings.append((time.perf_counter() - start) * 1000)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    
+    async def close_all():
+        for instance in instances:
+            await instance.close()
+    
+    asyncio.run(close_all())
+    return {"median_ms": statistics.median(timings), "bytes_per_instance": allocated // count}
+
+async def measure_requests(count: int, per_request: bool) -> dict:
+    """
+    Send /next-question requests through the app
+    
+    Args:
+        count: Number of requests
+        per_request: Build a GroqService in the dependency, like before the lifespan hook
+    
+    Returns:
+        Median and p95 latency in ms and bytes still allocated per request
+    """
+    created = []
+    if per_request:
+        def build_service():
+            created.append(GroqService())
+            return created[-1]
+        app.dependency_overrides[get_groq_service] = build_service
+    else:
+        app.dependency_overrides.pop(get_groq_service, None)
+    
+    payload = {"conversation_history": []}
+    timings = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # Warm up imports and caches
+        await client.post("/api/v1/next-question", json=payload)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.post("/api/v1/next-question", json=payload)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+        # The old dependency never closed its clients, so they stay allocated
+        allocated = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    
+    for service in created:
+        await service.close()
+    app.dependency_overrides.pop(get_groq_service, None)
+    
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "bytes_per_request": allocated // count,
+    }
+
+def main():
+    """Run both modes and print the results"""
+    parser = argparse.ArgumentParser(description="Benchmark per-request vs shared GroqService")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per mode")
+    args = parser.parse_args()
+    
+    construction = measure_construction(min(args.requests, 50))
+    print(f"GroqService(): {construction['median_ms']:.2f} ms, {construction['bytes_per_instance'] / 1024:.1f} KB per instance")
+    
+    app.state.groq_service = GroqService()
+    try:
+        for label, per_request in (("per request", True), ("shared", False)):
+            result = asyncio.run(measure_requests(args.requests, per_request))
+            print(f"/next-question, service {label:<11}: median {result['median_ms']:.2f} ms, "
+                  f"p95 {result['p95_ms']:.2f} ms, {result['bytes_per_request'] / 1024:.1f} KB retained per request")
+    finally:
+        asyncio.run(app.state.groq_service.close())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark session record size and serializer throughput
+
+Encodes a completed 12-answer quiz session with the indented JSON the
+file store wrote before serializers were pluggable and with each
+SESSION_SERIALIZER whose library is installed, and reports the record
+size and encode/decode times. It then times turning the stored history
+back into QuestionAnswer models: full validation (schema version 0),
+model_construct (version 1) and the per-session cache
+get_conversation_history hits while the history is unchanged.
+
+Usage:
+    python -m benchmarks.session_serialization --number 20000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import timeit
+from datetime import datetime
+from typing import Dict
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from models.schemas import QuestionAnswer, QuestionType
+from services.session_serializer import SESSION_SCHEMA_VERSION, get_serializer, json_loads
+from services.session_service import SessionManager, _construct_history, _question_answer_list
+from services.session_store import FileSessionStore
+
+def quiz_session(answers: int) -> Dict:
+    """A completed quiz session as SessionManager stores it"""
+    history = [
+        QuestionAnswer(
+            question=f"Question {i + 1}: which of these areas interests you the most right now?",
+            answer="Building web applications",
+            question_type=QuestionType.MULTIPLE_CHOICE,
+            options=[
+                "Building web applications",
+                "Analysing data and statistics",
+                "Designing user interfaces",
+                "Securing networks and systems"
+            ]
+        ).model_dump(mode="json")
+        for i in range(answers)
+    ]
+    now = datetime.now().isoformat()
+    return {
+        "session_id": "7d5c7a52-35d4-4c41-9a51-0f1c1d3c2b6e",
+        "schema_version": SESSION_SCHEMA_VERSION,
+        "user_id": None,
+        "conversation_history": history,
+        "created_at": now,
+        "last_activity": now,
+        "is_completed": True,
+        "completed_at": now
+    }
+
+def best_us(statement, number: int, repeat: int) -> float:
+    """Best time of a callable in microseconds per call"""
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e6
+
+def main():
+    """Time each serializer and each way of rebuilding the history"""
+    parser = argparse.ArgumentParser(description="Benchmark session serialization")
+    parser.add_argument("--answers", type=int, default=12, help="Quiz answers in the session")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is reported")
+    args = parser.parse_args()
+
+    session = quiz_session(args.answers)
+    encoders = [("json indent=2 (old)", lambda record: json.dumps(record, indent=2, ensure_ascii=False).encode("utf-8"), json_loads)]
+    for name in ("json", "orjson", "msgpack"):
+        try:
+            serializer = get_serializer(name)
+        except ValueError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        encoders.append((name, serializer.dumps, serializer.loads))
+
+    print(f"Quiz session with {args.answers} answers")
+    print(f"{'serializer':<20} {'size':>8} {'encode':>11} {'decode':>11}")
+    for label, dumps, loads in encoders:
+        data = dumps(session)
+        assert loads(data) == session
+        encode = best_us(lambda: dumps(session), args.number, args.repeat)
+        decode = best_us(lambda: loads(data), args.number, args.repeat)
+        print(f"{label:<20} {len(data):>6} B {encode:>8.2f} us {decode:>8.2f} us")
+
+    history = session["conversation_history"]
+    assert _construct_history(history) == _question_answer_list.validate_python(history)
+
+    directory = tempfile.mkdtemp(prefix="talkify-bench-")
+    try:
+        manager = SessionManager(FileSessionStore(directory))
+        session_id = manager.create_session()
+        manager.update_session_history(session_id, _question_answer_list.validate_python(history))
+        manager.get_conversation_history(session_id)
+
+        print(f"\n{'history to models':<20} {'time':>11}")
+        for label, function in (
+            ("validate (v0)", lambda: _question_answer_list.validate_python(history)),
+            ("model_construct (v1)", lambda: _construct_history(history)),
+            ("cached, unchanged", lambda: manager.get_conversation_history(session_id))
+        ):
+            print(f"{label:<20} {best_us(function, args.number, args.repeat):>8.2f} us")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark precomputing the course similarity table
+
+For the shipped catalog and a synthetic one, times building
+CourseSimilarityIndex and reports its peak traced memory and table size.
+It then compares looking up a course's alternatives in the table with
+scoring that course against the whole catalog per request, which is
+what serving alternatives without the precomputed table would cost.
+With --memory it also reports the peak traced memory of a build. Needs
+NumPy.
+
+Usage:
+    python -m benchmarks.similarity_precompute --courses 50000
+"""
+
+import argparse
+import time
+import timeit
+import tracemalloc
+from typing import List
+
+import numpy as np
+
+from benchmarks.synthetic_catalog import synthetic_courses
+from models.schemas import Course
+from utils.course_data import CourseDataManager
+from utils.similarity_index import CourseSimilarityIndex
+
+def on_demand(matrix, doc_id: int, k: int) -> List[int]:
+    """Score one course against the catalog and take its top k, as a per-request lookup would"""
+    similarities = matrix @ matrix[doc_id]
+    similarities[doc_id] = -1.0
+    top = np.argpartition(similarities, len(similarities) - k)[len(similarities) - k:]
+    return top[np.argsort(-similarities[top], kind="stable")].tolist()
+
+def best_us(statement, number: int, repeat: int) -> float:
+    """Best time of a callable in microseconds per call"""
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e6
+
+def run(label: str, courses: List[Course], number: int, repeat: int, memory: bool):
+    """Build the index for a catalog and print build and lookup costs"""
+    index = CourseSimilarityIndex()
+    start = time.perf_counter()
+    index.build(courses)
+    elapsed = time.perf_counter() - start
+    table = index.neighbours.nbytes + index.scores.nbytes
+    print(f"{label}: {len(courses)} courses, built in {elapsed * 1000:.1f} ms, table {table / 1024:.1f} KB")
+    
+    if memory:
+        # Tracing slows the build several times over, so it is a separate run
+        tracemalloc.start()
+        CourseSimilarityIndex().build(courses)
+        print(f"{label}: peak traced memory during the build {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MB")
+        tracemalloc.stop()
+    
+    matrix = index._vectorize(courses)
+    doc_ids = range(0, len(courses), max(1, len(courses) // 100))
+    lookup = best_us(lambda: [index.similar_courses(courses[doc_id], 3) for doc_id in doc_ids], number, repeat) / len(doc_ids)
+    scored = best_us(lambda: [on_demand(matrix, doc_id, index.k) for doc_id in doc_ids], number, repeat) / len(doc_ids)
+    print(f"{label}: alternatives from the table {lookup:.1f} us, scored per request {scored:.1f} us "
+          f"(excluding building the matrix)")
+
+def main():
+    """Benchmark the shipped catalog and a synthetic one"""
+    parser = argparse.ArgumentParser(description="Benchmark the similarity precompute")
+    parser.add_argument("--courses", type=int, default=50000, help="Synthetic catalog size")
+    parser.add_argument("--number", type=int, default=20, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs; the best is reported")
+    parser.add_argument("--memory", action="store_true", help="Also report peak memory of the build (slow)")
+    args = parser.parse_args()
+    
+    run("Shipped catalog", CourseDataManager().get_all_courses(), args.number, args.repeat, args.memory)
+    run("Synthetic catalog", synthetic_courses(args.courses), args.number, args.repeat, args.memory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Generate a large synthetic course catalog for benchmarks
+
+Courses are built from the vocabulary of the shipped catalog plus
+`extra_tags` invented tags, drawn with a Zipf-like skew so a few tags are
+common and most are rare, like a real catalog. The same seed always
+gives the same catalog.
+
+Usage:
+    python -m benchmarks.synthetic_catalog --count 50000 --output data/synthetic_courses.json
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+from typing import List
+
+from models.schemas import Course
+
+def synthetic_courses(
+    count: int,
+    extra_tags: int = 3000,
+    seed: int = 0,
+    source: str = "data/courses.json"
+) -> List[Course]:
+    """
+    Generate courses with the shape of the shipped catalog
+    
+    Args:
+        count: Number of courses
+        extra_tags: Invented tags added to the shipped catalog's tags
+        seed: Random seed
+        source: Catalog whose tags and description words are reused
+    
+    Returns:
+        The generated courses
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    
+    rng = random.Random(seed)
+    tags = list(dict.fromkeys(tag for course in base for tag in course.get("tags") or []))
+    tags += [f"topic {i}" for i in range(extra_tags)]
+    words = list(dict.fromkeys(
+        word for course in base for word in re.findall(r"[a-z]+", (course.get("description") or "").lower())
+    ))
+    words += [f"term{i}" for i in range(extra_tags)]
+    # Zipf-like weights: the i-th tag or word is drawn with weight 1 / (i + 1)
+    tag_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(tags))))
+    word_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(words))))
+    
+    courses = []
+    for i in range(count):
+        template = base[i % len(base)]
+        course_tags = list(dict.fromkeys(rng.choices(tags, cum_weights=tag_weights, k=rng.randint(3, 7))))
+        description = " ".join(rng.choices(words, cum_weights=word_weights, k=rng.randint(8, 20)))
+        courses.append(Course(
+            name=f"{template['name']} {i}",
+            link=f"{template['link']}?course={i}",
+            tags=course_tags,
+            description=description.capitalize() + ".",
+            provider=template.get("provider"),
+            duration=template.get("duration"),
+            level=template.get("level")
+        ))
+    return courses
+
+def main():
+    """Write a synthetic catalog as JSON"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic course catalog")
+    parser.add_argument("--count", type=int, default=50000, help="Number of courses")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", default="data/synthetic_courses.json", help="JSON file to write")
+    args = parser.parse_args()
+    
+    courses = synthetic_courses(args.count, seed=args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump([course.model_dump() for course in courses], f, indent=2, ensure_ascii=False)
+    print(f"Wrote {len(courses)} courses to {args.output}")
+
+if __name__ == "__main__":
+    main()
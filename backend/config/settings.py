@@ -16,11 +16,64 @@ class Settings(BaseSettings):
     # Groq API
     groq_api_key: str = os.getenv("GROQ_API_KEY", "")
     groq_api_key2: str = os.getenv("GROQ_API_KEY2", "")
+    groq_api_keys: str = os.getenv("GROQ_API_KEYS", "")  # Extra comma-separated keys to spread chat calls over
+    groq_base_url: str = os.getenv("GROQ_BASE_URL", "")  # Override to point at a local fake LLM server
+    
+    # LLM call limits
+    llm_timeout_seconds: float = float(os.getenv("LLM_TIMEOUT_SECONDS", 20))
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+    llm_max_attempts: int = int(os.getenv("LLM_MAX_ATTEMPTS", 4))  # Upstream calls per request, failing over between keys
+    
+    # Circuit breaker around LLM calls: opens on too many failed or slow calls in the window
+    llm_breaker_window: int = int(os.getenv("LLM_BREAKER_WINDOW", 20))
+    llm_breaker_min_calls: int = int(os.getenv("LLM_BREAKER_MIN_CALLS", 10))
+    llm_breaker_failure_rate: float = float(os.getenv("LLM_BREAKER_FAILURE_RATE", 0.5))
+    llm_breaker_slow_call_seconds: float = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", 10))
+    llm_breaker_slow_call_rate: float = float(os.getenv("LLM_BREAKER_SLOW_CALL_RATE", 0.8))
+    llm_breaker_open_seconds: float = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", 30))
+    llm_breaker_half_open_probes: int = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", 3))
+    
+    # Chat context: token budget for the running summary plus recent messages (0 sends the whole history)
+    chat_context_tokens: int = int(os.getenv("CHAT_CONTEXT_TOKENS", 3000))
+    chat_summary_tokens: int = int(os.getenv("CHAT_SUMMARY_TOKENS", 300))
+    
+    # Cache of answers to first-turn chat messages (size 0 disables)
+    chat_cache_size: int = int(os.getenv("CHAT_CACHE_SIZE", 1000))
+    chat_cache_ttl_seconds: float = float(os.getenv("CHAT_CACHE_TTL_SECONDS", 3600))
+    chat_cache_near_duplicates: bool = os.getenv("CHAT_CACHE_NEAR_DUPLICATES", "true").lower() == "true"
+    chat_cache_similarity: float = float(os.getenv("CHAT_CACHE_SIMILARITY", 0.9))
+    
+    # Text to speech proxy with a disk cache of synthesized audio
+    tts_model: str = os.getenv("TTS_MODEL", "playai-tts-arabic")
+    tts_voice: str = os.getenv("TTS_VOICE", "Amira-PlayAI")
+    tts_cache_dir: str = os.getenv("TTS_CACHE_DIR", "data/tts_cache")
+    tts_cache_max_mb: float = float(os.getenv("TTS_CACHE_MAX_MB", 500))
+    tts_max_chars: int = int(os.getenv("TTS_MAX_CHARS", 1000))
+    tts_presynthesize: bool = os.getenv("TTS_PRESYNTHESIZE", "true").lower() == "true"  # Quiz questions and options, at startup
     
     # Application settings
     max_questions: int = int(os.getenv("MAX_QUESTIONS", 15))
     min_questions: int = int(os.getenv("MIN_QUESTIONS", 3))
     
+    # Similar courses returned as alternatives with a recommendation (0 disables)
+    recommendation_alternatives: int = int(os.getenv("RECOMMENDATION_ALTERNATIVES", 3))
+    
+    # Question pacing: a hint the client applies, or a real server delay for demos only
+    question_pacing_ms: int = int(os.getenv("QUESTION_PACING_MS", 500))
+    server_side_pacing: bool = os.getenv("SERVER_SIDE_PACING", "false").lower() == "true"
+    
+    # Session storage
+    session_backend: str = os.getenv("SESSION_BACKEND", "file")  # "file" or "sqlite"
+    session_dir: str = os.getenv("SESSION_DIR", "data/sessions")
+    session_db_path: str = os.getenv("SESSION_DB_PATH", "data/sessions.db")
+    session_serializer: str = os.getenv("SESSION_SERIALIZER", "orjson")  # "json", "orjson" or "msgpack"
+    session_cache_size: int = int(os.getenv("SESSION_CACHE_SIZE", 1000))  # Hot sessions kept in memory per worker
+    session_sweep_interval_seconds: float = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", 300))  # 0 disables the background sweeper
+    chat_log_compact_interval: int = int(os.getenv("CHAT_LOG_COMPACT_INTERVAL", 50))  # Messages between metadata checkpoints
+    
+    # Responses smaller than this are not gzipped
+    compression_min_size: int = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    
     # CORS
     allowed_origins: str = os.getenv("ALLOWED_ORIGINS", "*")
     
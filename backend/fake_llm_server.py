@@ -0,0 +1,250 @@
+"""
+Local fake LLM server for testing without a Groq account
+
+Implements the subset of the Groq (OpenAI compatible) API used by the
+backend: chat completions and text to speech, which returns silent WAV
+audio. Point the backend at it with:
+
+    python fake_llm_server.py --port 9000 --latency 0.5
+    GROQ_BASE_URL=http://localhost:9000 GROQ_API_KEY=test uvicorn main:app
+
+Responses carry Groq's x-ratelimit-* headers. Keys passed with
+--rate-limit-key get 429 responses, for testing key failover.
+--error-rate answers a share of calls with 500s, and POST /config
+changes any setting while the server runs, e.g. to simulate an outage:
+    
+    curl -X POST localhost:9000/config -d '{"error_rate": 1.0}'
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import time
+import uuid
+import wave
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+app = FastAPI(title="Fake LLM Server")
+
+# Behaviour settings, overridable from the command line
+config = {
+    "latency": 0.5,
+    "token_interval": 0.05,
+    # Budgets reported in the x-ratelimit-* headers
+    "request_limit": 14400,
+    "token_limit": 18000,
+    # API key -> number of upcoming calls to answer with a 429 (-1 for every call)
+    "rate_limited_keys": {},
+    "retry_after": 1.0,
+    # Share of calls answered with a 500 error
+    "error_rate": 0.0,
+}
+
+# Call counters for tests
+stats = {
+    "chat_completions": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "rate_limited": 0,
+    "errors": 0,
+    "calls_by_key": {},
+    "speech_calls": 0,
+}
+
+def _reply_for(messages):
+    """Build a deterministic reply from the last user message"""
+    last_user = next(
+        (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"),
+        ""
+    )
+    return f"Fake reply to: {last_user}"
+
+async def _stream_reply(body):
+    """Yield the reply as OpenAI-style SSE chunks, one word at a time"""
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(config["latency"])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = _reply_for(body.get("messages", [])).split(" ")
+
+        for i, word in enumerate(words):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake-model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": word if i == 0 else f" {word}"},
+                        "finish_reason": None
+                    }
+                ]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(config["token_interval"])
+
+        yield "data: [DONE]\n\n"
+    finally:
+        stats["in_flight"] -= 1
+
+def _rate_limit_headers(api_key):
+    """Build Groq-style rate limit headers for a key"""
+    return {
+        "x-ratelimit-limit-requests": str(config["request_limit"]),
+        "x-ratelimit-limit-tokens": str(config["token_limit"]),
+        "x-ratelimit-remaining-requests": str(max(config["request_limit"] - stats["calls_by_key"].get(api_key, 0), 0)),
+        "x-ratelimit-remaining-tokens": str(config["token_limit"]),
+        "x-ratelimit-reset-requests": "2m59.56s",
+        "x-ratelimit-reset-tokens": "7.66s",
+    }
+
+def _take_rate_limit(api_key):
+    """Check whether this call should get a 429, using up one configured rejection"""
+    remaining = config["rate_limited_keys"].get(api_key, 0)
+    if remaining == 0:
+        return False
+    if remaining > 0:
+        config["rate_limited_keys"][api_key] = remaining - 1
+    return True
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Fake chat completion endpoint"""
+    body = await request.json()
+    api_key = request.headers.get("authorization", "").removeprefix("Bearer ")
+
+    stats["chat_completions"] += 1
+    stats["calls_by_key"][api_key] = stats["calls_by_key"].get(api_key, 0) + 1
+    headers = _rate_limit_headers(api_key)
+    
+    if _take_rate_limit(api_key):
+        stats["rate_limited"] += 1
+        headers["retry-after"] = str(config["retry_after"])
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers=headers
+        )
+    
+    if random.random() < config["error_rate"]:
+        stats["errors"] += 1
+        await asyncio.sleep(config["latency"])
+        return JSONResponse(
+            {"error": {"message": "Injected fault", "type": "internal_server_error"}},
+            status_code=500
+        )
+    
+    if body.get("stream"):
+        return StreamingResponse(_stream_reply(body), media_type="text/event-stream", headers=headers)
+
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(config["latency"])
+        content = _reply_for(body.get("messages", []))
+    finally:
+        stats["in_flight"] -= 1
+
+    return JSONResponse({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }
+        ],
+        "usage": {
+            "prompt_tokens": sum(len(m.get("content", "").split()) for m in body.get("messages", [])),
+            "completion_tokens": len(content.split()),
+            "total_tokens": 0
+        }
+    }, headers=headers)
+
+def _fake_wav(text):
+    """Build a silent 16 kHz mono WAV lasting 50 ms per word, so different texts differ in size"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(16000)
+        audio.writeframes(b"\x00\x00" * 800 * max(len(text.split()), 1))
+    return buffer.getvalue()
+
+@app.post("/openai/v1/audio/speech")
+async def audio_speech(request: Request):
+    """Fake text to speech endpoint; always returns WAV audio"""
+    body = await request.json()
+    api_key = request.headers.get("authorization", "").removeprefix("Bearer ")
+    
+    stats["speech_calls"] += 1
+    stats["calls_by_key"][api_key] = stats["calls_by_key"].get(api_key, 0) + 1
+    headers = _rate_limit_headers(api_key)
+    
+    if _take_rate_limit(api_key):
+        stats["rate_limited"] += 1
+        headers["retry-after"] = str(config["retry_after"])
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers=headers
+        )
+    
+    await asyncio.sleep(config["latency"])
+    if random.random() < config["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(
+            {"error": {"message": "Injected fault", "type": "internal_server_error"}},
+            status_code=500
+        )
+    
+    return Response(_fake_wav(body.get("input", "")), media_type="audio/wav", headers=headers)
+
+@app.get("/stats")
+async def get_stats():
+    """Return call counters"""
+    return stats
+
+@app.post("/config")
+async def update_config(request: Request):
+    """Change behaviour settings (latency, error rate, rate limited keys...) at runtime"""
+    updates = await request.json()
+    unknown = set(updates) - set(config)
+    if unknown:
+        return JSONResponse({"error": f"Unknown settings: {sorted(unknown)}"}, status_code=400)
+    config.update(updates)
+    return config
+
+@app.post("/stats/reset")
+async def reset_stats():
+    """Reset call counters"""
+    for key in stats:
+        stats[key] = {} if key == "calls_by_key" else 0
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Groq-compatible LLM server")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before replying")
+    parser.add_argument("--token-interval", type=float, default=0.05, help="Seconds between streamed tokens")
+    parser.add_argument("--rate-limit-key", action="append", default=[], help="API key to answer with 429s (repeatable)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with 500 errors")
+    args = parser.parse_args()
+
+    config["latency"] = args.latency
+    config["token_interval"] = args.token_interval
+    config["rate_limited_keys"] = {key: -1 for key in args.rate_limit_key}
+    config["retry_after"] = args.retry_after
+    config["error_rate"] = args.error_rate
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -3,24 +3,99 @@ AI-Powered Course Recommendation System Backend
 FastAPI application for generating adaptive quiz questions and course recommendations
 """
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import logging
+import time
 import uvicorn
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 from api.routes import router
 from config.settings import get_settings
+from services.groq_service import GroqService
+from services.session_service import session_manager
+from services.tts_service import TTSService
+from utils.compression import CompressionMiddleware
+from utils.course_data import course_manager
+from utils.static_files import StaticFile
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create shared services once at startup and release them on shutdown
+    
+    The GroqService builds the quiz tree and a pooled HTTP client, so a
+    single instance is shared by every request instead of one per call.
+    Expired sessions are swept in the background while the app runs.
+    Video files are resolved once here rather than on every request.
+    Quiz questions and options are pre-synthesized into the speech cache
+    in the background, so deploys start with warm audio.
+    """
+    start = time.perf_counter()
+    try:
+        app.state.groq_service = GroqService()
+        app.state.groq_service.resolve_leaf_courses(course_manager.get_all_courses())
+        similarity_index = await course_manager.refresh_similarity_index()
+        app.state.groq_service.prerender_recommendations(course_manager.get_all_courses(), similarity_index)
+        logger.info(f"GroqService initialized in {(time.perf_counter() - start) * 1000:.1f} ms")
+    except ValueError as e:
+        app.state.groq_service = None
+        logger.error(f"GroqService not available: {str(e)}")
+    
+    video_dir = Path(__file__).parent / "videos"
+    app.state.video_files = {
+        # Fall back to the test video if the main video doesn't exist
+        "mp4": StaticFile.resolve([video_dir / "recommender-intro.mp4", video_dir / "test-video.mp4"], "video/mp4"),
+        "webm": StaticFile.resolve([video_dir / "recommender-intro.webm"], "video/webm"),
+    }
+    
+    settings = get_settings()
+    sweeper = None
+    if settings.session_sweep_interval_seconds > 0:
+        sweeper = asyncio.create_task(session_manager.run_sweeper(settings.session_sweep_interval_seconds))
+    
+    presynthesis = None
+    try:
+        app.state.tts_service = TTSService()
+        if settings.tts_presynthesize and app.state.groq_service:
+            texts = TTSService.quiz_texts(app.state.groq_service.quiz_engine)
+            presynthesis = asyncio.create_task(app.state.tts_service.presynthesize(texts))
+    except (ValueError, OSError) as e:
+        app.state.tts_service = None
+        logger.error(f"TTSService not available: {str(e)}")
+    
+    yield
+    
+    for task in (sweeper, presynthesis):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    if app.state.groq_service:
+        await app.state.groq_service.close()
+    if app.state.tts_service:
+        await app.state.tts_service.close()
+    session_manager.store.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Talkify Course Recommendation API",
     description="AI-powered system for career guidance and course recommendations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Get settings
@@ -35,6 +110,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger dynamic responses (streams, media and precompressed bodies are skipped)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size, compresslevel=6)
+
 # Include API routes
 app.include_router(router, prefix="/api/v1")
 
@@ -48,6 +126,30 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "API is operational"}
 
+@app.get("/health/llm")
+async def llm_health_check():
+    """
+    LLM dependency health, from the circuit breaker around Groq calls
+    
+    Returns 503 while the breaker is open (chat answers with a fallback
+    message) and 200 while it is closed or half-open. Once the open time
+    is up the breaker is reported half-open, even before a chat call has
+    probed Groq.
+    """
+    groq_service = getattr(app.state, "groq_service", None)
+    if groq_service is None:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "message": "Groq service is not available"}
+        )
+    
+    breaker = groq_service.llm_breaker.get_metrics()
+    status = {"closed": "healthy", "half_open": "recovering", "open": "unavailable"}[breaker["state"]]
+    return JSONResponse(
+        status_code=503 if breaker["state"] == "open" else 200,
+        content={"status": status, "circuit_breaker": breaker}
+    )
+
 @app.get("/key")
 async def get_api_key():
     """
@@ -0,0 +1,81 @@
+"""
+Import file-based sessions into the SQLite session store
+
+Usage:
+    python migrate_sessions.py --source data/sessions --db data/sessions.db
+"""
+
+import argparse
+import os
+from datetime import datetime
+
+from services.session_serializer import get_serializer, json_loads
+from services.session_store import SQLiteSessionStore
+
+def migrate_sessions(
+    source_dir: str,
+    db_path: str,
+    skip_existing: bool = False,
+    serializer: str = "orjson"
+) -> dict:
+    """
+    Copy every session JSON file in a directory into a SQLite store
+    
+    Args:
+        source_dir: Directory containing <session_id>.json files
+        db_path: Path of the SQLite database to import into
+        skip_existing: Leave sessions already in the database untouched
+        serializer: Record format to write ("json", "orjson" or "msgpack")
+    
+    Returns:
+        Summary with imported, skipped and failed counts
+    """
+    store = SQLiteSessionStore(db_path, get_serializer(serializer))
+    summary = {"imported": 0, "skipped": 0, "failed": 0}
+    existing = set(store.list_session_ids()) if skip_existing else set()
+    
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith('.json'):
+            continue
+        
+        filepath = os.path.join(source_dir, filename)
+        try:
+            # Metadata files may be in any serializer's format
+            with open(filepath, 'rb') as f:
+                session = store.serializer.loads(f.read())
+            
+            # Sessions written with a separate chat log keep messages in <id>.chat.jsonl
+            log_path = os.path.join(source_dir, f"{filename[:-5]}.chat.jsonl")
+            if os.path.exists(log_path):
+                with open(log_path, 'r', encoding='utf-8') as f:
+                    session["chat_history"] = [json_loads(line) for line in f if line.strip()]
+                if session["chat_history"]:
+                    session["last_activity"] = max(session.get("last_activity", ""), session["chat_history"][-1].get("timestamp", ""))
+            
+            session.setdefault("session_id", filename[:-5])
+            session.setdefault("last_activity", session.get("created_at") or datetime.now().isoformat())
+            if session["session_id"] in existing:
+                summary["skipped"] += 1
+                continue
+            
+            store.save(session)
+            store.replace_messages(session["session_id"], session.get("chat_history") or [])
+            summary["imported"] += 1
+        
+        except Exception as e:
+            print(f"Error importing {filename}: {e}")
+            summary["failed"] += 1
+    
+    store.close()
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import data/sessions/*.json into the SQLite session store")
+    parser.add_argument("--source", default="data/sessions", help="Directory with session JSON files")
+    parser.add_argument("--db", default="data/sessions.db", help="SQLite database path")
+    parser.add_argument("--skip-existing", action="store_true", help="Do not overwrite sessions already in the database")
+    parser.add_argument("--serializer", default="orjson", choices=["json", "orjson", "msgpack"], help="Record format to write")
+    args = parser.parse_args()
+    
+    summary = migrate_sessions(args.source, args.db, args.skip_existing, args.serializer)
+    print(f"Imported {summary['imported']} sessions, skipped {summary['skipped']}, failed {summary['failed']}")
@@ -41,6 +41,10 @@ class NextQuestionResponse(BaseModel):
     question_number: int = Field(..., description="Current question number (1-based)")
     total_questions_planned: int = Field(..., description="Total number of questions planned")
     session_id: Optional[str] = Field(None, description="Session identifier")
+    suggested_min_display_ms: int = Field(
+        0,
+        description="Minimum time the client should show its loading state before displaying the question"
+    )
 
 class RecommendationRequest(BaseModel):
     """Request model for getting course recommendation"""
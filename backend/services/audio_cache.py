@@ -0,0 +1,161 @@
+"""
+Disk-backed LRU cache of synthesized speech
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+def audio_key(text: str, model: str, voice: str, response_format: str) -> str:
+    """Content address of a synthesis: a SHA-256 of everything that changes the audio"""
+    return hashlib.sha256(
+        json.dumps([model, voice, response_format, text], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+class AudioCache:
+    """
+    Size-bounded LRU cache of audio files on disk
+    
+    Each file is stored as `<directory>/<key[:2]>/<key>.<format>`, so the
+    cache survives restarts and is shared by every worker on the host. A
+    hit sets the file's access time (explicitly, so noatime mounts work
+    too), and on startup the directory is scanned and files are ordered by
+    it. The modification time is left alone, so ETags stay stable.
+    Writes go through a temporary file and a rename, so readers never see
+    a partial file. Once the files exceed `max_bytes`, the least recently
+    used ones are deleted.
+    
+    Each worker keeps its own index. Files written by other workers are
+    picked up when they are requested.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int):
+        """Create the directory if needed and index the files already in it"""
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        
+        # key -> (path, size), least recently used first
+        self.entries: "OrderedDict[str, Tuple[Path, int]]" = OrderedDict()
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        
+        found = []
+        for path in self.directory.glob("*/*.*"):
+            if path.name.startswith("."):
+                continue  # Temporary file left by an interrupted write
+            stat = path.stat()
+            found.append((stat.st_atime_ns, path.stem, path, stat.st_size))
+        for _, key, path, size in sorted(found):
+            self.entries[key] = (path, size)
+            self.total_bytes += size
+        
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+    
+    def _path(self, key: str, response_format: str) -> Path:
+        """Get where a key's audio is stored"""
+        return self.directory / key[:2] / f"{key}.{response_format}"
+    
+    def get(self, key: str, response_format: str) -> Optional[Path]:
+        """
+        Look up cached audio and mark it recently used
+        
+        Blocking; call it from a worker thread.
+        
+        Args:
+            key: Content address from audio_key
+            response_format: Audio format, which is the file extension
+        
+        Returns:
+            Path of the audio file, or None on a miss
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                # Another worker may have synthesized it
+                path = self._path(key, response_format)
+                if path.is_file():
+                    entry = (path, path.stat().st_size)
+                    self.entries[key] = entry
+                    self.total_bytes += entry[1]
+            if entry is not None:
+                try:
+                    os.utime(entry[0], ns=(time.time_ns(), entry[0].stat().st_mtime_ns))
+                except FileNotFoundError:
+                    # Deleted behind our back (e.g. another worker evicted it)
+                    self.entries.pop(key)
+                    self.total_bytes -= entry[1]
+                    entry = None
+            
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return entry[0]
+    
+    def put(self, key: str, response_format: str, audio: bytes) -> Path:
+        """
+        Store audio, evicting the least recently used files if over the size limit
+        
+        Blocking; call it from a worker thread.
+        
+        Args:
+            key: Content address from audio_key
+            response_format: Audio format, used as the file extension
+            audio: Audio file contents
+        
+        Returns:
+            Path of the stored file
+        """
+        path = self._path(key, response_format)
+        path.parent.mkdir(exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(audio)
+            # Same clock as hits, so recency compares correctly after a restart
+            now = time.time_ns()
+            os.utime(temp_path, ns=(now, now))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self.entries[key] = (path, len(audio))
+            self.total_bytes += len(audio)
+            
+            # The newest file is kept even if it alone is over the limit
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, (old_path, size) = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                self.metrics["evictions"] += 1
+                try:
+                    old_path.unlink()
+                except FileNotFoundError:
+                    pass
+        return path
+    
+    def get_metrics(self) -> Dict:
+        """Get hit and miss counters and the size of the cache"""
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hit_rate": round(self.metrics["hits"] / lookups, 3) if lookups else 0.0,
+        }
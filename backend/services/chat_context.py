@@ -0,0 +1,227 @@
+"""
+Token budgeting and running summaries for chat context
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+# Approximate cost of the chat template around each message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text
+    
+    The model's tokenizer is not available locally, so this uses the usual
+    approximation of four characters per token for English text.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """Estimate the prompt tokens a chat message costs"""
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+class ChatContextManager:
+    """
+    Keeps the chat history sent to the model under a token budget
+    
+    A prompt is the system prompt, the session's running summary, the
+    messages the summary does not cover yet (the window) and the new user
+    message. The window is capped at `context_tokens - summary_tokens`,
+    newest messages first. Once the uncovered messages exceed the window,
+    the oldest ones are folded into the summary until the rest fit in half
+    of it. The summary is therefore rewritten every few turns rather than
+    on every turn, and the prompt prefix is stable in between.
+    
+    The summary is stored on the session as a dict with its `text`, its
+    estimated `tokens` and the number of chat messages it `covered`.
+    """
+    
+    def __init__(self, context_tokens: int, summary_tokens: int):
+        """
+        Initialize the context manager
+        
+        Args:
+            context_tokens: Budget for the summary plus the window (0 sends the whole history)
+            summary_tokens: Maximum length of the running summary
+        """
+        self.context_tokens = context_tokens
+        self.summary_tokens = summary_tokens
+        self.window_tokens = max(context_tokens - summary_tokens, 0)
+        self.metrics = {
+            "turns": 0,
+            "prompt_tokens": 0,
+            "full_history_prompt_tokens": 0,
+            "prompt_tokens_saved": 0,
+            "last_turn_prompt_tokens": 0,
+            "last_turn_prompt_tokens_saved": 0,
+            "summaries": 0,
+            "summary_fallbacks": 0,
+            "messages_summarized": 0,
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether the history is budgeted at all"""
+        return self.context_tokens > 0
+    
+    def build_messages(
+        self,
+        system_message: Dict[str, str],
+        conversation_history: List[Dict[str, str]],
+        user_message: str,
+        chat_summary: Optional[Dict] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Build the prompt for a chat turn and record its token savings
+        
+        Args:
+            system_message: System prompt message
+            conversation_history: Whole chat history before this turn
+            user_message: Current user message
+            chat_summary: Session's running summary, if any
+        
+        Returns:
+            Messages to send to the model
+        """
+        history = [{"role": msg["role"], "content": msg["content"]} for msg in conversation_history]
+        current = {"role": "user", "content": user_message}
+        
+        if not self.enabled:
+            messages = [system_message, *history, current]
+            self._record_turn(messages, messages)
+            return messages
+        
+        messages = [system_message]
+        covered = min(chat_summary["covered"], len(history)) if chat_summary else 0
+        if chat_summary and chat_summary.get("text"):
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation: {chat_summary['text']}"
+            })
+        
+        # Newest uncovered messages that fit; older ones are folded into the summary after the turn
+        window = []
+        used = 0
+        for message in reversed(history[covered:]):
+            tokens = message_tokens(message)
+            if used + tokens > self.window_tokens:
+                break
+            window.append(message)
+            used += tokens
+        
+        messages.extend(reversed(window))
+        messages.append(current)
+        
+        self._record_turn(messages, [system_message, *history, current])
+        return messages
+    
+    def _record_turn(self, sent: List[Dict[str, str]], full: List[Dict[str, str]]):
+        """Count the prompt tokens sent and saved against sending the whole history"""
+        sent_tokens = sum(message_tokens(message) for message in sent)
+        full_tokens = sum(message_tokens(message) for message in full)
+        
+        self.metrics["turns"] += 1
+        self.metrics["prompt_tokens"] += sent_tokens
+        self.metrics["full_history_prompt_tokens"] += full_tokens
+        self.metrics["prompt_tokens_saved"] += full_tokens - sent_tokens
+        self.metrics["last_turn_prompt_tokens"] = sent_tokens
+        self.metrics["last_turn_prompt_tokens_saved"] = full_tokens - sent_tokens
+    
+    def fold_range(self, conversation_history: List[Dict[str, str]], chat_summary: Optional[Dict] = None) -> Optional[Tuple[int, int]]:
+        """
+        Get the messages to fold into the summary
+        
+        Args:
+            conversation_history: Whole chat history
+            chat_summary: Session's running summary, if any
+        
+        Returns:
+            (start, end) slice of the history to summarize, or None if the
+            uncovered messages still fit the window
+        """
+        if not self.enabled:
+            return None
+        
+        covered = min(chat_summary["covered"], len(conversation_history)) if chat_summary else 0
+        tokens = [message_tokens(message) for message in conversation_history[covered:]]
+        remaining = sum(tokens)
+        if remaining <= self.window_tokens:
+            return None
+        
+        end = covered
+        for message_cost in tokens:
+            if remaining <= self.window_tokens // 2:
+                break
+            remaining -= message_cost
+            end += 1
+        return covered, end
+    
+    def summary_messages(self, chat_summary: Optional[Dict], messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Build the prompt asking the model to extend the running summary"""
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        previous = chat_summary["text"] if chat_summary and chat_summary.get("text") else "(none)"
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You maintain a running summary of a career guidance chat. Merge the new messages "
+                    "into the existing summary. Keep the user's goals, background, preferences and any "
+                    "advice or courses already given. Write plain sentences, at most "
+                    f"{self.summary_tokens * 3 // 4} words."
+                )
+            },
+            {
+                "role": "user",
+                "content": f"Existing summary:\n{previous}\n\nNew messages:\n{transcript}"
+            }
+        ]
+    
+    def fallback_summary_text(self, chat_summary: Optional[Dict], messages: List[Dict[str, str]]) -> str:
+        """Summarize without the model by keeping the start of each user message"""
+        parts = [chat_summary["text"]] if chat_summary and chat_summary.get("text") else []
+        for message in messages:
+            if message["role"] == "user":
+                parts.append(f"The user said: {message['content'][:120]}")
+        return " ".join(parts)
+    
+    def new_summary(
+        self,
+        chat_summary: Optional[Dict],
+        messages: List[Dict[str, str]],
+        covered: int,
+        text: Optional[str]
+    ) -> Dict:
+        """
+        Build the summary record after folding messages
+        
+        Args:
+            chat_summary: Previous summary, if any
+            messages: Messages that were folded
+            covered: Number of history messages the new summary covers
+            text: Summary written by the model, or None to fall back to an extractive one
+        
+        Returns:
+            Summary record to store on the session
+        """
+        if not text:
+            text = self.fallback_summary_text(chat_summary, messages)
+            self.metrics["summary_fallbacks"] += 1
+        
+        # Keep the most recent part if the summary overflows its budget
+        max_chars = self.summary_tokens * 4
+        if len(text) > max_chars:
+            text = text[-max_chars:].split(" ", 1)[-1]
+        
+        self.metrics["summaries"] += 1
+        self.metrics["messages_summarized"] += len(messages)
+        return {"text": text, "tokens": count_tokens(text), "covered": covered}
+    
+    def get_metrics(self) -> Dict:
+        """Get prompt token counters, including the average saved per turn"""
+        turns = self.metrics["turns"]
+        return {
+            **self.metrics,
+            "context_tokens": self.context_tokens,
+            "avg_prompt_tokens_saved_per_turn": round(self.metrics["prompt_tokens_saved"] / turns, 1) if turns else 0.0,
+        }
@@ -0,0 +1,185 @@
+"""
+Circuit breaker for calls to an unreliable dependency
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the dependency while the circuit is open"""
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that keeps failing or responding slowly
+    
+    The breaker is closed while things are normal. It records the outcome
+    of the last `window_size` calls. Once it has at least `minimum_calls`
+    outcomes, it opens if the share of failures reaches
+    `failure_rate_threshold`, or the share of calls slower than
+    `slow_call_seconds` reaches `slow_call_rate_threshold`.
+    
+    While open, calls are rejected straight away with CircuitOpenError,
+    so callers can fall back instantly instead of waiting for a timeout.
+    After `open_seconds` the breaker is half-open and lets
+    `half_open_probes` calls through. If they all succeed in time it
+    closes again with a fresh window; any failed or slow probe reopens it.
+    
+    Cancelled calls (e.g. a client disconnecting) count as neither.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 3
+    ):
+        """Initialize a closed breaker with an empty window"""
+        self.window_size = window_size
+        self.minimum_calls = min(minimum_calls, window_size)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        # (failed, slow) per call, oldest first
+        self.outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._probes_started = 0
+        self._probes_passed = 0
+        
+        self.metrics = {
+            "calls": 0,
+            "failures": 0,
+            "slow_calls": 0,
+            "rejected": 0,
+            "opened": 0,
+        }
+    
+    @property
+    def current_state(self) -> str:
+        """Get the state as seen by the next call: an open breaker whose open time is up is half-open"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            return self.HALF_OPEN
+        return self.state
+    
+    def check(self):
+        """Raise CircuitOpenError while the circuit is open, e.g. before queueing for a call slot"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at < self.open_seconds:
+            self.metrics["rejected"] += 1
+            raise CircuitOpenError("Circuit is open")
+    
+    def _admit(self) -> bool:
+        """Let a call through, returning whether it is a half-open probe, or raise CircuitOpenError"""
+        if self.state == self.OPEN:
+            self.check()
+            self.state = self.HALF_OPEN
+            self._probes_started = 0
+            self._probes_passed = 0
+        
+        if self.state == self.HALF_OPEN:
+            if self._probes_started >= self.half_open_probes:
+                self.metrics["rejected"] += 1
+                raise CircuitOpenError("Circuit is half-open and its probes are in flight")
+            self._probes_started += 1
+            return True
+        
+        return False
+    
+    def _open(self):
+        """Start rejecting calls"""
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.metrics["opened"] += 1
+    
+    def _record(self, probe: bool, failed: bool, duration: float):
+        """Record a finished call and open or close the breaker if needed"""
+        slow = duration >= self.slow_call_seconds
+        self.metrics["calls"] += 1
+        self.metrics["failures"] += failed
+        self.metrics["slow_calls"] += slow
+        
+        if probe:
+            # Outcomes of probes started before a reopen no longer matter
+            if self.state != self.HALF_OPEN:
+                return
+            if failed or slow:
+                self._open()
+                return
+            self._probes_passed += 1
+            if self._probes_passed >= self.half_open_probes:
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            return
+        
+        # Calls admitted before the breaker opened do not count against the next window
+        if self.state != self.CLOSED:
+            return
+        self.outcomes.append((failed, slow))
+        if len(self.outcomes) < self.minimum_calls:
+            return
+        
+        failure_rate, slow_rate = self._rates()
+        if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            self._open()
+    
+    def _release(self, probe: bool):
+        """Give back the probe slot of a cancelled call"""
+        if probe and self.state == self.HALF_OPEN:
+            self._probes_started -= 1
+    
+    def _rates(self) -> Tuple[float, float]:
+        """Get the failure and slow call rates over the window"""
+        if not self.outcomes:
+            return 0.0, 0.0
+        failures = sum(failed for failed, _ in self.outcomes)
+        slow = sum(slow for _, slow in self.outcomes)
+        return failures / len(self.outcomes), slow / len(self.outcomes)
+    
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """
+        Run a call under the breaker
+        
+        Raises CircuitOpenError without running the block while the circuit
+        is open. Exceptions raised by the block count as failures and are
+        re-raised; its duration decides whether it was slow.
+        """
+        probe = self._admit()
+        start = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self._release(probe)
+            raise
+        except Exception:
+            self._record(probe, True, time.monotonic() - start)
+            raise
+        self._record(probe, False, time.monotonic() - start)
+    
+    def get_metrics(self) -> Dict:
+        """Get the state, window rates and counters"""
+        failure_rate, slow_rate = self._rates()
+        state = self.current_state
+        metrics = {
+            "state": state,
+            **self.metrics,
+            "window_calls": len(self.outcomes),
+            "failure_rate": round(failure_rate, 3),
+            "slow_call_rate": round(slow_rate, 3),
+        }
+        if state == self.OPEN:
+            metrics["retry_in_seconds"] = round(max(self.opened_at + self.open_seconds - time.monotonic(), 0.0), 2)
+        return metrics
@@ -0,0 +1,280 @@
+"""
+Pool of Groq clients balanced across several API keys
+"""
+
+import asyncio
+import logging
+import math
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import httpx
+from groq import APIConnectionError, AsyncGroq, InternalServerError, RateLimitError
+from services.chat_context import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a rate limit header duration into seconds
+    
+    Accepts plain seconds (Retry-After) and Groq's reset format, such as
+    "2m59.56s", "7.66s" or "120ms". Returns None if it cannot be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+class PooledKey:
+    """A client for one API key and that key's rate limit state"""
+    
+    # Backoff after a failure when the server gives no Retry-After
+    BACKOFF_BASE_SECONDS = 0.5
+    BACKOFF_MAX_SECONDS = 30.0
+    
+    def __init__(self, api_key: str, client: AsyncGroq):
+        """Wrap a client, with unknown budgets until the first response"""
+        self.client = client
+        self.label = f"...{api_key[-4:]}"
+        self.in_flight = 0
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.metrics = {
+            "requests": 0,
+            "rate_limited": 0,
+            "failures": 0,
+        }
+    
+    def available_at(self, needed_tokens: int) -> float:
+        """Monotonic time from which the key can take a request needing this many tokens"""
+        at = self.cooldown_until
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            at = max(at, self.requests_reset_at)
+        if self.remaining_tokens is not None and self.remaining_tokens < needed_tokens:
+            at = max(at, self.tokens_reset_at)
+        return at
+    
+    def update_limits(self, headers: httpx.Headers, now: float):
+        """Record the remaining request and token budgets reported by the server"""
+        for budget in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{budget}")
+            if remaining is not None and remaining.isdigit():
+                setattr(self, f"remaining_{budget}", int(remaining))
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{budget}"))
+            if reset is not None:
+                setattr(self, f"{budget}_reset_at", now + reset)
+    
+    def back_off(self, retry_after: Optional[float], now: float):
+        """Take the key out of rotation after a 429 or a failed call"""
+        self.consecutive_failures += 1
+        if retry_after is None:
+            # Full jitter exponential backoff
+            ceiling = min(self.BACKOFF_MAX_SECONDS, self.BACKOFF_BASE_SECONDS * 2 ** (self.consecutive_failures - 1))
+            delay = random.uniform(ceiling / 2, ceiling)
+        else:
+            # Spread retries so requests waiting on this key do not all return at once
+            delay = retry_after * random.uniform(1.0, 1.2)
+        self.cooldown_until = max(self.cooldown_until, now + delay)
+
+class GroqClientPool:
+    """
+    Spreads chat completion and speech calls over several Groq API keys
+    
+    Each call goes to the usable key with the fewest calls in flight,
+    preferring the one with the most tokens left. Budgets come from the
+    x-ratelimit-* headers of every response. A key whose request or token
+    budget is spent is skipped until its reset time.
+    
+    A 429 takes the key out of rotation for its Retry-After (with jitter),
+    and the call fails over to another key straight away. Connection
+    errors and 5xx responses back off the key exponentially. If every key
+    is cooling down, the call waits for the first one to come back. After
+    `max_attempts` failed calls the last error is raised.
+    """
+    
+    def __init__(
+        self,
+        api_keys: Sequence[str],
+        base_url: Optional[str] = None,
+        timeout: float = 20,
+        max_attempts: int = 4,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        """
+        Create a client per key
+        
+        Args:
+            api_keys: Groq API keys; blanks and duplicates are ignored
+            base_url: API base URL override (e.g. a local fake server)
+            timeout: Timeout of a single upstream call in seconds
+            max_attempts: Upstream calls to make before giving up
+            http_client: Shared HTTP client, mainly for tests
+        
+        Raises:
+            ValueError: If no API key is given or max_attempts is below 1
+        """
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        
+        self.max_attempts = max_attempts
+        self.keys: List[PooledKey] = []
+        for api_key in dict.fromkeys(key for key in api_keys if key):
+            client_options: Dict[str, Any] = {
+                "api_key": api_key,
+                "timeout": timeout,
+                "max_retries": 0,  # Retries are handled here, across keys
+            }
+            if base_url:
+                client_options["base_url"] = base_url
+            if http_client is not None:
+                client_options["http_client"] = http_client
+            self.keys.append(PooledKey(api_key, AsyncGroq(**client_options)))
+        
+        if not self.keys:
+            raise ValueError("At least one Groq API key is required")
+        
+        self.metrics = {
+            "failovers": 0,
+            "waits": 0,
+        }
+    
+    def _pick(self, needed_tokens: int, now: float) -> Tuple[Optional[PooledKey], float]:
+        """Get the best usable key, or None and the seconds until one is usable"""
+        ready = [key for key in self.keys if key.available_at(needed_tokens) <= now]
+        if not ready:
+            return None, min(key.available_at(needed_tokens) for key in self.keys) - now
+        
+        # Unknown budgets rank first so every key is tried; requests sent break ties round robin
+        return min(
+            ready,
+            key=lambda key: (
+                key.in_flight,
+                -(key.remaining_tokens if key.remaining_tokens is not None else math.inf),
+                key.metrics["requests"]
+            )
+        ), 0.0
+    
+    async def create(self, **kwargs) -> Any:
+        """
+        Create a chat completion on the best available key
+        
+        Takes the same arguments as `chat.completions.create`.
+        
+        Returns:
+            The completion, or the stream if `stream=True`
+        
+        Raises:
+            The last rate limit or connection error if every attempt failed;
+            other API errors are raised immediately
+        """
+        needed_tokens = sum(count_tokens(message.get("content", "")) for message in kwargs.get("messages", []))
+        needed_tokens += kwargs.get("max_tokens") or 0
+        
+        async def parse(client: AsyncGroq) -> Any:
+            raw = await client.chat.completions.with_raw_response.create(**kwargs)
+            return raw.headers, await raw.parse()
+        
+        return await self._call(parse, needed_tokens)
+    
+    async def speech(self, **kwargs) -> bytes:
+        """
+        Synthesize speech on the best available key
+        
+        Takes the same arguments as `audio.speech.create`.
+        
+        Returns:
+            The audio file's bytes
+        """
+        async def read(client: AsyncGroq) -> Any:
+            raw = await client.audio.speech.with_raw_response.create(**kwargs)
+            return raw.headers, await raw.read()
+        
+        return await self._call(read, 0)
+    
+    async def _call(self, request: Callable[[AsyncGroq], Awaitable[Tuple[httpx.Headers, Any]]], needed_tokens: int) -> Any:
+        """
+        Make an API call, failing over between keys
+        
+        Args:
+            request: Makes the call with a client and returns the response headers and result
+            needed_tokens: Estimated tokens the call uses, to skip keys without the budget
+        
+        Returns:
+            The result of the first successful call
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            key, wait = self._pick(needed_tokens, time.monotonic())
+            while key is None:
+                # Every key is cooling down or out of budget
+                self.metrics["waits"] += 1
+                await asyncio.sleep(wait)
+                key, wait = self._pick(needed_tokens, time.monotonic())
+            
+            if attempt:
+                self.metrics["failovers"] += 1
+            
+            key.in_flight += 1
+            key.metrics["requests"] += 1
+            try:
+                headers, result = await request(key.client)
+                key.update_limits(headers, time.monotonic())
+                key.consecutive_failures = 0
+                return result
+            
+            except RateLimitError as e:
+                now = time.monotonic()
+                key.metrics["rate_limited"] += 1
+                key.update_limits(e.response.headers, now)
+                key.back_off(parse_duration(e.response.headers.get("retry-after")), now)
+                logger.warning(f"Groq key {key.label} rate limited, cooling it down")
+                last_error = e
+            
+            except (APIConnectionError, InternalServerError) as e:
+                key.metrics["failures"] += 1
+                key.back_off(None, time.monotonic())
+                logger.warning(f"Groq call on key {key.label} failed: {str(e)}")
+                last_error = e
+            
+            finally:
+                key.in_flight -= 1
+        
+        raise last_error
+    
+    async def close(self):
+        """Close every client"""
+        for key in self.keys:
+            await key.client.close()
+    
+    def get_metrics(self) -> Dict:
+        """Get failover counters and each key's budgets and counters"""
+        now = time.monotonic()
+        return {
+            **self.metrics,
+            "keys": [
+                {
+                    "key": key.label,
+                    **key.metrics,
+                    "in_flight": key.in_flight,
+                    "remaining_requests": key.remaining_requests,
+                    "remaining_tokens": key.remaining_tokens,
+                    "cooling_down_seconds": round(max(key.cooldown_until - now, 0.0), 2),
+                }
+                for key in self.keys
+            ]
+        }
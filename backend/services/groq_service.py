@@ -2,19 +2,32 @@
 Tree-based quiz service for structured career guidance
 """
 
+import asyncio
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any, Optional
-from groq import Groq
+from typing import List, Dict, Any, Optional, AsyncIterator, Sequence, Tuple
 from config.settings import get_settings
-from models.schemas import QuestionAnswer, Question, QuestionType, Course
+from models.schemas import QuestionAnswer, Question, QuestionType, Course, RecommendationResponse
+from services.chat_context import ChatContextManager
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.groq_pool import GroqClientPool
+from services.quiz_engine import CompiledQuizTree, QuizNode
+from services.response_cache import ChatResponseCache, normalize_message
+from services.single_flight import SingleFlight
+from utils.similarity_index import CourseSimilarityIndex
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class GroqService:
-    """Service class for tree-based career guidance quiz"""
+    """
+    Service class for tree-based career guidance quiz
+    
+    A single instance is created in the application lifespan and shared by
+    all requests, so the quiz tree and the pooled Groq clients are built once.
+    """
     
     def __init__(self):
         """Initialize the service with quiz tree"""
@@ -22,9 +35,45 @@ class GroqService:
         if not self.settings.groq_api_key:
             raise ValueError("GROQ_API_KEY environment variable is not set")
         
-        self.client = Groq(api_key=self.settings.groq_api_key)
+        # One client per key; calls go to the key with the most rate limit headroom
+        api_keys = [self.settings.groq_api_key, self.settings.groq_api_key2, *self.settings.groq_api_keys.split(",")]
+        self.client_pool = GroqClientPool(
+            [key.strip() for key in api_keys],
+            base_url=self.settings.groq_base_url or None,
+            timeout=self.settings.llm_timeout_seconds,
+            max_attempts=self.settings.llm_max_attempts
+        )
+        
+        # Bound the number of concurrent upstream LLM calls per worker
+        self.llm_semaphore = asyncio.Semaphore(self.settings.llm_max_concurrency)
+        
+        # Fail fast with a fallback while Groq is down or too slow
+        self.llm_breaker = CircuitBreaker(
+            window_size=self.settings.llm_breaker_window,
+            minimum_calls=self.settings.llm_breaker_min_calls,
+            failure_rate_threshold=self.settings.llm_breaker_failure_rate,
+            slow_call_seconds=self.settings.llm_breaker_slow_call_seconds,
+            slow_call_rate_threshold=self.settings.llm_breaker_slow_call_rate,
+            open_seconds=self.settings.llm_breaker_open_seconds,
+            half_open_probes=self.settings.llm_breaker_half_open_probes
+        )
+        
         self.model = "meta-llama/llama-4-scout-17b-16e-instruct"  # Using Mixtral model for better reasoning
         
+        # Token budget for chat history, with older turns folded into a running summary
+        self.chat_context = ChatContextManager(self.settings.chat_context_tokens, self.settings.chat_summary_tokens)
+        
+        # Answers to first-turn chat messages, which have no context and repeat often
+        self.response_cache = ChatResponseCache(
+            max_entries=self.settings.chat_cache_size,
+            ttl_seconds=self.settings.chat_cache_ttl_seconds,
+            similarity_threshold=self.settings.chat_cache_similarity,
+            near_duplicates=self.settings.chat_cache_near_duplicates
+        )
+        
+        # Identical chat prompts in flight at the same time share one upstream call
+        self.chat_flights = SingleFlight()
+        
         # Define the 6-step quiz tree structure following the specific path:
         # 1. Stream Selection -> 2. User Interest -> 3. Skills -> 4. Preferences -> 5. Analysis -> 6. Recommend
         self.quiz_tree = {
@@ -540,6 +589,28 @@ class GroqService:
                 }
             }
         }
+        
+        # Compile the nested tree once into a flat node table with path lookups
+        self.quiz_engine = CompiledQuizTree(self.quiz_tree)
+        
+        # Leaf node ID -> resolved Course, rebuilt whenever the course catalog changes
+        self.leaf_courses: Dict[int, Optional[Course]] = {}
+        self._resolved_catalog: Optional[List[Course]] = None
+        
+        # (subtree root ID, depth) -> (ETag, JSON body); the tree never changes at runtime
+        self._subtree_documents: Dict[Tuple[int, Optional[int]], Tuple[str, bytes]] = {}
+        
+        # Leaf answer path -> RecommendationResponse JSON body, rebuilt whenever the catalog or similarity index changes
+        self._recommendation_documents: Dict[Tuple[str, ...], bytes] = {}
+        self._rendered_catalog: Optional[List[Course]] = None
+        self._rendered_similarity: Optional[CourseSimilarityIndex] = None
+    
+    async def close(self):
+        """Close the pooled Groq HTTP clients and their connection pools"""
+        try:
+            await self.client_pool.close()
+        except Exception as e:
+            logger.warning(f"Error closing Groq client: {str(e)}")
     
     def generate_next_question(
         self, 
@@ -561,22 +632,17 @@ class GroqService:
             current_node = self._navigate_tree(conversation_history)
             
             # Check if we've reached step 5 (analysis) - this should be handled by should_recommend
-            if current_node.get("step") == 5 or "courses" in current_node:
+            if current_node.is_analysis:
                 # Generate a final confirmation or preference question
                 return self._generate_final_question(conversation_history, question_number)
             
-            # Extract question and options from current node
-            question_text = current_node["question"]
-            options = list(current_node["options"].keys())
-            
             # Determine if this is the final question based on the step
-            current_step = current_node.get("step", 1)
-            is_final = current_step >= 4  # Steps 4+ can lead to recommendations
+            is_final = current_node.step >= 4  # Steps 4+ can lead to recommendations
             
             return Question(
-                question=question_text,
+                question=current_node.question,
                 question_type=QuestionType.MULTIPLE_CHOICE,
-                options=options,
+                options=list(current_node.options),
                 is_final=is_final
             )
             
@@ -585,7 +651,7 @@ class GroqService:
             # Fallback question
             return self._get_fallback_question(question_number)
     
-    def _navigate_tree(self, conversation_history: List[QuestionAnswer]) -> Dict[str, Any]:
+    def _navigate_tree(self, conversation_history: List[QuestionAnswer]) -> QuizNode:
         """
         Navigate the 6-step quiz tree based on conversation history
         
@@ -593,17 +659,13 @@ class GroqService:
             conversation_history: List of previous Q&A pairs
             
         Returns:
-            Current node in the tree
+            Current node in the compiled tree
         """
-        current_node = self.quiz_tree
+        current_node = self.quiz_engine.resolve(tuple([qa.answer for qa in conversation_history]))
         
-        for qa in conversation_history:
-            if "options" in current_node and qa.answer in current_node["options"]:
-                current_node = current_node["options"][qa.answer]
-            else:
-                # Answer not found in current options, return current node
-                logger.warning(f"Answer '{qa.answer}' not found in current node options")
-                break
+        if len(current_node.path) < len(conversation_history):
+            # Answer not found in current options, return current node
+            logger.warning(f"Answer '{conversation_history[current_node.depth].answer}' not found in current node options")
         
         return current_node
     
@@ -620,12 +682,13 @@ class GroqService:
         current_node = self._navigate_tree(conversation_history)
         
         # Check if we've reached step 5 (analysis) or have course options
-        return current_node.get("step") == 5 or "courses" in current_node
+        return current_node.is_analysis
     
     def generate_course_recommendation(
         self, 
         conversation_history: List[QuestionAnswer], 
-        available_courses: List[Course]
+        available_courses: List[Course],
+        similarity_index: Optional[CourseSimilarityIndex] = None
     ) -> Dict[str, Any]:
         """
         Generate course recommendation based on 6-step tree navigation
@@ -633,6 +696,8 @@ class GroqService:
         Args:
             conversation_history: Complete Q&A history
             available_courses: List of available courses
+            similarity_index: Similarity index of the catalog, for alternative
+                courses (none are suggested without it)
             
         Returns:
             Dictionary with recommendation details
@@ -642,39 +707,16 @@ class GroqService:
             current_node = self._navigate_tree(conversation_history)
             
             # Get the course recommendations from the analysis
-            if "courses" not in current_node:
+            if current_node.courses is None:
                 logger.warning("No course recommendations found in current tree position")
                 return self._get_fallback_recommendation(available_courses)
             
-            recommended_course_names = current_node["courses"]
-            analysis_type = current_node.get("analysis", "general_analysis")
+            analysis_type = current_node.analysis or "general_analysis"
             
-            # Find the best matching course
-            recommended_course = None
-            for course_name in recommended_course_names:
-                for course in available_courses:
-                    if course.name.lower() == course_name.lower():
-                        recommended_course = course
-                        break
-                if recommended_course:
-                    break
-            
-            # If exact match not found, try partial matching
-            if not recommended_course:
-                for course_name in recommended_course_names:
-                    for course in available_courses:
-                        if any(keyword.lower() in course.name.lower() or 
-                              keyword.lower() in ' '.join(course.tags or []).lower()
-                              for keyword in course_name.lower().split()):
-                            recommended_course = course
-                            break
-                    if recommended_course:
-                        break
-            
-            # Fallback to first course if no match found
-            if not recommended_course and available_courses:
-                recommended_course = available_courses[0]
-                logger.warning(f"No matching course found for {recommended_course_names}, using fallback")
+            # Leaf courses are resolved once per catalog, so this is a lookup
+            if available_courses is not self._resolved_catalog:
+                self.resolve_leaf_courses(available_courses)
+            recommended_course = self.leaf_courses.get(current_node.id)
             
             # Generate reasoning based on the 6-step path
             reasoning = self._generate_6step_reasoning(conversation_history, analysis_type, recommended_course.name if recommended_course else "")
@@ -682,11 +724,19 @@ class GroqService:
             # Extract key factors from the 6-step conversation path
             key_factors = self._extract_6step_factors(conversation_history)
             
+            # Nearest neighbours from the precomputed similarity table
+            alternatives = None
+            if recommended_course and similarity_index is not None and self.settings.recommendation_alternatives > 0:
+                alternatives = similarity_index.similar_courses(
+                    recommended_course, self.settings.recommendation_alternatives
+                ) or None
+            
             return {
                 "recommended_course": recommended_course,
                 "confidence_score": 0.95,  # High confidence due to structured 6-step process
                 "reasoning": reasoning,
-                "key_matching_factors": key_factors
+                "key_matching_factors": key_factors,
+                "alternative_courses": alternatives
             }
             
         except Exception as e:
@@ -726,6 +776,154 @@ class GroqService:
                 "reasoning": reasoning,
                 "key_matching_factors": key_factors
             }
+    
+    def resolve_leaf_courses(self, available_courses: List[Course]) -> Dict[str, Any]:
+        """
+        Resolve the course names of every quiz tree leaf to Course objects
+        
+        Uses the same matching order as a per-request lookup: an exact
+        (case-insensitive) name match for any of the leaf's course names,
+        then a keyword match against course names and tags, then the first
+        available course.
+        
+        Args:
+            available_courses: Current course catalog
+            
+        Returns:
+            Validation report with match counts and unresolved course names
+        """
+        courses_by_name = {}
+        for course in available_courses:
+            courses_by_name.setdefault(course.name.lower(), course)
+        
+        leaf_courses = {}
+        report = {"leaves": 0, "exact": 0, "partial": [], "fallback": [], "unresolved_names": []}
+        
+        for leaf in self.quiz_engine.leaves():
+            report["leaves"] += 1
+            
+            unresolved = [name for name in leaf.courses if name.lower() not in courses_by_name]
+            report["unresolved_names"].extend(name for name in unresolved if name not in report["unresolved_names"])
+            
+            # Find the best matching course
+            recommended_course = next(
+                (courses_by_name[name.lower()] for name in leaf.courses if name.lower() in courses_by_name),
+                None
+            )
+            
+            if recommended_course:
+                report["exact"] += 1
+            else:
+                # If exact match not found, try partial matching
+                for course_name in leaf.courses:
+                    for course in available_courses:
+                        if any(keyword.lower() in course.name.lower() or 
+                              keyword.lower() in ' '.join(course.tags or []).lower()
+                              for keyword in course_name.lower().split()):
+                            recommended_course = course
+                            break
+                    if recommended_course:
+                        break
+                
+                if recommended_course:
+                    report["partial"].append(leaf.analysis)
+                elif available_courses:
+                    # Fallback to first course if no match found
+                    recommended_course = available_courses[0]
+                    report["fallback"].append(leaf.analysis)
+            
+            leaf_courses[leaf.id] = recommended_course
+        
+        self.leaf_courses = leaf_courses
+        self._resolved_catalog = available_courses
+        
+        logger.info(
+            f"Resolved courses for {report['leaves']} quiz leaves: {report['exact']} exact, "
+            f"{len(report['partial'])} partial, {len(report['fallback'])} fallback"
+        )
+        if report["unresolved_names"]:
+            logger.warning(f"Quiz tree course names not found in catalog: {report['unresolved_names']}")
+        if report["fallback"]:
+            logger.warning(f"No matching course found for leaves {report['fallback']}, using fallback")
+        
+        return report
+    
+    def prerender_recommendations(
+        self,
+        available_courses: List[Course],
+        similarity_index: Optional[CourseSimilarityIndex] = None
+    ) -> int:
+        """
+        Render the recommendation response for every quiz tree leaf
+        
+        A recommendation depends only on the answer path and the catalog,
+        so each leaf's RecommendationResponse is built once with
+        generate_course_recommendation and kept as JSON bytes.
+        
+        Args:
+            available_courses: Current course catalog
+            similarity_index: Similarity index of the catalog, for alternative courses
+        
+        Returns:
+            Number of rendered recommendations
+        """
+        documents = {}
+        for leaf in self.quiz_engine.leaves():
+            if not self._recommendation_due(leaf, leaf.depth):
+                continue
+            
+            # Only the answers matter to the recommendation, but keep the history realistic
+            history = []
+            node = self.quiz_engine.root
+            for answer in leaf.path:
+                history.append(QuestionAnswer(
+                    question=node.question or "",
+                    answer=answer,
+                    question_type=QuestionType.MULTIPLE_CHOICE,
+                    options=list(node.options)
+                ))
+                node = self.quiz_engine.nodes[node.children[answer]]
+            
+            recommendation_data = self.generate_course_recommendation(history, available_courses, similarity_index)
+            if recommendation_data["recommended_course"] is None:
+                continue
+            
+            response = RecommendationResponse(
+                recommended_course=recommendation_data["recommended_course"],
+                confidence_score=recommendation_data["confidence_score"],
+                reasoning=recommendation_data["reasoning"],
+                alternative_courses=recommendation_data.get("alternative_courses")
+            )
+            documents[leaf.path] = response.model_dump_json().encode("utf-8")
+        
+        self._recommendation_documents = documents
+        self._rendered_catalog = available_courses
+        self._rendered_similarity = similarity_index
+        logger.info(f"Prerendered {len(documents)} recommendations")
+        return len(documents)
+    
+    def get_prerendered_recommendation(
+        self,
+        conversation_history: List[QuestionAnswer],
+        available_courses: List[Course],
+        similarity_index: Optional[CourseSimilarityIndex] = None
+    ) -> Optional[bytes]:
+        """
+        Get the prerendered recommendation for a conversation history
+        
+        Args:
+            conversation_history: Complete Q&A history
+            available_courses: Current course catalog
+            similarity_index: Similarity index of the catalog, for alternative courses
+        
+        Returns:
+            RecommendationResponse JSON body, or None if the answers are not
+            exactly a leaf path (for example with extra final questions)
+        """
+        if available_courses is not self._rendered_catalog or similarity_index is not self._rendered_similarity:
+            self.prerender_recommendations(available_courses, similarity_index)
+        return self._recommendation_documents.get(tuple(qa.answer for qa in conversation_history))
+    
     def _generate_6step_reasoning(self, conversation_history: List[QuestionAnswer], analysis_type: str, course_name: str) -> str:
         """
         Generate reasoning based on the 6-step path taken through the decision tree
@@ -844,6 +1042,52 @@ class GroqService:
         
         return factors[:5]  # Return max 5 factors
     
+    def get_quiz_subtree(self, answers: Sequence[str], depth: Optional[int] = None) -> Tuple[str, bytes]:
+        """
+        Get the quiz subtree reachable from an answer path as a JSON document
+        
+        The client can walk the returned nodes locally, following each
+        option to its child node ID, until it reaches a node marked
+        "recommend" and calls /recommend. Documents are built once per
+        subtree root and depth.
+        
+        Args:
+            answers: Answers given so far, in order
+            depth: Maximum number of answers below the current node (unlimited if None)
+            
+        Returns:
+            Tuple of (ETag, JSON body)
+        """
+        current_node = self.quiz_engine.resolve(tuple(answers))
+        key = (current_node.id, depth)
+        
+        document = self._subtree_documents.get(key)
+        if document is None:
+            nodes = []
+            for node in self.quiz_engine.subtree(current_node.id, depth):
+                entry: Dict[str, Any] = {"id": node.id, "step": node.step}
+                if node.question:
+                    entry["question"] = node.question
+                    entry["options"] = [[answer, node.children[answer]] for answer in node.options]
+                    entry["is_final"] = node.step >= 4
+                entry["recommend"] = self._recommendation_due(node, node.depth)
+                nodes.append(entry)
+            
+            body = json.dumps(
+                {
+                    "version": self.quiz_engine.version,
+                    "root": current_node.id,
+                    "path": list(current_node.path),
+                    "nodes": nodes
+                },
+                ensure_ascii=False,
+                separators=(",", ":")
+            ).encode("utf-8")
+            etag = f'"{self.quiz_engine.version}-{current_node.id}-{depth if depth is not None else "all"}"'
+            document = self._subtree_documents[key] = (etag, body)
+        
+        return document
+    
     def _generate_final_question(self, conversation_history: List[QuestionAnswer], question_number: int) -> Question:
         """
         Generate final preference questions before recommendation
@@ -966,31 +1210,30 @@ class GroqService:
         try:
             # Check if we've reached step 5 (analysis) or have enough questions
             current_node = self._navigate_tree(conversation_history)
-            
-            # If we've reached step 5 (analysis) with course options, we can recommend
-            if current_node.get("step") == 5 and "courses" in current_node:
-                return True
-                
-            # If we have completed the main 4-step assessment, we can recommend
-            if len(conversation_history) >= 4:
-                return True
-                
-            # Otherwise, continue with questions
-            return False
+            return self._recommendation_due(current_node, len(conversation_history))
             
         except Exception as e:
             logger.error(f"Error checking if should recommend: {str(e)}")
             # Fallback: recommend after 4 questions for the 6-step process
             return len(conversation_history) >= 4
 
+    def _recommendation_due(self, node: QuizNode, answered: int) -> bool:
+        """Check if a recommendation is due at a node after the given number of answers"""
+        # If we've reached step 5 (analysis) with course options, we can recommend
+        if node.step == 5 and node.courses is not None:
+            return True
+        
+        # If we have completed the main 4-step assessment, we can recommend
+        return answered >= 4
+    
     def _get_fallback_question(self, question_number: int, is_final: bool = False) -> Question:
         """Get a fallback question if tree navigation fails"""
         
         # Return the root question as fallback
         return Question(
-            question=self.quiz_tree["question"],
+            question=self.quiz_engine.root.question,
             question_type=QuestionType.MULTIPLE_CHOICE,
-            options=list(self.quiz_tree["options"].keys()),
+            options=list(self.quiz_engine.root.options),
             is_final=is_final
         )
     
@@ -1012,62 +1255,193 @@ class GroqService:
             "key_matching_factors": ["General recommendation"]
         }
 
-    def generate_chat_response(self, conversation_history: List[Dict[str, str]], user_message: str) -> str:
+    async def generate_chat_response(
+        self,
+        conversation_history: List[Dict[str, str]],
+        user_message: str,
+        chat_summary: Optional[Dict] = None
+    ) -> str:
         """
-        Generate a chat response using Groq
+        Generate a chat response using the async Groq client
         
         Args:
             conversation_history: List of previous messages in format [{"role": "user/assistant", "content": "..."}]
             user_message: Current user message
+            chat_summary: Session's running summary of older messages, if any
             
         Returns:
             AI-generated response
         """
+        # Without earlier turns the answer depends only on the message, so it can be reused
+        cacheable = not conversation_history and not chat_summary
+        if cacheable:
+            cached = self.response_cache.get(user_message)
+            if cached is not None:
+                return cached
+        
         try:
-            # Build the conversation context
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are Talkify, a helpful AI assistant for career guidance and educational support. You help users with:
-                    - Career advice and recommendations
-                    - Course suggestions and educational paths
-                    - Study tips and learning strategies
-                    - Technology and programming questions
-                    - General educational guidance
-                    - dont use *emojies*, or symols or punctuation marks expect comma,and dot or interogative marks
-                    - never use *,',",`
-                    Be conversational, helpful, and encouraging. Keep responses SHORT and CONCISE - aim for 1-2 sentences or 1 short paragraph maximum.
-                    Provide direct, actionable advice without lengthy explanations."""
-                }
-            ]
+            messages = self._build_chat_messages(conversation_history, user_message, chat_summary)
             
-            # Add conversation history
-            for msg in conversation_history:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            async def call_model():
+                # Generate response using Groq without blocking the event loop
+                self.llm_breaker.check()
+                async with self.llm_semaphore, self.llm_breaker.guard():
+                    return await asyncio.wait_for(
+                        self.client_pool.create(
+                            model=self.model,
+                            messages=messages,
+                            max_tokens=250,  # Reduced from 1000 to 250 for shorter responses
+                            temperature=0.7,
+                            stream=False
+                        ),
+                        timeout=self.settings.llm_timeout_seconds
+                    )
             
-            # Add current user message
-            messages.append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            # Generate response using Groq
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=250,  # Reduced from 1000 to 250 for shorter responses
-                temperature=0.7,
-                stream=False
-            )
+            # Identical prompts already in flight share that call's response
+            response = await self.chat_flights.run(self._chat_flight_key(messages), call_model)
             
             if response.choices and len(response.choices) > 0:
-                return response.choices[0].message.content.strip()
+                content = response.choices[0].message.content.strip()
+                # Fallback messages below are never cached
+                if cacheable and content:
+                    self.response_cache.put(user_message, content)
+                return content
             else:
                 return "I'm sorry, I couldn't generate a response at the moment. Please try again."
                 
+        except CircuitOpenError:
+            # Groq has been failing; answer at once instead of waiting for another timeout
+            return "I'm experiencing some technical difficulties. Please try again in a moment."
+        except asyncio.TimeoutError:
+            logger.error(f"Chat response timed out after {self.settings.llm_timeout_seconds}s")
+            return "I'm experiencing some technical difficulties. Please try again in a moment."
         except Exception as e:
             logger.error(f"Error generating chat response: {str(e)}")
             return "I'm experiencing some technical difficulties. Please try again in a moment."
+    
+    def _chat_flight_key(self, messages: List[Dict[str, str]]) -> str:
+        """Key a chat call by a hash of its context and the normalized user message"""
+        context = hashlib.sha256(
+            json.dumps(messages[:-1], ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return f"{context}:{normalize_message(messages[-1]['content'])}"
+    
+    async def stream_chat_response(
+        self,
+        conversation_history: List[Dict[str, str]],
+        user_message: str,
+        chat_summary: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat response from Groq token by token
+        
+        Args:
+            conversation_history: List of previous messages in format [{"role": "user/assistant", "content": "..."}]
+            user_message: Current user message
+            chat_summary: Session's running summary of older messages, if any
+            
+        Yields:
+            Response text fragments as they arrive from the model
+        
+        Raises:
+            CircuitOpenError: Before any fragment, while the LLM circuit breaker is open
+        """
+        messages = self._build_chat_messages(conversation_history, user_message, chat_summary)
+        
+        self.llm_breaker.check()
+        async with self.llm_semaphore:
+            # The breaker judges the stream by its time to first byte
+            async with self.llm_breaker.guard():
+                stream = await asyncio.wait_for(
+                    self.client_pool.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=250,
+                        temperature=0.7,
+                        stream=True
+                    ),
+                    timeout=self.settings.llm_timeout_seconds
+                )
+            
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+    
+    async def update_chat_summary(
+        self,
+        conversation_history: List[Dict[str, str]],
+        chat_summary: Optional[Dict] = None
+    ) -> Optional[Dict]:
+        """
+        Fold the oldest chat messages into the running summary once they no longer fit the context budget
+        
+        Args:
+            conversation_history: Whole chat history
+            chat_summary: Session's current running summary, if any
+        
+        Returns:
+            The new summary to store on the session, or None if nothing needed folding
+        """
+        fold = self.chat_context.fold_range(conversation_history, chat_summary)
+        if fold is None:
+            return None
+        
+        start, end = fold
+        folded = conversation_history[start:end]
+        text = None
+        try:
+            self.llm_breaker.check()
+            async with self.llm_semaphore, self.llm_breaker.guard():
+                response = await asyncio.wait_for(
+                    self.client_pool.create(
+                        model=self.model,
+                        messages=self.chat_context.summary_messages(chat_summary, folded),
+                        max_tokens=self.settings.chat_summary_tokens,
+                        temperature=0.2,
+                        stream=False
+                    ),
+                    timeout=self.settings.llm_timeout_seconds
+                )
+            if response.choices:
+                text = (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            # Fall back to an extractive summary so the window still shrinks
+            logger.warning(f"Error summarizing chat history: {str(e)}")
+        
+        return self.chat_context.new_summary(chat_summary, folded, end, text)
+    
+    def _build_chat_messages(
+        self,
+        conversation_history: List[Dict[str, str]],
+        user_message: str,
+        chat_summary: Optional[Dict] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Build the message list sent to the LLM for a chat turn
+        
+        Args:
+            conversation_history: List of previous messages
+            user_message: Current user message
+            chat_summary: Session's running summary of older messages, if any
+            
+        Returns:
+            Messages including the system prompt, the summary and recent
+            history within the token budget, and the new user message
+        """
+        # Build the conversation context
+        system_message = {
+            "role": "system",
+            "content": """You are Talkify, a helpful AI assistant for career guidance and educational support. You help users with:
+                - Career advice and recommendations
+                - Course suggestions and educational paths
+                - Study tips and learning strategies
+                - Technology and programming questions
+                - General educational guidance
+                - dont use *emojies*, or symols or punctuation marks expect comma,and dot or interogative marks
+                - never use *,',",`
+                Be conversational, helpful, and encouraging. Keep responses SHORT and CONCISE - aim for 1-2 sentences or 1 short paragraph maximum.
+                Provide direct, actionable advice without lengthy explanations."""
+        }
+        
+        # Add the history that fits the budget and the current user message
+        return self.chat_context.build_messages(system_message, conversation_history, user_message, chat_summary)
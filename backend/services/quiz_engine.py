@@ -0,0 +1,163 @@
+"""
+Compiled quiz tree for constant-time navigation
+"""
+
+import hashlib
+import json
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+class QuizNode:
+    """A single node of the compiled quiz tree"""
+    
+    __slots__ = (
+        "id",
+        "parent_id",
+        "step",
+        "question",
+        "options",
+        "children",
+        "analysis",
+        "courses",
+        "path",
+    )
+    
+    def __init__(
+        self,
+        node_id: int,
+        parent_id: Optional[int],
+        step: int,
+        path: Tuple[str, ...],
+        question: Optional[str] = None,
+        analysis: Optional[str] = None,
+        courses: Optional[Tuple[str, ...]] = None
+    ):
+        self.id = node_id
+        self.parent_id = parent_id
+        self.step = step
+        self.path = path
+        self.question = question
+        self.options: Tuple[str, ...] = ()
+        self.children: Dict[str, int] = {}
+        self.analysis = analysis
+        self.courses = courses
+    
+    @property
+    def is_analysis(self) -> bool:
+        """Whether this node is an analysis (recommendation) node"""
+        return self.step == 5 or self.courses is not None
+    
+    @property
+    def depth(self) -> int:
+        """Number of answers needed to reach this node"""
+        return len(self.path)
+
+class CompiledQuizTree:
+    """
+    Flat, integer-indexed form of the nested quiz tree dict
+    
+    Nodes are stored in a list in depth-first order, each with an
+    answer -> child ID index. Every reachable answer path is also
+    indexed so that resolving a conversation history is a single
+    dictionary lookup.
+    
+    `version` is a content hash of the source tree, so anything derived
+    from the tree (such as cached subtree documents) can be versioned by it.
+    """
+    
+    def __init__(self, tree: Dict[str, Any]):
+        """Compile the nested tree dict into the node table"""
+        self.nodes: List[QuizNode] = []
+        self.path_index: Dict[Tuple[str, ...], int] = {}
+        self._compile(tree)
+        self.root = self.nodes[0]
+        self.version = hashlib.sha1(
+            json.dumps(tree, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+    
+    def _compile(self, tree: Dict[str, Any]):
+        """Assign node IDs in depth-first order and build the indexes"""
+        stack = [(tree, None, ())]
+        
+        while stack:
+            raw_node, parent_id, path = stack.pop()
+            
+            node = QuizNode(
+                node_id=len(self.nodes),
+                parent_id=parent_id,
+                step=raw_node.get("step", 1),
+                path=path,
+                question=raw_node.get("question"),
+                analysis=raw_node.get("analysis"),
+                courses=tuple(raw_node["courses"]) if "courses" in raw_node else None
+            )
+            self.nodes.append(node)
+            self.path_index[path] = node.id
+            
+            if parent_id is not None:
+                self.nodes[parent_id].children[path[-1]] = node.id
+            
+            options = raw_node.get("options", {})
+            node.options = tuple(options.keys())
+            
+            # Push children in reverse so they are numbered in option order
+            for answer in reversed(node.options):
+                stack.append((options[answer], node.id, path + (answer,)))
+    
+    def resolve(self, answers: Sequence[str]) -> QuizNode:
+        """
+        Resolve an answer path to its node
+        
+        Matches the behaviour of walking the tree from the root and
+        stopping at the first answer that is not an option of the
+        current node.
+        
+        Args:
+            answers: Answers in the order they were given
+        
+        Returns:
+            The deepest node reached by the answers
+        """
+        if not isinstance(answers, tuple):
+            answers = tuple(answers)
+        
+        node_id = self.path_index.get(answers)
+        if node_id is not None:
+            return self.nodes[node_id]
+        
+        # Path leaves the tree (e.g. extra final questions), walk until it does
+        node = self.root
+        for answer in answers:
+            child_id = node.children.get(answer)
+            if child_id is None:
+                break
+            node = self.nodes[child_id]
+        
+        return node
+    
+    def subtree(self, node_id: int, depth: Optional[int] = None) -> List[QuizNode]:
+        """
+        Get the nodes reachable from a node, breadth first
+        
+        Args:
+            node_id: ID of the subtree root
+            depth: Maximum number of answers below the root (unlimited if None)
+        
+        Returns:
+            The root followed by its descendants
+        """
+        root = self.nodes[node_id]
+        nodes = []
+        queue = deque([root])
+        
+        while queue:
+            node = queue.popleft()
+            nodes.append(node)
+            if depth is None or node.depth - root.depth < depth:
+                queue.extend(self.nodes[child_id] for child_id in node.children.values())
+        
+        return nodes
+    
+    def leaves(self) -> List[QuizNode]:
+        """Get all analysis nodes with course recommendations"""
+        return [node for node in self.nodes if node.courses is not None]
@@ -0,0 +1,190 @@
+"""
+Response cache for first-turn chat messages
+"""
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from utils.search_index import tokenize
+
+try:
+    import numpy as np
+except ImportError:  # Optional, near-duplicate matching is skipped without it
+    np = None
+
+# Ignored when comparing messages, so the words that carry the meaning decide a match
+STOPWORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "am", "do", "does", "did",
+    "i", "me", "my", "you", "your", "we", "it", "its", "s", "this", "that",
+    "what", "which", "who", "how", "can", "could", "would", "should", "will",
+    "of", "for", "to", "in", "on", "at", "about", "with", "and", "or",
+    "please", "tell", "know", "want", "like",
+})
+
+def normalize_message(message: str) -> str:
+    """Normalize a message for exact matching (case, punctuation and spacing are ignored)"""
+    return " ".join(tokenize(message))
+
+class ChatResponseCache:
+    """
+    Size-bounded LRU cache of chat responses with a time to live
+    
+    Entries are keyed on the normalized message text. With near-duplicate
+    matching enabled, each entry also gets a hashed embedding: its content
+    words and their bigrams, hashed into `dimensions` signed buckets and
+    L2-normalized. A miss on the exact key then looks for the most similar
+    cached message and uses it if the cosine similarity reaches
+    `similarity_threshold`. The embeddings live in one NumPy matrix, so
+    that lookup is a single matrix-vector product.
+    
+    Each worker process has its own cache.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.9,
+        near_duplicates: bool = True,
+        dimensions: int = 512
+    ):
+        """Initialize an empty cache"""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.near_duplicates = near_duplicates and np is not None and max_entries > 0
+        self.dimensions = dimensions
+        
+        # key -> (response, expires_at, embedding row)
+        self.entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if self.near_duplicates:
+            self._embeddings = np.zeros((max_entries, dimensions), dtype=np.float32)
+            self._row_keys: List[Optional[str]] = [None] * max_entries
+            self._free_rows = list(range(max_entries - 1, -1, -1))
+        
+        self.metrics = {
+            "hits": 0,
+            "near_duplicate_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether responses are cached at all"""
+        return self.max_entries > 0
+    
+    def _embed(self, message: str):
+        """Hash a message's content words and bigrams into a unit vector, or None if it has none"""
+        words = [token for token in tokenize(message) if token not in STOPWORDS]
+        features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+        if not features:
+            return None
+        
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in features:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # The top bit picks the sign so colliding features tend to cancel out
+            vector[digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    def _remove(self, key: str):
+        """Drop an entry and free its embedding row (caller holds the lock)"""
+        _, _, row = self.entries.pop(key)
+        if row >= 0:
+            self._embeddings[row] = 0.0
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+    
+    def _live_entry(self, key: str, now: float) -> Optional[str]:
+        """Get an unexpired entry's response and mark it recently used (caller holds the lock)"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            self._remove(key)
+            self.metrics["expirations"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+    
+    def get(self, message: str) -> Optional[str]:
+        """
+        Look up the response for a message
+        
+        Args:
+            message: User message as sent
+        
+        Returns:
+            Cached response, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        key = normalize_message(message)
+        now = time.monotonic()
+        with self._lock:
+            response = self._live_entry(key, now)
+            if response is not None:
+                self.metrics["hits"] += 1
+                return response
+            
+            if self.near_duplicates and self.entries:
+                vector = self._embed(message)
+                if vector is not None:
+                    similarities = self._embeddings @ vector
+                    row = int(np.argmax(similarities))
+                    if similarities[row] >= self.similarity_threshold and self._row_keys[row] is not None:
+                        response = self._live_entry(self._row_keys[row], now)
+                        if response is not None:
+                            self.metrics["near_duplicate_hits"] += 1
+                            return response
+            
+            self.metrics["misses"] += 1
+            return None
+    
+    def put(self, message: str, response: str):
+        """
+        Cache the response to a message, evicting the least recently used entry if full
+        
+        Args:
+            message: User message as sent
+            response: Model response to reuse
+        """
+        if not self.enabled:
+            return
+        
+        key = normalize_message(message)
+        if not key:
+            return
+        
+        vector = self._embed(message) if self.near_duplicates else None
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            while len(self.entries) >= self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.metrics["evictions"] += 1
+            
+            row = -1
+            if vector is not None:
+                row = self._free_rows.pop()
+                self._embeddings[row] = vector
+                self._row_keys[row] = key
+            self.entries[key] = (response, time.monotonic() + self.ttl_seconds, row)
+    
+    def get_metrics(self) -> Dict:
+        """Get hit and miss counters and the number of cached responses"""
+        lookups = self.metrics["hits"] + self.metrics["near_duplicate_hits"] + self.metrics["misses"]
+        hits = lookups - self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": len(self.entries),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
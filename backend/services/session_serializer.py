@@ -0,0 +1,151 @@
+"""
+Serializers and schema versioning for stored session records
+"""
+
+import json
+from typing import Any, Callable, Dict, Union
+
+try:
+    import orjson
+except ImportError:  # Optional, falls back to the json module
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional, only needed for SESSION_SERIALIZER=msgpack
+    msgpack = None
+
+# Version 1: conversation_history entries were validated against QuestionAnswer
+# when written, so they can be rebuilt without validating them again
+SESSION_SCHEMA_VERSION = 1
+
+class SessionSerializer:
+    """
+    Encodes session records to bytes and back
+    
+    Every serializer can read records written by any other one: JSON
+    records start with "{" and msgpack records never do. Switching
+    SESSION_SERIALIZER therefore needs no migration; old records are
+    rewritten in the new format the next time they are saved.
+    """
+    
+    name = ""
+    binary = False  # Whether encoded records are not UTF-8 text
+    
+    def dumps(self, record: Any) -> bytes:
+        """Encode a record"""
+        raise NotImplementedError
+    
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Decode a record written by any serializer"""
+        if isinstance(data, str):
+            return json_loads(data)
+        if data[:1] in (b"{", b"[", b" ", b"\n"):
+            return json_loads(data)
+        if msgpack is None:
+            raise ValueError("Record is msgpack encoded but msgpack is not installed")
+        return msgpack.unpackb(data, raw=False)
+
+class JSONSerializer(SessionSerializer):
+    """Compact JSON using the standard library"""
+    
+    name = "json"
+    
+    def dumps(self, record: Any) -> bytes:
+        """Encode a record as UTF-8 JSON"""
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class OrjsonSerializer(SessionSerializer):
+    """JSON encoded with orjson"""
+    
+    name = "orjson"
+    
+    def dumps(self, record: Any) -> bytes:
+        """Encode a record as UTF-8 JSON"""
+        return orjson.dumps(record)
+
+class MsgpackSerializer(SessionSerializer):
+    """Binary msgpack encoding"""
+    
+    name = "msgpack"
+    binary = True
+    
+    def dumps(self, record: Any) -> bytes:
+        """Encode a record as msgpack"""
+        return msgpack.packb(record, use_bin_type=True)
+
+def json_dumps(record: Any) -> str:
+    """Encode a record as a single line of JSON, with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(record).decode("utf-8")
+    return json.dumps(record, ensure_ascii=False)
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """Decode JSON, with orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def get_serializer(name: str) -> SessionSerializer:
+    """
+    Get a serializer by name
+    
+    Args:
+        name: "json", "orjson" or "msgpack"
+    
+    Returns:
+        Serializer instance
+    
+    Raises:
+        ValueError: If the name is unknown or its library is not installed
+    """
+    if name == "json":
+        return JSONSerializer()
+    if name == "orjson":
+        if orjson is None:
+            raise ValueError("SESSION_SERIALIZER=orjson requires the orjson package")
+        return OrjsonSerializer()
+    if name == "msgpack":
+        if msgpack is None:
+            raise ValueError("SESSION_SERIALIZER=msgpack requires the msgpack package")
+        return MsgpackSerializer()
+    raise ValueError(f"Unknown session serializer: {name}")
+
+def _upgrade_v0(session: Dict) -> bool:
+    """Validate conversation history written before records were versioned"""
+    from models.schemas import QuestionAnswer
+    
+    try:
+        session["conversation_history"] = [
+            QuestionAnswer(**qa).model_dump(mode="json")
+            for qa in session.get("conversation_history", [])
+        ]
+    except Exception:
+        return False  # Leave invalid history unversioned so it is always validated
+    return True
+
+# Upgrade from version N to N + 1; returns False if the record cannot be upgraded
+SESSION_UPGRADES: Dict[int, Callable[[Dict], bool]] = {
+    0: _upgrade_v0,
+}
+
+def upgrade_session(session: Dict) -> Dict:
+    """
+    Bring a loaded session record up to the current schema version
+    
+    Upgrades happen in memory when a session is loaded and are persisted
+    the next time the session is saved.
+    
+    Args:
+        session: Session record as stored
+    
+    Returns:
+        The same record, upgraded in place
+    """
+    version = session.get("schema_version", 0)
+    while version < SESSION_SCHEMA_VERSION:
+        if not SESSION_UPGRADES[version](session):
+            break
+        version += 1
+        session["schema_version"] = version
+    return session
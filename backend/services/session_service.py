@@ -2,27 +2,96 @@
 Session management service for storing conversation history
 """
 
-import json
+import asyncio
+import heapq
+import logging
+import threading
+import time
 import uuid
-import os
-from typing import Dict, List, Optional
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter
 from datetime import datetime, timedelta
-from models.schemas import QuestionAnswer
+from config.settings import get_settings
+from models.schemas import QuestionAnswer, QuestionType
+from services.session_serializer import SESSION_SCHEMA_VERSION, get_serializer, upgrade_session
+from services.session_store import SessionStore, create_session_store
+
+logger = logging.getLogger(__name__)
+
+# Validates a whole history in one pydantic-core call
+_question_answer_list = TypeAdapter(List[QuestionAnswer])
+
+def _construct_history(history_dicts: List[Dict]) -> List[QuestionAnswer]:
+    """Build QuestionAnswer models without validation from a history written from validated models"""
+    return [
+        QuestionAnswer.model_construct(
+            question=qa["question"],
+            answer=qa["answer"],
+            question_type=QuestionType(qa["question_type"]),
+            options=qa.get("options")
+        )
+        for qa in history_dicts
+    ]
 
 class SessionManager:
-    """Manages user sessions and conversation history"""
+    """
+    Manages user sessions and conversation history
+    
+    Nothing is loaded at startup. Sessions are read from the store the first
+    time they are requested and kept in a bounded LRU cache of hot sessions.
+    
+    Expiry deadlines are tracked in a min-heap holding at most one entry
+    per session, so a sweep only pops sessions whose deadline has passed.
+    Activity after an entry was pushed just updates the session's deadline;
+    the entry is pushed back with the new deadline when it surfaces.
     
-    def __init__(self, storage_dir: str = "data/sessions"):
-        """Initialize session manager"""
-        self.storage_dir = storage_dir
-        self.sessions: Dict[str, Dict] = {}
+    With a shared store (SQLite), a cached session is checked against the
+    store's version of it before use and reloaded only if another worker
+    changed it.
+    
+    Async handlers should use the `*_async` methods. They hold a per-session
+    asyncio lock, so operations on one session run one at a time in arrival
+    order, and run the blocking storage work in a thread pool. The cache
+    itself is guarded by a thread lock, because those operations, and the
+    background sweeper, run in worker threads.
+    """
+    
+    def __init__(self, store: Optional[SessionStore] = None):
+        """Initialize session manager with the configured storage backend"""
+        settings = get_settings()
+        if store is None:
+            store = create_session_store(
+                settings.session_backend,
+                settings.session_dir,
+                settings.session_db_path,
+                get_serializer(settings.session_serializer)
+            )
+        
+        self.store = store
+        self.sessions: "OrderedDict[str, Dict]" = OrderedDict()  # LRU cache of hot sessions
+        self.cache_size = settings.session_cache_size
         self.session_timeout = timedelta(hours=24)  # Sessions expire after 24 hours
-        
-        # Create storage directory if it doesn't exist
-        os.makedirs(storage_dir, exist_ok=True)
-        
-        # Load existing sessions
-        self._load_sessions()
+        self.compact_interval = settings.chat_log_compact_interval
+        self._cache_lock = threading.RLock()
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._history_models: Dict[str, Tuple[List[Dict], List[QuestionAnswer]]] = {}  # Decoded conversation histories
+        self._versions: Dict[str, int] = {}  # Store version each cached session matches (shared stores only)
+        
+        # Expiry index: heap of (deadline, session_id) plus each session's current deadline
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._expiry_lock = threading.Lock()  # The sweeper runs in a worker thread
+        self._expiry_seeded = False
+        
+        self.metrics = {
+            "sweeps": 0,
+            "sessions_reclaimed": 0,
+            "bytes_reclaimed": 0,
+            "last_sweep_at": None,
+            "last_sweep_ms": 0.0,
+        }
     
     def create_session(self, user_id: Optional[str] = None) -> str:
         """Create a new session"""
@@ -30,6 +99,7 @@ class SessionManager:
         
         session_data = {
             "session_id": session_id,
+            "schema_version": SESSION_SCHEMA_VERSION,
             "user_id": user_id,
             "conversation_history": [],
             "created_at": datetime.now().isoformat(),
@@ -37,20 +107,26 @@ class SessionManager:
             "is_completed": False
         }
         
-        self.sessions[session_id] = session_data
+        self._cache_session(session_id, session_data)
         self._save_session(session_id)
         
         return session_id
     
     def get_session(self, session_id: str) -> Optional[Dict]:
         """Get session data by session ID"""
-        if session_id not in self.sessions:
+        # Shared stores may have been updated by another worker
+        if session_id not in self.sessions or (self.store.shared and self._is_stale(session_id)):
             self._load_session(session_id)
         
-        session = self.sessions.get(session_id)
+        with self._cache_lock:
+            session = self.sessions.get(session_id)
+            if session and not self._is_session_expired(session):
+                self.sessions.move_to_end(session_id)
+                return session
         
-        if session and not self._is_session_expired(session):
-            return session
+        if session:
+            # Reclaim now rather than waiting for the next sweep
+            self._reclaim_session(session_id)
         
         return None
     
@@ -66,12 +142,14 @@ class SessionManager:
             return False
         
         # Convert QuestionAnswer objects to dictionaries for storage
-        history_dicts = [qa.dict() for qa in conversation_history]
+        history_dicts = [qa.model_dump(mode="json") for qa in conversation_history]
         
         session["conversation_history"] = history_dicts
+        session["schema_version"] = SESSION_SCHEMA_VERSION  # History is validated
         session["last_activity"] = datetime.now().isoformat()
         
-        self.sessions[session_id] = session
+        self._cache_session(session_id, session)
+        self._history_models[session_id] = (history_dicts, list(conversation_history))
         self._save_session(session_id)
         
         return True
@@ -86,7 +164,7 @@ class SessionManager:
         session["is_completed"] = True
         session["completed_at"] = datetime.now().isoformat()
         
-        self.sessions[session_id] = session
+        self._cache_session(session_id, session)
         self._save_session(session_id)
         
         return True
@@ -102,21 +180,203 @@ class SessionManager:
         
         # Convert dictionaries back to QuestionAnswer objects
         try:
-            return [QuestionAnswer(**qa_dict) for qa_dict in history_dicts]
+            if session.get("schema_version", 0) < 1:
+                return _question_answer_list.validate_python(history_dicts)
+            
+            # Every update stores a new list, so identity tells whether it changed
+            cached = self._history_models.get(session_id)
+            if cached is None or cached[0] is not history_dicts:
+                cached = (history_dicts, _construct_history(history_dicts))
+                self._history_models[session_id] = cached
+            return list(cached[1])
         except Exception:
             return []
     
-    def cleanup_expired_sessions(self):
-        """Remove expired sessions"""
-        current_time = datetime.now()
-        expired_sessions = []
+    async def cleanup_expired_sessions_async(self) -> Dict:
+        """
+        Remove expired sessions, including ones created by other workers
+        
+        Re-reads session activity from the store before sweeping, so it
+        also catches sessions this process has never tracked.
+        
+        Returns:
+            Summary of the sweep
+        """
+        await asyncio.to_thread(self._seed_expiry_index)
+        return await self.sweep_expired_sessions_async()
+    
+    async def sweep_expired_sessions_async(self, now: Optional[float] = None) -> Dict:
+        """
+        Delete sessions whose expiry deadline has passed
+        
+        Only heap entries that are due are examined. Each session is checked
+        and deleted in a worker thread while holding its lock, so a sweep
+        never races a request using the session. Before a session is
+        deleted its last activity is re-read from the store, since another
+        worker may have used it since this process last saw it.
+        
+        Args:
+            now: Current time as a Unix timestamp (defaults to time.time())
+        
+        Returns:
+            Summary with examined, reclaimed and bytes_reclaimed counts
+        """
+        start = time.perf_counter()
+        if not self._expiry_seeded:
+            await asyncio.to_thread(self._seed_expiry_index)
+        
+        now = time.time() if now is None else now
+        examined = 0
+        reclaimed = 0
+        bytes_reclaimed = 0
+        
+        while True:
+            session_id = self._pop_due_session(now)
+            if session_id is None:
+                break
+            
+            examined += 1
+            session_bytes = await self._run_locked(session_id, self._expire_session, session_id, now)
+            if session_bytes is not None:
+                bytes_reclaimed += session_bytes
+                reclaimed += 1
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.metrics["sweeps"] += 1
+        self.metrics["sessions_reclaimed"] += reclaimed
+        self.metrics["bytes_reclaimed"] += bytes_reclaimed
+        self.metrics["last_sweep_at"] = datetime.now().isoformat()
+        self.metrics["last_sweep_ms"] = round(elapsed_ms, 2)
+        
+        return {
+            "examined": examined,
+            "reclaimed": reclaimed,
+            "bytes_reclaimed": bytes_reclaimed,
+            "elapsed_ms": round(elapsed_ms, 2)
+        }
+    
+    def _pop_due_session(self, now: float) -> Optional[str]:
+        """Take the next session whose deadline has passed off the expiry index, or None"""
+        with self._expiry_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                deadline, session_id = heapq.heappop(self._expiry_heap)
+                current = self._deadlines.get(session_id)
+                if current is None:
+                    continue  # Deleted since the entry was pushed
+                if current > now:
+                    # Used since the entry was pushed, reschedule at the new deadline
+                    heapq.heappush(self._expiry_heap, (current, session_id))
+                    continue
+                del self._deadlines[session_id]
+                return session_id
+        return None
+    
+    def _expire_session(self, session_id: str, now: float) -> Optional[int]:
+        """Delete a due session unless the store shows later activity, returning the bytes reclaimed"""
+        try:
+            stored_activity = self.store.get_activity(session_id)
+        except Exception:
+            stored_activity = None
         
-        for session_id, session in self.sessions.items():
-            if self._is_session_expired(session):
-                expired_sessions.append(session_id)
+        if stored_activity:
+            stored_deadline = self._deadline(stored_activity)
+            if stored_deadline > now:
+                self._track_expiry(session_id, stored_activity)
+                return None
         
-        for session_id in expired_sessions:
-            self._delete_session(session_id)
+        return self._delete_session(session_id)
+    
+    def session_lock(self, session_id: str) -> asyncio.Lock:
+        """Get the asyncio lock serializing operations on a session"""
+        # Locks live only while a coroutine holds or waits on them
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+    
+    async def _run_locked(self, session_id: str, func: Callable[..., Any], *args) -> Any:
+        """Run a blocking session operation in a worker thread while holding the session's lock"""
+        async with self.session_lock(session_id):
+            return await asyncio.to_thread(func, *args)
+    
+    async def create_session_async(self, user_id: Optional[str] = None) -> str:
+        """Create a new session without blocking the event loop"""
+        return await asyncio.to_thread(self.create_session, user_id)
+    
+    async def create_chat_session_async(self, user_id: Optional[str] = None) -> str:
+        """Create a new chat session without blocking the event loop"""
+        return await asyncio.to_thread(self.create_chat_session, user_id)
+    
+    async def get_session_async(self, session_id: str) -> Optional[Dict]:
+        """Get session data by session ID without blocking the event loop"""
+        return await self._run_locked(session_id, self.get_session, session_id)
+    
+    async def update_session_history_async(
+        self,
+        session_id: str,
+        conversation_history: List[QuestionAnswer]
+    ) -> bool:
+        """Update conversation history for a session, serialized with other operations on it"""
+        return await self._run_locked(session_id, self.update_session_history, session_id, conversation_history)
+    
+    async def complete_session_async(self, session_id: str) -> bool:
+        """Mark a session as completed, serialized with other operations on it"""
+        return await self._run_locked(session_id, self.complete_session, session_id)
+    
+    async def get_conversation_history_async(self, session_id: str) -> List[QuestionAnswer]:
+        """Get conversation history as QuestionAnswer objects without blocking the event loop"""
+        return await self._run_locked(session_id, self.get_conversation_history, session_id)
+    
+    async def add_chat_message_async(self, session_id: str, role: str, content: str) -> bool:
+        """Add a message to chat history, serialized with other operations on the session"""
+        return await self._run_locked(session_id, self.add_chat_message, session_id, role, content)
+    
+    async def get_chat_history_async(self, session_id: str) -> List[Dict]:
+        """Get a snapshot of a session's chat history without blocking the event loop"""
+        return await self._run_locked(session_id, lambda: list(self.get_chat_history(session_id)))
+    
+    async def get_chat_context_async(self, session_id: str) -> Tuple[List[Dict], Optional[Dict]]:
+        """Get a snapshot of a session's chat history and its running summary together"""
+        return await self._run_locked(
+            session_id,
+            lambda: (list(self.get_chat_history(session_id)), self.get_chat_summary(session_id))
+        )
+    
+    async def update_chat_summary_async(self, session_id: str, chat_summary: Dict) -> bool:
+        """Store a session's running chat summary, serialized with other operations on it"""
+        return await self._run_locked(session_id, self.update_chat_summary, session_id, chat_summary)
+    
+    async def delete_session_async(self, session_id: str):
+        """Delete a session from memory and storage without blocking the event loop"""
+        await self._run_locked(session_id, self._delete_session, session_id)
+    
+    def get_metrics(self) -> Dict:
+        """Get sweep counters along with cache and expiry index sizes"""
+        return {
+            **self.metrics,
+            "cached_sessions": len(self.sessions),
+            "tracked_sessions": len(self._deadlines)
+        }
+    
+    async def run_sweeper(self, interval_seconds: float):
+        """
+        Sweep expired sessions every interval until cancelled
+        
+        Storage deletes run in worker threads so they do not block the
+        event loop.
+        """
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                summary = await self.sweep_expired_sessions_async()
+                if summary["reclaimed"]:
+                    logger.info(
+                        f"Session sweep reclaimed {summary['reclaimed']} sessions "
+                        f"({summary['bytes_reclaimed']} bytes) in {summary['elapsed_ms']} ms"
+                    )
+            except Exception as e:
+                logger.error(f"Error sweeping expired sessions: {str(e)}")
     
     def _is_session_expired(self, session: Dict) -> bool:
         """Check if a session has expired"""
@@ -126,57 +386,137 @@ class SessionManager:
         except Exception:
             return True
     
-    def _load_sessions(self):
-        """Load all sessions from disk"""
+    def _deadline(self, last_activity: str) -> float:
+        """Get the expiry deadline (Unix timestamp) for a last_activity ISO timestamp"""
+        return datetime.fromisoformat(last_activity).timestamp() + self.session_timeout.total_seconds()
+    
+    def _track_expiry(self, session_id: str, last_activity: str):
+        """Record a session's latest activity in the expiry index"""
         try:
-            for filename in os.listdir(self.storage_dir):
-                if filename.endswith('.json'):
-                    session_id = filename[:-5]  # Remove .json extension
-                    self._load_session(session_id)
+            deadline = self._deadline(last_activity)
         except Exception:
-            pass
+            deadline = 0.0  # Unparseable timestamps expire at the next sweep
+        
+        with self._expiry_lock:
+            if session_id not in self._deadlines:
+                heapq.heappush(self._expiry_heap, (deadline, session_id))
+            elif deadline < self._deadlines[session_id]:
+                # The pending entry would surface too late
+                heapq.heappush(self._expiry_heap, (deadline, session_id))
+            self._deadlines[session_id] = deadline
+    
+    def _seed_expiry_index(self):
+        """Add every stored session's activity to the expiry index"""
+        try:
+            for session_id, last_activity in self.store.list_activity():
+                self._track_expiry(session_id, last_activity)
+            self._expiry_seeded = True
+        except Exception as e:
+            logger.error(f"Error reading session activity: {str(e)}")
+    
+    def _cache_session(self, session_id: str, session_data: Dict):
+        """Put a session in the LRU cache, evicting the least recently used ones"""
+        with self._cache_lock:
+            self.sessions[session_id] = session_data
+            self.sessions.move_to_end(session_id)
+            
+            # Evicted sessions are already persisted and fault back in on demand
+            while len(self.sessions) > self.cache_size:
+                evicted_id, _ = self.sessions.popitem(last=False)
+                self._history_models.pop(evicted_id, None)
+                self._versions.pop(evicted_id, None)
+        
+        self._track_expiry(session_id, session_data.get("last_activity", ""))
+    
+    def _is_stale(self, session_id: str) -> bool:
+        """Check whether the store's version of a cached session differs from the cached one"""
+        try:
+            return self.store.get_version(session_id) != self._versions.get(session_id)
+        except Exception:
+            return True
+    
+    def _record_version(self, session_id: str, version: Optional[int]):
+        """Remember the store version written by this process, unless another worker wrote in between"""
+        if version is None:
+            return
+        if version == 0 or self._versions.get(session_id) == version - 1:
+            self._versions[session_id] = version
+        else:
+            # Missed someone else's write, so reload on next use
+            self._versions.pop(session_id, None)
     
     def _load_session(self, session_id: str):
-        """Load a specific session from disk"""
+        """Load a specific session from storage"""
         try:
-            filepath = os.path.join(self.storage_dir, f"{session_id}.json")
-            if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    session_data = json.load(f)
-                    self.sessions[session_id] = session_data
+            # Read the version first: a write after it only causes an extra reload
+            version = self.store.get_version(session_id) if self.store.shared else None
+            session_data = self.store.load(session_id)
+            if session_data:
+                # Older records are upgraded in memory and rewritten on their next save
+                self._cache_session(session_id, upgrade_session(session_data))
+                if version is not None:
+                    self._versions[session_id] = version
+            else:
+                with self._cache_lock:
+                    self.sessions.pop(session_id, None)
+                self._versions.pop(session_id, None)
         except Exception:
             pass
     
     def _save_session(self, session_id: str):
-        """Save a session to disk"""
+        """Save a session to storage"""
         try:
             session_data = self.sessions.get(session_id)
             if session_data:
-                filepath = os.path.join(self.storage_dir, f"{session_id}.json")
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(session_data, f, indent=2, ensure_ascii=False)
+                self._record_version(session_id, self.store.save(session_data))
         except Exception:
             pass
     
-    def _delete_session(self, session_id: str):
-        """Delete a session from memory and disk"""
-        # Remove from memory
-        self.sessions.pop(session_id, None)
-        
-        # Remove from disk
+    def _append_message(self, session_id: str, message: Dict):
+        """Append a chat message to the session's log in storage"""
         try:
-            filepath = os.path.join(self.storage_dir, f"{session_id}.json")
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            self._record_version(session_id, self.store.append_message(session_id, message))
         except Exception:
             pass
-
+    
+    def _compact_session(self, session_id: str):
+        """Checkpoint session metadata and compact its chat log in storage"""
+        try:
+            session_data = self.sessions.get(session_id)
+            if session_data:
+                self._record_version(session_id, self.store.compact(session_data))
+        except Exception:
+            pass
+    
+    def _reclaim_session(self, session_id: str):
+        """Delete an expired session and count it in the sweep metrics"""
+        bytes_reclaimed = self._delete_session(session_id)
+        self.metrics["sessions_reclaimed"] += 1
+        self.metrics["bytes_reclaimed"] += bytes_reclaimed
+    
+    def _delete_session(self, session_id: str) -> int:
+        """Delete a session from memory and storage, returning the bytes reclaimed in storage"""
+        # Remove from memory
+        with self._cache_lock:
+            self.sessions.pop(session_id, None)
+            self._history_models.pop(session_id, None)
+        self._versions.pop(session_id, None)
+        with self._expiry_lock:
+            self._deadlines.pop(session_id, None)
+        
+        # Remove from storage
+        try:
+            return self.store.delete(session_id) or 0
+        except Exception:
+            return 0
+    
     def create_chat_session(self, user_id: Optional[str] = None) -> str:
         """Create a new chat session"""
         session_id = str(uuid.uuid4())
         
         session_data = {
             "session_id": session_id,
+            "schema_version": SESSION_SCHEMA_VERSION,
             "user_id": user_id,
             "session_type": "chat",
             "chat_history": [],
@@ -185,7 +525,7 @@ class SessionManager:
             "is_completed": False
         }
         
-        self.sessions[session_id] = session_data
+        self._cache_session(session_id, session_data)
         self._save_session(session_id)
         
         return session_id
@@ -201,17 +541,22 @@ class SessionManager:
         if "chat_history" not in session:
             session["chat_history"] = []
         
+        timestamp = datetime.now().isoformat()
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
         }
         
         session["chat_history"].append(message)
-        session["last_activity"] = datetime.now().isoformat()
+        session["last_activity"] = timestamp
         
-        self.sessions[session_id] = session
-        self._save_session(session_id)
+        self._cache_session(session_id, session)
+        
+        # Append only the new message; metadata is checkpointed periodically
+        self._append_message(session_id, message)
+        if len(session["chat_history"]) % self.compact_interval == 0:
+            self._compact_session(session_id)
         
         return True
     
@@ -223,6 +568,38 @@ class SessionManager:
             return []
         
         return session.get("chat_history", [])
+    
+    def get_chat_summary(self, session_id: str) -> Optional[Dict]:
+        """Get the running summary of a session's older chat messages"""
+        session = self.get_session(session_id)
+        return session.get("chat_summary") if session else None
+    
+    def update_chat_summary(self, session_id: str, chat_summary: Dict) -> bool:
+        """
+        Store the running summary of a session's older chat messages
+        
+        Summaries are built outside the session lock, so one that covers
+        fewer messages than the stored summary is stale and ignored.
+        
+        Args:
+            session_id: Chat session identifier
+            chat_summary: Summary record with `text`, `tokens` and `covered`
+        
+        Returns:
+            True if the summary was stored
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return False
+        
+        current = session.get("chat_summary")
+        if current and current["covered"] >= chat_summary["covered"]:
+            return False
+        
+        session["chat_summary"] = chat_summary
+        self._cache_session(session_id, session)
+        self._save_session(session_id)
+        return True
 
 # Global session manager instance
 session_manager = SessionManager()
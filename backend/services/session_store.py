@@ -0,0 +1,502 @@
+"""
+Storage backends for session data
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from services.session_serializer import JSONSerializer, SessionSerializer, json_dumps, json_loads
+
+class SessionStore:
+    """
+    Base class for session storage backends
+    
+    A store persists session metadata keyed by session ID, and keeps the
+    chat history of each session as a separate append-only message log.
+    `load` returns the metadata with the log attached as "chat_history".
+    Stores that can be modified by other processes set `shared = True`
+    and keep a per-session version that every write bumps, so the session
+    manager can tell whether its in-memory copy is still current.
+    """
+    
+    shared = False
+    
+    def load(self, session_id: str) -> Optional[Dict]:
+        """Load a session with its chat history, or None if it does not exist"""
+        raise NotImplementedError
+    
+    def save(self, session: Dict) -> Optional[int]:
+        """Create or replace a session's metadata (the chat history is not written), returning its new version"""
+        raise NotImplementedError
+    
+    def append_message(self, session_id: str, message: Dict) -> Optional[int]:
+        """Append a message to a session's chat log, returning the session's new version"""
+        raise NotImplementedError
+    
+    def replace_messages(self, session_id: str, messages: List[Dict]) -> Optional[int]:
+        """Replace a session's whole chat log, returning the session's new version"""
+        raise NotImplementedError
+    
+    def compact(self, session: Dict) -> Optional[int]:
+        """Fold state derived from the chat log back into the stored metadata"""
+        return self.save(session)
+    
+    def get_version(self, session_id: str) -> Optional[int]:
+        """
+        Get the session's version, or None if it does not exist
+        
+        Only shared stores track versions; the others return None from
+        this and from every write.
+        """
+        return None
+    
+    def delete(self, session_id: str) -> int:
+        """Delete a session if it exists and return the number of bytes reclaimed"""
+        raise NotImplementedError
+    
+    def get_activity(self, session_id: str) -> Optional[str]:
+        """Get a session's last_activity ISO timestamp, or None if it does not exist"""
+        session = self.load(session_id)
+        return session.get("last_activity") if session else None
+    
+    def list_session_ids(self) -> List[str]:
+        """Get the IDs of all stored sessions"""
+        return [session_id for session_id, _ in self.list_activity()]
+    
+    def list_activity(self) -> Iterable[Tuple[str, str]]:
+        """Get (session_id, last_activity ISO timestamp) for every stored session without loading them"""
+        raise NotImplementedError
+    
+    def find_expired(self, cutoff: datetime) -> List[str]:
+        """Get the IDs of sessions with no activity since the cutoff"""
+        cutoff_iso = cutoff.isoformat()
+        return [
+            session_id
+            for session_id, last_activity in self.list_activity()
+            if last_activity < cutoff_iso
+        ]
+    
+    def close(self):
+        """Release any resources held by the store"""
+        pass
+
+class FileSessionStore(SessionStore):
+    """
+    Stores each session as files in a directory (single process only)
+    
+    Metadata lives in <session_id>.json, encoded with the configured
+    serializer (the extension is kept even for msgpack records), and chat
+    messages are appended one JSON object per line to
+    <session_id>.chat.jsonl, so adding a message writes only that message
+    instead of the whole session.
+    
+    A small append-only index file ("<session_id>\t<last_activity>" lines,
+    "-" for deleted sessions) maps session IDs to their last activity, so
+    existence checks and expiry scans never open the session files.
+    """
+    
+    INDEX_FILENAME = "_index.log"
+    
+    def __init__(self, storage_dir: str = "data/sessions", serializer: Optional[SessionSerializer] = None):
+        """Initialize the store, creating the directory if needed"""
+        self.storage_dir = storage_dir
+        self.serializer = serializer or JSONSerializer()
+        self.index_path = os.path.join(storage_dir, self.INDEX_FILENAME)
+        self._index: Optional[Dict[str, str]] = None  # Loaded on first use
+        self._index_lines = 0
+        self._index_lock = threading.RLock()  # Sessions are saved from worker threads
+        os.makedirs(storage_dir, exist_ok=True)
+    
+    def _load_index(self) -> Dict[str, str]:
+        """Load the activity index, rebuilding it from file times if it is missing"""
+        with self._index_lock:
+            if self._index is not None:
+                return self._index
+            
+            index: Dict[str, str] = {}
+            lines = 0
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        session_id, _, last_activity = line.rstrip("\n").partition("\t")
+                        if not last_activity:
+                            continue  # Torn line from an interrupted append
+                        lines += 1
+                        if last_activity == "-":
+                            index.pop(session_id, None)
+                        else:
+                            index[session_id] = last_activity
+            else:
+                for filename in os.listdir(self.storage_dir):
+                    if filename.endswith('.json'):
+                        session_id = filename[:-5]  # Remove .json extension
+                        index[session_id] = datetime.fromtimestamp(self._modified_time(session_id)).isoformat()
+            
+            self._index = index
+            self._index_lines = lines
+            if not lines:
+                self._rewrite_index()
+            return index
+    
+    def _record_activity(self, session_id: str, last_activity: Optional[str]):
+        """Append an index entry; None marks the session as deleted"""
+        with self._index_lock:
+            index = self._load_index()
+            if last_activity is None:
+                index.pop(session_id, None)
+            else:
+                index[session_id] = last_activity
+            
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(f"{session_id}\t{last_activity or '-'}\n")
+            self._index_lines += 1
+            
+            # Compact once superseded entries dominate the file
+            if self._index_lines > 2 * len(index) + 100:
+                self._rewrite_index()
+    
+    def _rewrite_index(self):
+        """Rewrite the index file with one line per live session"""
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for session_id, last_activity in self._index.items():
+                f.write(f"{session_id}\t{last_activity}\n")
+        os.replace(temp_path, self.index_path)
+        self._index_lines = len(self._index)
+    
+    def _modified_time(self, session_id: str) -> float:
+        """Get the newer modification time of a session's metadata and log files"""
+        modified = os.path.getmtime(self._path(session_id))
+        if os.path.exists(self._log_path(session_id)):
+            modified = max(modified, os.path.getmtime(self._log_path(session_id)))
+        return modified
+    
+    def _path(self, session_id: str) -> str:
+        """Get the metadata file path for a session"""
+        return os.path.join(self.storage_dir, f"{session_id}.json")
+    
+    def _log_path(self, session_id: str) -> str:
+        """Get the chat log file path for a session"""
+        return os.path.join(self.storage_dir, f"{session_id}.chat.jsonl")
+    
+    def _read_log(self, session_id: str) -> List[Dict]:
+        """Read a chat log, repairing it if an interrupted append left a torn line"""
+        messages = []
+        torn = False
+        try:
+            with open(self._log_path(session_id), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        messages.append(json_loads(line))
+                    except ValueError:
+                        torn = True
+        except FileNotFoundError:
+            pass
+        
+        # Rewrite so the next append does not land on the torn line
+        if torn:
+            self.replace_messages(session_id, messages)
+        
+        return messages
+    
+    def load(self, session_id: str) -> Optional[Dict]:
+        """Load a session's metadata and replay its chat log"""
+        try:
+            if session_id not in self._load_index():
+                return None
+            
+            with open(self._path(session_id), 'rb') as f:
+                session = self.serializer.loads(f.read())
+            
+            # Older files kept the chat history inline; move it to the log once
+            inline_history = session.pop("chat_history", None)
+            if inline_history and not os.path.exists(self._log_path(session_id)):
+                self.replace_messages(session_id, inline_history)
+                self.save(session)
+            
+            session["chat_history"] = self._read_log(session_id)
+            _apply_log_activity(session)
+            
+            return session
+        except Exception:
+            pass
+        return None
+    
+    def save(self, session: Dict):
+        """Write a session's metadata to its file"""
+        metadata = {key: value for key, value in session.items() if key != "chat_history"}
+        with open(self._path(session["session_id"]), 'wb') as f:
+            f.write(self.serializer.dumps(metadata))
+        
+        self._record_activity(session["session_id"], session["last_activity"])
+    
+    def append_message(self, session_id: str, message: Dict):
+        """Append one message line to the session's chat log"""
+        with open(self._log_path(session_id), 'a', encoding='utf-8') as f:
+            f.write(json_dumps(message) + "\n")
+        
+        if message.get("timestamp"):
+            self._record_activity(session_id, message["timestamp"])
+    
+    def replace_messages(self, session_id: str, messages: List[Dict]):
+        """Rewrite the session's chat log"""
+        with open(self._log_path(session_id), 'w', encoding='utf-8') as f:
+            for message in messages:
+                f.write(json_dumps(message) + "\n")
+    
+    def delete(self, session_id: str) -> int:
+        """Delete a session's metadata and chat log files"""
+        reclaimed = 0
+        for filepath in (self._path(session_id), self._log_path(session_id)):
+            if os.path.exists(filepath):
+                reclaimed += os.path.getsize(filepath)
+                os.remove(filepath)
+        
+        self._record_activity(session_id, None)
+        return reclaimed
+    
+    def get_activity(self, session_id: str) -> Optional[str]:
+        """Get a session's last activity from the index"""
+        with self._index_lock:
+            return self._load_index().get(session_id)
+    
+    def list_activity(self) -> Iterable[Tuple[str, str]]:
+        """Get session activity from the index"""
+        with self._index_lock:
+            return list(self._load_index().items())
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Stores sessions in a SQLite database in WAL mode
+    
+    The database can be shared by several uvicorn workers or processes on
+    the same host, so sessions created by one worker are visible to all.
+    """
+    
+    shared = True
+    
+    def __init__(self, db_path: str = "data/sessions.db", serializer: Optional[SessionSerializer] = None):
+        """Initialize the store and create the schema if needed"""
+        self.db_path = db_path
+        self.serializer = serializer or JSONSerializer()
+        self._local = threading.local()
+        # Every thread's connection, so close() can reach them all
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                last_activity TEXT NOT NULL,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions (last_activity);
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            );
+        """)
+        # Databases created before versions were tracked
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if "version" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only this thread uses it, but close() may run on another one
+            conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _bump_version(self, conn: sqlite3.Connection, session_id: str) -> Optional[int]:
+        """Increment a session's version inside the caller's transaction and return it"""
+        conn.execute("UPDATE sessions SET version = version + 1 WHERE session_id = ?", (session_id,))
+        row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+    
+    def _encode(self, record: Dict):
+        """Encode a record for a data column, keeping text formats readable as TEXT"""
+        data = self.serializer.dumps(record)
+        return data if self.serializer.binary else data.decode("utf-8")
+    
+    def load(self, session_id: str) -> Optional[Dict]:
+        """Load a session row and its chat messages"""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT data, last_activity FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if not row:
+            return None
+        
+        session = self.serializer.loads(row[0])
+        session["last_activity"] = row[1]  # Kept current by message appends
+        
+        # Rows imported from the old format kept the chat history inline
+        inline_history = session.pop("chat_history", None)
+        
+        messages = [
+            self.serializer.loads(data)
+            for (data,) in conn.execute(
+                "SELECT data FROM chat_messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            )
+        ]
+        
+        if inline_history and not messages:
+            self.replace_messages(session_id, inline_history)
+            self.save(session)
+            messages = inline_history
+        
+        session["chat_history"] = messages
+        return session
+    
+    def save(self, session: Dict) -> Optional[int]:
+        """Insert or update a session row (metadata only)"""
+        metadata = {key: value for key, value in session.items() if key != "chat_history"}
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO sessions (session_id, user_id, last_activity, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id) DO NOTHING",
+                (
+                    session["session_id"],
+                    session.get("user_id"),
+                    session["last_activity"],
+                    self._encode(metadata)
+                )
+            )
+            if cursor.rowcount:
+                return 0  # New row
+            conn.execute(
+                "UPDATE sessions SET user_id = ?, last_activity = ?, data = ? WHERE session_id = ?",
+                (session.get("user_id"), session["last_activity"], self._encode(metadata), session["session_id"])
+            )
+            return self._bump_version(conn, session["session_id"])
+    
+    def append_message(self, session_id: str, message: Dict) -> Optional[int]:
+        """Insert one chat message and bump the session's last activity"""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO chat_messages (session_id, seq, data) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM chat_messages WHERE session_id = ?",
+                (session_id, self._encode(message), session_id)
+            )
+            if message.get("timestamp"):
+                conn.execute(
+                    "UPDATE sessions SET last_activity = MAX(last_activity, ?) WHERE session_id = ?",
+                    (message["timestamp"], session_id)
+                )
+            return self._bump_version(conn, session_id)
+    
+    def replace_messages(self, session_id: str, messages: List[Dict]) -> Optional[int]:
+        """Replace all chat messages of a session"""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            conn.executemany(
+                "INSERT INTO chat_messages (session_id, seq, data) VALUES (?, ?, ?)",
+                [
+                    (session_id, seq, self._encode(message))
+                    for seq, message in enumerate(messages, start=1)
+                ]
+            )
+            return self._bump_version(conn, session_id)
+    
+    def delete(self, session_id: str) -> int:
+        """Delete a session row and its chat messages"""
+        conn = self._connection()
+        reclaimed = conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+        reclaimed += conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM chat_messages WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+        
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+        return reclaimed
+    
+    def get_version(self, session_id: str) -> Optional[int]:
+        """Get a session's version from its row, without loading the session"""
+        row = self._connection().execute(
+            "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def get_activity(self, session_id: str) -> Optional[str]:
+        """Get a session's last activity without loading its messages"""
+        row = self._connection().execute(
+            "SELECT last_activity FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def list_activity(self) -> Iterable[Tuple[str, str]]:
+        """Get session activity from the sessions table"""
+        return self._connection().execute("SELECT session_id, last_activity FROM sessions").fetchall()
+    
+    def find_expired(self, cutoff: datetime) -> List[str]:
+        """Find expired sessions using the last_activity index"""
+        # last_activity is an ISO timestamp, so string order is time order
+        rows = self._connection().execute(
+            "SELECT session_id FROM sessions WHERE last_activity < ?", (cutoff.isoformat(),)
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    def close(self):
+        """Close the database connections of every thread that used the store"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            # Threads that use the store again open a new connection
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+def _apply_log_activity(session: Dict):
+    """Advance last_activity to the newest chat message, which is not checkpointed per message"""
+    history = session.get("chat_history")
+    if history and history[-1].get("timestamp", "") > session.get("last_activity", ""):
+        session["last_activity"] = history[-1]["timestamp"]
+
+def create_session_store(
+    backend: str,
+    storage_dir: str,
+    db_path: str,
+    serializer: Optional[SessionSerializer] = None
+) -> SessionStore:
+    """
+    Create the configured session store
+    
+    Args:
+        backend: "file" or "sqlite"
+        storage_dir: Directory for the file backend
+        db_path: Database path for the SQLite backend
+        serializer: Record serializer (compact JSON if None)
+    
+    Returns:
+        Session store instance
+    """
+    if backend == "sqlite":
+        return SQLiteSessionStore(db_path, serializer)
+    if backend == "file":
+        return FileSessionStore(storage_dir, serializer)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,62 @@
+"""
+Coalescing of identical concurrent calls
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time and shares its result
+    
+    The first caller for a key starts the call; callers arriving while it
+    is in flight wait for the same result (or exception) instead of
+    starting their own. Waiters are shielded from each other, so one
+    client disconnecting does not cancel the call the others are waiting
+    on. Once the call finishes the key is released, so later callers
+    start a new call.
+    """
+    
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.metrics = {
+            "calls": 0,
+            "coalesced": 0,
+        }
+    
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a call, or join the identical one already in flight
+        
+        Args:
+            key: Identifies calls that would return the same result
+            func: Starts the call; only invoked if none is in flight for the key
+        
+        Returns:
+            The call's result
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.metrics["calls"] += 1
+        else:
+            self.metrics["coalesced"] += 1
+        
+        return await asyncio.shield(task)
+    
+    def _release(self, key: Hashable, task: asyncio.Task):
+        """Forget a finished call"""
+        self._calls.pop(key, None)
+        # Every waiter may have been cancelled; mark the exception as retrieved either way
+        if not task.cancelled():
+            task.exception()
+    
+    def get_metrics(self) -> Dict:
+        """Get call counters and the number of calls in flight"""
+        return {
+            **self.metrics,
+            "in_flight": len(self._calls),
+        }
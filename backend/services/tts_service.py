@@ -0,0 +1,176 @@
+"""
+Text to speech proxy with cached, coalesced synthesis
+"""
+
+import asyncio
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import httpx
+from config.settings import get_settings
+from services.audio_cache import AudioCache, audio_key
+from services.groq_pool import GroqClientPool
+from services.quiz_engine import CompiledQuizTree
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Audio formats Groq can return, with their media types
+AUDIO_FORMATS = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "flac": "audio/flac",
+    "ogg": "audio/ogg",
+    "mulaw": "audio/basic",
+}
+
+def clean_text_for_speech(text: str) -> str:
+    """
+    Clean text the way the frontend's TextToSpeechService does before speaking it
+    
+    Pre-synthesized audio is keyed on the cleaned text, so this must match
+    what the browser sends for the same quiz question.
+    """
+    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)  # Bold
+    text = re.sub(r"\*(.*?)\*", r"\1", text)  # Italic
+    text = re.sub(r"`(.*?)`", r"\1", text)  # Code
+    text = re.sub(r"#{1,6}\s", "", text)  # Headers
+    text = re.sub(r"\[(.*?)\]\(.*?\)", r"\1", text)  # Links
+    text = re.sub(r">\s", "", text)  # Blockquotes
+    # JavaScript's \w is ASCII only; emojis and other symbols become spaces
+    text = re.sub(r"[^\w\s.,!?;:()]", " ", text, flags=re.ASCII)
+    text = " ".join(text.split())
+    if len(text) > 500:
+        text = text[:500] + "..."
+    return text
+
+class TTSService:
+    """
+    Synthesizes speech through Groq and caches the audio on disk
+    
+    Audio is content addressed by its text, model, voice and format, so a
+    quiz question read to thousands of users is synthesized once. Requests
+    for audio that is being synthesized wait for that call rather than
+    starting their own. Calls are spread over every configured key, in a
+    pool separate from chat's.
+    """
+    
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        """
+        Create the client pool and open the audio cache
+        
+        Args:
+            http_client: Shared HTTP client for the Groq clients, mainly for tests
+        """
+        self.settings = get_settings()
+        api_keys = [self.settings.groq_api_key, self.settings.groq_api_key2, *self.settings.groq_api_keys.split(",")]
+        self.client_pool = GroqClientPool(
+            [key.strip() for key in api_keys],
+            base_url=self.settings.groq_base_url or None,
+            timeout=self.settings.llm_timeout_seconds,
+            max_attempts=self.settings.llm_max_attempts,
+            http_client=http_client
+        )
+        self.cache = AudioCache(self.settings.tts_cache_dir, int(self.settings.tts_cache_max_mb * 1024 * 1024))
+        self.flights = SingleFlight()
+        self.metrics = {
+            "syntheses": 0,
+            "presynthesized": 0,
+        }
+    
+    async def synthesize(
+        self,
+        text: str,
+        model: Optional[str] = None,
+        voice: Optional[str] = None,
+        response_format: str = "wav"
+    ) -> Tuple[Path, bool]:
+        """
+        Get the audio for a text, synthesizing it on a cache miss
+        
+        Args:
+            text: Text to speak; runs of whitespace are collapsed
+            model: TTS model (defaults to TTS_MODEL)
+            voice: Voice (defaults to TTS_VOICE)
+            response_format: One of AUDIO_FORMATS
+        
+        Returns:
+            Path of the audio file and whether it was already cached
+        """
+        model = model or self.settings.tts_model
+        voice = voice or self.settings.tts_voice
+        text = " ".join(text.split())
+        key = audio_key(text, model, voice, response_format)
+        
+        # Cache lookups touch the disk, so they run in a worker thread
+        path = await asyncio.to_thread(self.cache.get, key, response_format)
+        if path is not None:
+            return path, True
+        
+        async def fill():
+            audio = await asyncio.wait_for(
+                self.client_pool.speech(model=model, voice=voice, input=text, response_format=response_format),
+                timeout=self.settings.llm_timeout_seconds
+            )
+            self.metrics["syntheses"] += 1
+            return await asyncio.to_thread(self.cache.put, key, response_format, audio)
+        
+        return await self.flights.run(key, fill), False
+    
+    @staticmethod
+    def quiz_texts(quiz_engine: CompiledQuizTree) -> List[str]:
+        """Get every question of the quiz tree, then every option"""
+        questions = [node.question for node in quiz_engine.nodes if node.question]
+        options = [option for node in quiz_engine.nodes for option in node.options]
+        return questions + options
+    
+    async def presynthesize(self, texts: Iterable[str], concurrency: int = 4) -> int:
+        """
+        Synthesize texts ahead of time with the default model and voice
+        
+        Texts are cleaned like the frontend does, so its requests hit the
+        cache. Stops at the first failure (e.g. every key rate limited)
+        rather than retrying each text against an unavailable API.
+        
+        Args:
+            texts: Texts the frontend will speak
+            concurrency: Upstream calls at a time
+        
+        Returns:
+            Number of texts synthesized; cached ones are not counted
+        """
+        pending = iter([text for text in dict.fromkeys(clean_text_for_speech(text) for text in texts) if text])
+        before = self.metrics["syntheses"]
+        errors: List[Exception] = []
+        
+        async def worker():
+            # Workers share the iterator, so each text is taken once
+            for text in pending:
+                if errors:
+                    return
+                try:
+                    await self.synthesize(text)
+                except Exception as e:
+                    errors.append(e)
+                    return
+        
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        synthesized = self.metrics["syntheses"] - before
+        self.metrics["presynthesized"] += synthesized
+        if errors:
+            logger.warning(f"Stopped pre-synthesizing speech after {synthesized} texts: {str(errors[0])}")
+        return synthesized
+    
+    async def close(self):
+        """Close the pooled Groq HTTP clients"""
+        await self.client_pool.close()
+    
+    def get_metrics(self) -> Dict:
+        """Get synthesis counters, cache counters and the rate limit state of each key"""
+        return {
+            **self.metrics,
+            "cache": self.cache.get_metrics(),
+            "single_flight": self.flights.get_metrics(),
+            "keys": self.client_pool.get_metrics(),
+        }
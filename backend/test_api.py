@@ -4,6 +4,9 @@ Test the API endpoints
 
 import requests
 import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Base URL - update this to your deployed API URL
 BASE_URL = "http://localhost:8000/api/v1"
@@ -12,12 +15,36 @@ def test_health_check():
     """Test health check endpoint"""
     response = requests.get(f"{BASE_URL.replace('/api/v1', '')}/health")
     print(f"Health Check: {response.status_code} - {response.json()}")
+    
+    response = requests.get(f"{BASE_URL.replace('/api/v1', '')}/health/llm")
+    print(f"LLM Health: {response.status_code} - {response.json().get('status')}")
 
 def test_get_courses():
     """Test get all courses endpoint"""
     response = requests.get(f"{BASE_URL}/courses")
     data = response.json()
-    print(f"Courses: {response.status_code} - Found {data.get('total', 0)} courses")
+    print(f"Courses: {response.status_code} - Found {data.get('total', 0)} courses "
+          f"({response.headers.get('Content-Encoding', 'identity')}, ETag {response.headers.get('ETag')})")
+    
+    cached = requests.get(f"{BASE_URL}/courses", headers={"If-None-Match": response.headers.get("ETag", "")})
+    print(f"Courses revalidation: {cached.status_code}")
+    assert cached.status_code == 304
+
+def test_search_courses():
+    """Test ranked, paginated course search"""
+    response = requests.get(f"{BASE_URL}/courses/search", params={"q": "computer sci", "limit": 5})
+    data = response.json()
+    print(f"Search: {response.status_code} - {data.get('total', 0)} matches, "
+          f"top result: {data['courses'][0]['name'] if data.get('courses') else 'N/A'}")
+    assert len(data.get("courses", [])) <= 5
+
+def test_filter_courses():
+    """Test boolean tag filtering with facet counts"""
+    response = requests.get(f"{BASE_URL}/courses/filter", params={"all": "engineering", "exclude": "research"})
+    data = response.json()
+    print(f"Filter: {response.status_code} - {data.get('total', 0)} matches, "
+          f"top facets: {data.get('facets', [])[:3]}")
+    assert all("research" not in [tag.lower() for tag in course["tags"]] for course in data["courses"])
 
 def test_next_question():
     """Test next question endpoint"""
@@ -35,6 +62,45 @@ def test_next_question():
     
     return data
 
+def test_quiz_tree():
+    """Test the quiz subtree endpoint and its ETag revalidation"""
+    response = requests.get(f"{BASE_URL}/quiz/tree", params={"answer": ["Engineering & Technology"]})
+    data = response.json()
+    print(f"Quiz Tree: {response.status_code} - {len(data.get('nodes', []))} nodes, "
+          f"{len(response.content)} bytes, ETag {response.headers.get('ETag')}")
+    
+    cached = requests.get(
+        f"{BASE_URL}/quiz/tree",
+        params={"answer": ["Engineering & Technology"]},
+        headers={"If-None-Match": response.headers.get("ETag", "")}
+    )
+    print(f"Quiz Tree revalidation: {cached.status_code}")
+    assert cached.status_code == 304
+
+def test_video_ranges():
+    """Test byte range requests against the intro video"""
+    response = requests.get(f"{BASE_URL}/vidmp4", headers={"Range": "bytes=0-1023"})
+    print(f"Video Range: {response.status_code} - {response.headers.get('Content-Range')}, {len(response.content)} bytes")
+    assert response.status_code == 206
+    assert len(response.content) == 1024
+    
+    total = int(response.headers["Content-Range"].split("/")[1])
+    tail = requests.get(f"{BASE_URL}/vidmp4", headers={"Range": "bytes=-100"})
+    print(f"Video Suffix Range: {tail.status_code} - {tail.headers.get('Content-Range')}")
+    assert tail.headers.get("Content-Range") == f"bytes {total - 100}-{total - 1}/{total}"
+    
+    multi = requests.get(f"{BASE_URL}/vidmp4", headers={"Range": "bytes=0-99, 2000-2099"})
+    print(f"Video Multi Range: {multi.status_code} - {multi.headers.get('Content-Type')}")
+    assert multi.headers.get("Content-Type", "").startswith("multipart/byteranges")
+    
+    stale = requests.get(f"{BASE_URL}/vidmp4", headers={"Range": "bytes=0-99", "If-Range": '"stale"'})
+    print(f"Video Stale If-Range: {stale.status_code} - {len(stale.content)} bytes")
+    assert stale.status_code == 200 and len(stale.content) == total
+    
+    unsatisfiable = requests.get(f"{BASE_URL}/vidmp4", headers={"Range": f"bytes={total}-"})
+    print(f"Video Unsatisfiable Range: {unsatisfiable.status_code}")
+    assert unsatisfiable.status_code == 416
+
 def test_recommendation():
     """Test recommendation endpoint"""
     # Sample conversation history
@@ -87,9 +153,741 @@ def test_recommendation():
         print(f"Recommended Course: {data.get('recommended_course', {}).get('name', 'N/A')}")
         print(f"Confidence Score: {data.get('confidence_score', 0)}")
         print(f"Reasoning: {data.get('reasoning', 'N/A')}")
+        print(f"Alternatives: {[course['name'] for course in data.get('alternative_courses') or []]}")
     else:
         print(f"Error: {data}")
 
+def test_chat_stream():
+    """Test the streaming chat endpoint and measure time to first token"""
+    start = time.perf_counter()
+    first_token_latency = None
+    tokens = []
+    done = None
+    
+    with requests.post(f"{BASE_URL}/chat/stream", json={"message": "What should I study for AI?"}, stream=True) as response:
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "token":
+                    if first_token_latency is None:
+                        first_token_latency = time.perf_counter() - start
+                    tokens.append(data["token"])
+                elif event in ("done", "error"):
+                    done = data
+    
+    total = time.perf_counter() - start
+    print(f"Chat Stream: {response.status_code} - {len(tokens)} tokens")
+    print(f"Time to first token: {first_token_latency * 1000:.0f} ms, total: {total * 1000:.0f} ms")
+    assert done and "".join(tokens).strip() == done["response"]
+    
+    # The finished reply must be saved to the session
+    history = requests.get(f"{BASE_URL}/chat/{done['session_id']}/history").json()
+    assert history["chat_history"][-1]["content"] == done["response"]
+
+def test_chat_cache():
+    """
+    Test that repeated and reworded first-turn messages are answered from the response cache
+    
+    Run against a server backed by fake_llm_server.py.
+    """
+    def cache_metrics():
+        return requests.get(f"{BASE_URL}/chat/metrics").json()["response_cache"]
+    
+    message = f"What is the fee for CSE in batch {int(time.time())}?"
+    before = cache_metrics()
+    first = requests.post(f"{BASE_URL}/chat", json={"message": message}).json()
+    repeated = requests.post(f"{BASE_URL}/chat", json={"message": message.upper()}).json()
+    reworded = requests.post(f"{BASE_URL}/chat", json={"message": message.replace("What is the fee", "Tell me the fee")}).json()
+    after = cache_metrics()
+    
+    print(f"Chat Cache: {after['hits'] - before['hits']} exact hits, "
+          f"{after['near_duplicate_hits'] - before['near_duplicate_hits']} near-duplicate hits, "
+          f"{after['misses'] - before['misses']} misses")
+    assert repeated["response"] == first["response"] == reworded["response"]
+    assert after["hits"] - before["hits"] == 1
+    assert after["near_duplicate_hits"] - before["near_duplicate_hits"] == 1
+
+def test_tts():
+    """
+    Test the text to speech proxy: a miss, a cached hit, revalidation and a range
+    
+    Run against a server backed by fake_llm_server.py.
+    """
+    params = {"text": f"Which stream interests you, batch {int(time.time())}?"}
+    start = time.perf_counter()
+    first = requests.get(f"{BASE_URL}/tts", params=params)
+    miss_latency = time.perf_counter() - start
+    start = time.perf_counter()
+    second = requests.get(f"{BASE_URL}/tts", params=params)
+    hit_latency = time.perf_counter() - start
+    
+    print(f"TTS: {first.status_code} {first.headers.get('Content-Type')} - "
+          f"{first.headers.get('X-Cache')} in {miss_latency * 1000:.0f} ms, "
+          f"{second.headers.get('X-Cache')} in {hit_latency * 1000:.0f} ms, {len(second.content)} bytes")
+    assert first.headers["X-Cache"] == "MISS" and second.headers["X-Cache"] == "HIT"
+    assert first.content == second.content and first.content[:4] == b"RIFF"
+    
+    revalidated = requests.get(f"{BASE_URL}/tts", params=params, headers={"If-None-Match": second.headers["ETag"]})
+    ranged = requests.get(f"{BASE_URL}/tts", params=params, headers={"Range": "bytes=0-43"})
+    print(f"TTS revalidation: {revalidated.status_code}, header range: {ranged.status_code}")
+    assert revalidated.status_code == 304
+    assert ranged.status_code == 206 and ranged.content == first.content[:44]
+    
+    unsupported = requests.get(f"{BASE_URL}/tts", params={**params, "response_format": "aiff"})
+    assert unsupported.status_code == 400
+
+def test_concurrent_chats(concurrency=100):
+    """
+    Load test the chat endpoint with many simultaneous chats
+    
+    Run against a server backed by fake_llm_server.py so no real
+    Groq quota is used. /health must stay responsive during the load.
+    """
+    def send_chat(i):
+        response = requests.post(f"{BASE_URL}/chat", json={"message": f"Load test message {i}"})
+        return response.status_code
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(send_chat, i) for i in range(concurrency)]
+        
+        health_start = time.perf_counter()
+        requests.get(f"{BASE_URL.replace('/api/v1', '')}/health")
+        health_latency = time.perf_counter() - health_start
+        
+        status_codes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    
+    ok = status_codes.count(200)
+    print(f"Concurrent Chats: {ok}/{concurrency} succeeded in {elapsed:.2f}s "
+          f"({concurrency / elapsed:.1f} chats/s)")
+    print(f"Health latency under load: {health_latency * 1000:.0f} ms")
+    assert ok == concurrency
+
+def test_next_question_load(total=1000, concurrency=50):
+    """
+    Load test the next question endpoint
+    
+    The server no longer sleeps before answering, so throughput is bound
+    by real work; pacing is returned as suggested_min_display_ms instead.
+    """
+    payload = {"conversation_history": [], "user_id": "load_test_user"}
+    
+    def send_request(_):
+        start = time.perf_counter()
+        response = requests.post(f"{BASE_URL}/next-question", json=payload)
+        return response.status_code, time.perf_counter() - start
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send_request, range(total)))
+    elapsed = time.perf_counter() - start
+    
+    latencies = sorted(latency for _, latency in results)
+    ok = sum(1 for status, _ in results if status == 200)
+    print(f"Next Question Load: {ok}/{total} succeeded, {total / elapsed:.0f} req/s, "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms")
+    assert ok == total
+
+def test_session_concurrency(count=500):
+    """
+    Fire parallel messages at one chat session and check every message is
+    stored exactly once, in the order it was sent
+    
+    Runs in-process against temporary file and SQLite stores, so it does
+    not need a running server.
+    """
+    import asyncio
+    import tempfile
+    from services.session_service import SessionManager
+    from services.session_store import FileSessionStore, SQLiteSessionStore
+    
+    async def send_messages(manager):
+        session_id = await manager.create_chat_session_async()
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            manager.add_chat_message_async(session_id, "user", f"message {i}")
+            for i in range(count)
+        ])
+        return session_id, results, time.perf_counter() - start
+    
+    async def sweep_while_locked(manager, session_id):
+        # A due sweep must wait for the request holding the session's lock
+        now = time.time() + manager.session_timeout.total_seconds() + 1
+        async with manager.session_lock(session_id):
+            sweep = asyncio.create_task(manager.sweep_expired_sessions_async(now))
+            await asyncio.sleep(0.1)
+            waited = not sweep.done() and manager.store.load(session_id) is not None
+        return waited, await sweep
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stores = {
+            "file": FileSessionStore(f"{temp_dir}/sessions"),
+            "sqlite": SQLiteSessionStore(f"{temp_dir}/sessions.db"),
+        }
+        for name, store in stores.items():
+            manager = SessionManager(store)
+            session_id, results, elapsed = asyncio.run(send_messages(manager))
+            
+            expected = [f"message {i}" for i in range(count)]
+            cached = [message["content"] for message in manager.get_chat_history(session_id)]
+            stored = [message["content"] for message in store.load(session_id)["chat_history"]]
+            
+            print(f"Session Concurrency ({name}): {results.count(True)}/{count} messages "
+                  f"in {elapsed:.2f}s, order preserved: {cached == expected and stored == expected}")
+            assert all(results)
+            assert cached == expected
+            assert stored == expected
+            
+            waited, summary = asyncio.run(sweep_while_locked(manager, session_id))
+            print(f"Session Sweep ({name}): waited for session lock: {waited}, reclaimed {summary['reclaimed']}")
+            assert waited
+            assert summary["reclaimed"] == 1
+            assert store.load(session_id) is None
+            store.close()
+
+def test_shared_session_store(messages=200):
+    """
+    Check that managers sharing a SQLite store see each other's writes
+    without reloading a session on every call, and that closing the store
+    closes every thread's connection
+    """
+    import sqlite3
+    import tempfile
+    from services.session_service import SessionManager
+    from services.session_store import SQLiteSessionStore
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Two workers, each with its own store on the same database
+        stores = [SQLiteSessionStore(f"{temp_dir}/sessions.db") for _ in range(2)]
+        first, second = [SessionManager(store) for store in stores]
+        loads = [0]
+        load = stores[1].load
+        def counting_load(session_id):
+            loads[0] += 1
+            return load(session_id)
+        stores[1].load = counting_load
+        
+        session_id = first.create_chat_session()
+        start = time.perf_counter()
+        for i in range(messages):
+            second.add_chat_message(session_id, "user", f"message {i}")
+        elapsed = time.perf_counter() - start
+        first.add_chat_message(session_id, "assistant", "reply")
+        second.add_chat_message(session_id, "user", "last")
+        
+        history = [message["content"] for message in second.get_chat_history(session_id)]
+        print(f"Shared Session Store: {messages} appends in {elapsed * 1000:.1f} ms, "
+              f"{loads[0]} loads by the appending worker, other worker's write seen: {'reply' in history}")
+        assert history == [f"message {i}" for i in range(messages)] + ["reply", "last"]
+        assert loads[0] == 2  # First use, then once after the other worker's write
+        
+        # Connections opened by worker threads are closed too
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: stores[0].get_version(session_id), range(16)))
+        connections = list(stores[0]._connections)
+        stores[0].close()
+        closed = 0
+        for conn in connections:
+            try:
+                conn.execute("SELECT 1")
+            except sqlite3.ProgrammingError:
+                closed += 1
+        print(f"Shared Session Store: closed {closed}/{len(connections)} connections")
+        assert closed == len(connections) > 1
+        stores[1].close()
+
+def test_chat_context(turns=200):
+    """
+    Simulate a long chat and check the prompt stays within the context
+    budget while older turns are folded into the running summary
+    
+    Runs in-process with extractive summaries, so it needs neither a
+    server nor a model.
+    """
+    from services.chat_context import ChatContextManager, message_tokens
+    
+    context = ChatContextManager(context_tokens=1000, summary_tokens=200)
+    system_message = {"role": "system", "content": "You are Talkify."}
+    history, summary, largest = [], None, 0
+    
+    for i in range(turns):
+        user_message = f"Turn {i}: tell me more about courses in robotics and embedded systems"
+        messages = context.build_messages(system_message, history, user_message, summary)
+        largest = max(largest, sum(message_tokens(message) for message in messages))
+        
+        history += [{"role": "user", "content": user_message},
+                    {"role": "assistant", "content": f"Reply {i}: consider mechatronics and control theory"}]
+        fold = context.fold_range(history, summary)
+        if fold:
+            summary = context.new_summary(summary, history[fold[0]:fold[1]], fold[1], None)
+    
+    metrics = context.get_metrics()
+    budget = context.context_tokens + message_tokens(system_message) + message_tokens(messages[-1]) + 20
+    print(f"Chat Context: {turns} turns, largest prompt {largest} tokens (budget {budget}), "
+          f"{metrics['summaries']} summaries, {metrics['avg_prompt_tokens_saved_per_turn']} tokens saved per turn")
+    assert largest <= budget
+    assert summary["covered"] > 0 and summary["tokens"] <= context.summary_tokens
+    assert metrics["prompt_tokens_saved"] > 0
+
+def fake_llm_client(**config):
+    """
+    Get an httpx client that calls fake_llm_server's app in-process
+    
+    The fake server's counters are reset and its settings are restored to
+    a 50 ms latency with no faults, then `config` is applied. No servers
+    are needed (GROQ_API_KEY must be set, but it is not used).
+    """
+    import httpx
+    import fake_llm_server
+    
+    for key in fake_llm_server.stats:
+        fake_llm_server.stats[key] = {} if key == "calls_by_key" else 0
+    fake_llm_server.config.update({"latency": 0.05, "rate_limited_keys": {}, "error_rate": 0.0, **config})
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_llm_server.app))
+
+def test_chat_single_flight(concurrency=50):
+    """Test that identical concurrent chats make one upstream call"""
+    import asyncio
+    import fake_llm_server
+    from services.groq_pool import GroqClientPool
+    from services.groq_service import GroqService
+    
+    service = GroqService()
+    service.client_pool = GroqClientPool(["test"], http_client=fake_llm_client(latency=0.2))
+    
+    async def send_chats():
+        return await asyncio.gather(*[
+            service.generate_chat_response([], "How do I get into robotics?")
+            for _ in range(concurrency)
+        ])
+    
+    start = time.perf_counter()
+    responses = asyncio.run(send_chats())
+    elapsed = time.perf_counter() - start
+    
+    metrics = service.chat_flights.get_metrics()
+    print(f"Single Flight: {concurrency} identical chats in {elapsed:.2f}s, "
+          f"{fake_llm_server.stats['chat_completions']} upstream call(s), {metrics['coalesced']} coalesced")
+    assert fake_llm_server.stats["chat_completions"] == 1
+    assert metrics["coalesced"] == concurrency - 1
+    assert len(set(responses)) == 1 and responses[0].startswith("Fake reply to:")
+
+def test_groq_key_pool(concurrency=30):
+    """Test failover from a rate limited key and recovery of a lone key"""
+    import asyncio
+    import fake_llm_server
+    from services.groq_pool import GroqClientPool
+    
+    pool = GroqClientPool(
+        ["limited-key", "good-key-1", "good-key-2"],
+        http_client=fake_llm_client(retry_after=30, rate_limited_keys={"limited-key": -1})
+    )
+    
+    async def send_calls():
+        # The first wave finds the rate limited key; the second should not touch it
+        waves = []
+        for wave in range(2):
+            waves.append(await asyncio.gather(*[
+                pool.create(model="fake", messages=[{"role": "user", "content": f"Question {i}"}], max_tokens=50)
+                for i in range(concurrency)
+            ]))
+            if wave == 0:
+                first_wave_calls = dict(fake_llm_server.stats["calls_by_key"])
+        return waves, first_wave_calls
+    
+    start = time.perf_counter()
+    waves, first_wave_calls = asyncio.run(send_calls())
+    elapsed = time.perf_counter() - start
+    
+    calls = fake_llm_server.stats["calls_by_key"]
+    metrics = pool.get_metrics()
+    print(f"Key Pool: {2 * concurrency} calls in {elapsed:.2f}s, calls by key {calls}, {metrics['failovers']} failovers")
+    for responses in waves:
+        assert [response.choices[0].message.content for response in responses] == [
+            f"Fake reply to: Question {i}" for i in range(concurrency)
+        ]
+    assert calls["limited-key"] == first_wave_calls["limited-key"] > 0
+    assert metrics["failovers"] == calls["limited-key"]
+    assert calls["good-key-1"] + calls["good-key-2"] == 2 * concurrency
+    assert abs(calls["good-key-1"] - calls["good-key-2"]) <= 2
+    assert metrics["keys"][0]["cooling_down_seconds"] > 0
+    assert metrics["keys"][1]["remaining_requests"] is not None
+    
+    # A single key backs off and retries after its Retry-After
+    pool = GroqClientPool(["flaky-key"], http_client=fake_llm_client(retry_after=0.2, rate_limited_keys={"flaky-key": 2}))
+    
+    start = time.perf_counter()
+    response = asyncio.run(pool.create(model="fake", messages=[{"role": "user", "content": "Hello"}]))
+    elapsed = time.perf_counter() - start
+    
+    print(f"Key Pool: single key recovered from 2 rate limits after {elapsed:.2f}s")
+    assert response.choices[0].message.content == "Fake reply to: Hello"
+    assert elapsed >= 0.4
+    assert pool.get_metrics()["keys"][0]["rate_limited"] == 2
+    
+    # A pool that would never call upstream is rejected up front
+    try:
+        GroqClientPool(["test"], max_attempts=0)
+        assert False, "max_attempts=0 was accepted"
+    except ValueError as e:
+        print(f"Key Pool: {e}")
+
+def test_circuit_breaker(failures=5, burst=20):
+    """Test that the circuit breaker opens on faults and closes on recovery"""
+    import asyncio
+    import fake_llm_server
+    from services.circuit_breaker import CircuitBreaker
+    from services.groq_pool import GroqClientPool
+    from services.groq_service import GroqService
+    
+    service = GroqService()
+    service.client_pool = GroqClientPool(["test"], max_attempts=1, http_client=fake_llm_client())
+    # Keep the key's own backoff after 500s shorter than the breaker's open time
+    service.client_pool.keys[0].BACKOFF_MAX_SECONDS = 0.2
+    service.llm_breaker = CircuitBreaker(
+        window_size=10,
+        minimum_calls=failures,
+        failure_rate_threshold=0.5,
+        slow_call_seconds=0.5,
+        slow_call_rate_threshold=0.5,
+        open_seconds=0.5,
+        half_open_probes=2
+    )
+    fallback = "I'm experiencing some technical difficulties. Please try again in a moment."
+    
+    async def chat(i):
+        return await service.generate_chat_response([], f"Breaker question {i}")
+    
+    async def run_scenario():
+        # Outage: every call fails until the breaker opens
+        fake_llm_server.config["error_rate"] = 1.0
+        for i in range(failures):
+            assert await chat(i) == fallback
+        assert service.llm_breaker.state == "open"
+        upstream_calls = fake_llm_server.stats["chat_completions"]
+        
+        # While open, chats fall back without calling the LLM
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[chat(100 + i) for i in range(burst)])
+        open_elapsed = time.perf_counter() - start
+        assert responses == [fallback] * burst
+        assert fake_llm_server.stats["chat_completions"] == upstream_calls
+        
+        # Recovery: half-open probes succeed and close the breaker
+        fake_llm_server.config["error_rate"] = 0.0
+        await asyncio.sleep(0.5)
+        assert service.llm_breaker.get_metrics()["state"] == "half_open"
+        recovered = await asyncio.gather(*[chat(200 + i) for i in range(2)])
+        assert all(response.startswith("Fake reply to:") for response in recovered)
+        assert service.llm_breaker.state == "closed"
+        
+        # Slow responses open it too
+        fake_llm_server.config["latency"] = 0.6
+        await asyncio.gather(*[chat(300 + i) for i in range(failures)])
+        slow_state = service.llm_breaker.state
+        return open_elapsed, slow_state
+    
+    open_elapsed, slow_state = asyncio.run(run_scenario())
+    
+    metrics = service.llm_breaker.get_metrics()
+    print(f"Circuit Breaker: opened after {failures} failures, {burst} chats fell back in {open_elapsed * 1000:.1f} ms "
+          f"({metrics['rejected']} rejected), closed after recovery, {slow_state} after slow calls")
+    assert open_elapsed < 0.1
+    assert slow_state == "open" and metrics["opened"] == 2
+
+def test_tts_cache(concurrency=50):
+    """Test speech pre-synthesis, single flight and LRU eviction"""
+    import asyncio
+    import tempfile
+    from pathlib import Path
+    import fake_llm_server
+    from services.audio_cache import AudioCache
+    from services.groq_service import GroqService
+    from services.tts_service import TTSService, clean_text_for_speech
+    
+    quiz_engine = GroqService().quiz_engine
+    service = TTSService(http_client=fake_llm_client(latency=0.1))
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        service.cache = AudioCache(cache_dir, 64 * 1024 * 1024)
+        texts = TTSService.quiz_texts(quiz_engine)
+        unique = len({clean_text_for_speech(text) for text in texts})
+        
+        async def run_scenario():
+            calls = fake_llm_server.stats["speech_calls"]
+            start = time.perf_counter()
+            synthesized = await service.presynthesize(texts)
+            presynthesis_elapsed = time.perf_counter() - start
+            assert synthesized == unique == fake_llm_server.stats["speech_calls"] - calls
+            
+            # The frontend cleans question text the same way, so it hits the pre-synthesized audio
+            _, cached = await service.synthesize(clean_text_for_speech(quiz_engine.root.question))
+            assert cached
+            assert await service.presynthesize(texts) == 0
+            
+            # Identical concurrent misses share one upstream call
+            calls = fake_llm_server.stats["speech_calls"]
+            results = await asyncio.gather(*[
+                service.synthesize("A brand new sentence to speak") for _ in range(concurrency)
+            ])
+            assert fake_llm_server.stats["speech_calls"] - calls == 1
+            assert len({path for path, _ in results}) == 1
+            return synthesized, presynthesis_elapsed
+        
+        synthesized, presynthesis_elapsed = asyncio.run(run_scenario())
+        metrics = service.get_metrics()
+        print(f"TTS Cache: {synthesized} quiz texts pre-synthesized in {presynthesis_elapsed:.2f}s, "
+              f"{concurrency} concurrent misses made 1 upstream call ({metrics['single_flight']['coalesced']} coalesced)")
+        
+        # LRU eviction by size, and the order survives a restart
+        cache = AudioCache(Path(cache_dir) / "lru", 2500)
+        for name in ("first", "second", "third"):
+            cache.put(name, "wav", b"x" * 1000)
+            time.sleep(0.01)  # Distinct modification times
+        assert cache.get("first", "wav") is None and cache.get("second", "wav") is not None
+        cache.put("fourth", "wav", b"x" * 1000)
+        reloaded = AudioCache(Path(cache_dir) / "lru", 2500)
+        print(f"TTS Cache eviction: {cache.metrics['evictions']} evicted, reloaded {list(reloaded.entries)}")
+        assert list(reloaded.entries) == ["second", "fourth"]
+
+def test_tts_eviction():
+    """Test that /tts survives the audio file being evicted while it is served"""
+    import asyncio
+    import os
+    import tempfile
+    import httpx
+    import fake_llm_server
+    from main import app
+    from services.audio_cache import AudioCache
+    from services.tts_service import TTSService
+    from utils import static_files
+    
+    service = TTSService(http_client=fake_llm_client())
+    synthesize, open_file = service.synthesize, static_files.StaticFile.open
+    calls = []
+    
+    async def evict_after_synthesis(*args):
+        # The first synthesis is evicted before the route opens the file
+        path, cached = await synthesize(*args)
+        calls.append(path)
+        if len(calls) == 1:
+            os.remove(path)
+        return path, cached
+    
+    def evict_after_open(path, *args):
+        # Deleted once open: the response must still stream the whole file
+        audio = open_file(path, *args)
+        os.remove(path)
+        return audio
+    
+    async def fetch(text, headers=None):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/api/v1/tts", params={"text": text}, headers=headers)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        service.cache = AudioCache(cache_dir, 64 * 1024 * 1024)
+        service.synthesize = evict_after_synthesis
+        app.state.tts_service = service
+        try:
+            response = asyncio.run(fetch("Evicted before opening"))
+            print(f"TTS Eviction before open: {response.status_code}, {len(response.content)} bytes, "
+                  f"synthesized {len(calls)} times")
+            assert response.status_code == 200 and response.content.startswith(b"RIFF")
+            assert len(calls) == 2
+            
+            static_files.StaticFile.open = evict_after_open
+            expected = fake_llm_server._fake_wav("Evicted while serving")
+            for headers in (None, {"Range": "bytes=0-99"}):
+                response = asyncio.run(fetch("Evicted while serving", headers))
+                print(f"TTS Eviction while serving: {response.status_code}, {len(response.content)} bytes")
+                assert response.status_code == (206 if headers else 200)
+                assert response.content == (expected[:100] if headers else expected)
+        finally:
+            static_files.StaticFile.open = open_file
+            app.state.tts_service = None
+
+def test_recommendation_cache():
+    """
+    Check that every quiz tree leaf has a prerendered recommendation
+    identical to the one built per request
+    
+    Runs in-process, so it does not need a running server (GROQ_API_KEY
+    must be set, but no model calls are made).
+    """
+    import asyncio
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from models.schemas import QuestionAnswer, QuestionType, RecommendationResponse
+    from services.groq_service import GroqService
+    from utils.course_data import course_manager
+    
+    service = GroqService()
+    courses = course_manager.get_all_courses()
+    similarity_index = asyncio.run(course_manager.refresh_similarity_index())
+    start = time.perf_counter()
+    rendered = service.prerender_recommendations(courses, similarity_index)
+    elapsed = time.perf_counter() - start
+    
+    checked = 0
+    for leaf in service.quiz_engine.leaves():
+        history = [
+            QuestionAnswer(question="", answer=answer, question_type=QuestionType.MULTIPLE_CHOICE)
+            for answer in leaf.path
+        ]
+        assert service.should_recommend(history)
+        
+        data = service.generate_course_recommendation(history, courses, similarity_index)
+        expected = JSONResponse(jsonable_encoder(RecommendationResponse(
+            recommended_course=data["recommended_course"],
+            confidence_score=data["confidence_score"],
+            reasoning=data["reasoning"],
+            alternative_courses=data.get("alternative_courses")
+        ))).body
+        
+        assert service.get_prerendered_recommendation(history, courses, similarity_index) == expected, leaf.path
+        checked += 1
+    
+    # Histories that go past a leaf are built per request
+    extra = [QuestionAnswer(question="", answer=answer, question_type=QuestionType.MULTIPLE_CHOICE)
+             for answer in service.quiz_engine.leaves()[0].path + ("Self-paced",)]
+    assert service.get_prerendered_recommendation(extra, courses, similarity_index) is None
+    
+    print(f"Recommendation Cache: {rendered} leaves rendered in {elapsed * 1000:.1f} ms, "
+          f"{checked} match the per-request response")
+    assert rendered == checked
+
+def test_similarity_index():
+    """
+    Check the blockwise neighbour table against a brute-force cosine top-k
+    over the shipped catalog
+    
+    Runs in-process and needs NumPy, but no server.
+    """
+    import asyncio
+    import numpy as np
+    from utils.course_data import CourseDataManager, course_manager
+    from utils.similarity_index import CourseSimilarityIndex
+    
+    courses = course_manager.get_all_courses()
+    # Small blocks so the table is built over several matrix products
+    index = CourseSimilarityIndex(max_block_elements=len(courses) * 7)
+    start = time.perf_counter()
+    index.build(courses)
+    elapsed = time.perf_counter() - start
+    
+    matrix = index._vectorize(courses).astype(np.float64)
+    similarities = matrix @ matrix.T
+    np.fill_diagonal(similarities, -1.0)
+    
+    checked = 0
+    for doc_id in range(len(courses)):
+        expected = [(int(other), similarities[doc_id, other]) for other in np.argsort(-similarities[doc_id], kind="stable")[:index.k]]
+        expected = [(other, score) for other, score in expected if score > 1e-6]
+        results = index.similar(doc_id)
+        
+        assert len(results) == len(expected), doc_id
+        for (other, score), (_, expected_score) in zip(results, expected):
+            # Ties may come back in either order, so compare scores and check each reported one
+            assert abs(score - expected_score) < 1e-5, doc_id
+            assert abs(score - similarities[doc_id, other]) < 1e-5, doc_id
+        checked += 1
+    
+    alternatives = index.similar_courses(courses[0], 3)
+    print(f"Similarity Index: {len(courses)} courses built in {elapsed * 1000:.1f} ms, "
+          f"{checked} rows match brute force, alternatives to {courses[0].name}: {[course.name for course in alternatives]}")
+    assert alternatives == [courses[other] for other, _ in index.similar(0, 3)]
+    
+    async def rebuild():
+        # The previous index is served while a changed catalog is reindexed in the background
+        manager = CourseDataManager(course_manager.data_file)
+        first = await manager.refresh_similarity_index()
+        manager.add_course(courses[0].model_copy(update={"name": "Copy of " + courses[0].name}))
+        stale = manager.get_similarity_index()
+        await manager._similarity_build
+        return manager, first, stale, manager.get_similarity_index()
+    
+    manager, first, stale, fresh = asyncio.run(rebuild())
+    print(f"Similarity Index rebuild: stale index served during rebuild: {stale is first}, "
+          f"new index covers {len(fresh)} courses")
+    assert stale is first
+    assert fresh is not first and fresh.courses is manager.courses
+
+def test_catalog_last_modified():
+    """
+    Check that adding a course moves the catalog's Last-Modified, so
+    If-Modified-Since does not answer 304 with the old catalog
+    
+    Runs in-process, so it does not need a running server.
+    """
+    from starlette.requests import Request
+    from utils.course_data import CourseDataManager, course_manager
+    
+    def get(if_modified_since):
+        headers = [(b"if-modified-since", if_modified_since.encode())] if if_modified_since else []
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+        return manager.get_catalog_body().response(request)
+    
+    manager = CourseDataManager(course_manager.data_file)
+    first = get(None)
+    assert get(first.headers["Last-Modified"]).status_code == 304
+    
+    manager.add_course(manager.courses[0].model_copy(update={"name": "Copy of " + manager.courses[0].name}))
+    changed = get(first.headers["Last-Modified"])
+    print(f"Catalog Last-Modified: {first.headers['Last-Modified']} -> {changed.headers['Last-Modified']} "
+          f"after add_course, revalidation: {changed.status_code}")
+    assert changed.status_code == 200
+    assert get(changed.headers["Last-Modified"]).status_code == 304
+
+def test_zerocopy_passthrough():
+    """
+    Check that range responses sent with the ASGI zero-copy extension get
+    through the compression middleware with their headers unchanged
+    
+    Runs in-process, so it does not need a running server.
+    """
+    import asyncio
+    import os
+    import tempfile
+    from utils.compression import CompressionMiddleware
+    from utils.static_files import RangeFileResponse
+    
+    async def serve(status_code, ranges):
+        async def app(scope, receive, send):
+            await RangeFileResponse(path, ranges, size, "text/plain", {}, status_code)(scope, receive, send)
+        
+        messages = []
+        async def send(message):
+            messages.append(message)
+        
+        scope = {
+            "type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")],
+            "extensions": {"http.response.zerocopy": {}}
+        }
+        await CompressionMiddleware(app, minimum_size=500)(scope, None, send)
+        return messages
+    
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        f.write("compressible text " * 1000)
+    path, size = f.name, os.path.getsize(f.name)
+    try:
+        for status_code, ranges in ((200, [(0, size - 1)]), (206, [(0, 99)]), (206, [(0, 99), (200, 299)])):
+            messages = asyncio.run(serve(status_code, ranges))
+            headers = dict(messages[0]["headers"])
+            zerocopy = [message for message in messages if message["type"] == "http.response.zerocopy"]
+            print(f"Zero-copy {status_code} with {len(ranges)} range(s): {len(zerocopy)} zerocopy messages, "
+                  f"Content-Encoding {headers.get(b'content-encoding', b'none').decode()}")
+            assert messages[0]["type"] == "http.response.start" and messages[0]["status"] == status_code
+            assert b"content-encoding" not in headers
+            assert [(message["offset"], message["count"]) for message in zerocopy] == [(start, end - start + 1) for start, end in ranges]
+            assert not messages[-1]["more_body"]
+    finally:
+        os.remove(path)
+
 if __name__ == "__main__":
     print("Testing Talkify Course Recommendation API")
     print("=" * 50)
@@ -101,11 +899,63 @@ if __name__ == "__main__":
         test_get_courses()
         print()
         
+        test_search_courses()
+        print()
+        
+        test_filter_courses()
+        print()
+        
         question_data = test_next_question()
         print()
         
+        test_quiz_tree()
+        print()
+        
+        test_video_ranges()
+        print()
+        
         test_recommendation()
         
+        if "--chat" in sys.argv:
+            print()
+            test_chat_stream()
+            print()
+            test_chat_cache()
+            print()
+            test_tts()
+        
+        if "--load" in sys.argv:
+            print()
+            test_concurrent_chats()
+            print()
+            test_next_question_load()
+        
+        if "--stress" in sys.argv:
+            print()
+            test_session_concurrency()
+            print()
+            test_shared_session_store()
+            print()
+            test_chat_context()
+            print()
+            test_chat_single_flight()
+            print()
+            test_groq_key_pool()
+            print()
+            test_circuit_breaker()
+            print()
+            test_tts_cache()
+            print()
+            test_tts_eviction()
+            print()
+            test_recommendation_cache()
+            print()
+            test_similarity_index()
+            print()
+            test_catalog_last_modified()
+            print()
+            test_zerocopy_passthrough()
+    
     except Exception as e:
         print(f"Error running tests: {e}")
         print("Make sure the API is running on the correct URL")
@@ -0,0 +1,69 @@
+"""
+Response compression middleware for dynamic responses
+"""
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+from utils.http_cache import accepted_encodings
+
+# Streams that must reach the client unbuffered, and media that is already compressed
+UNCOMPRESSED_CONTENT_TYPES = ("text/event-stream", "video/", "audio/", "image/")
+
+class CompressionResponder(GZipResponder):
+    """GZip responder that passes excluded and partial responses through untouched"""
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Weaken the ETag of responses that end up gzipped"""
+        async def send_weakened(message: Message) -> None:
+            if message["type"] == "http.response.start" and not self.content_encoding_set:
+                # A compressed body is a different representation, so its ETag can only be weak
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/") and headers.get("content-encoding") == "gzip":
+                    headers["ETag"] = f"W/{etag}"
+            await send(message)
+        
+        await super().__call__(scope, receive, send_weakened)
+    
+    async def send_with_gzip(self, message: Message) -> None:
+        """Mark excluded responses as already encoded so the body is passed through"""
+        if message["type"] not in ("http.response.start", "http.response.body"):
+            # GZipResponder drops any other message, such as http.response.zerocopy,
+            # whose file data cannot be compressed, so send the response as is
+            if self.initial_message and not self.started:
+                self.started = True
+                self.content_encoding_set = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+        
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if message.get("status") == 206 or content_type.startswith(UNCOMPRESSED_CONTENT_TYPES):
+                self.initial_message = message
+                self.content_encoding_set = True
+                return
+        
+        await super().send_with_gzip(message)
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Gzip responses larger than `minimum_size` when the client accepts it
+    
+    Responses that already set Content-Encoding (such as precompressed
+    catalog variants), Server-Sent Event streams, media files and range
+    responses are sent as is.
+    """
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Compress the response if the client accepts gzip"""
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            accepted = accepted_encodings(headers.get("Accept-Encoding", ""))
+            if accepted.get("gzip", accepted.get("*", 0.0)) > 0:
+                responder = CompressionResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -2,10 +2,16 @@
 Course data management utilities
 """
 
+import asyncio
 import json
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from models.schemas import Course
+from utils.http_cache import PrecompressedBody
+from utils.search_index import CourseSearchIndex
+from utils.similarity_index import CourseSimilarityIndex
+from utils.tag_index import CourseTagIndex
 
 class CourseDataManager:
     """Manages course data loading and operations"""
@@ -14,24 +20,25 @@ class CourseDataManager:
         """Initialize course data manager"""
         self.data_file = data_file
         self.courses: List[Course] = []
+        self.search_index = CourseSearchIndex()
+        self.tag_index = CourseTagIndex()
+        self._mtime = None
+        self._modified_at = None  # Last-Modified of the catalog, including in-memory additions
+        self._catalog_body: Optional[Tuple[List[Course], PrecompressedBody]] = None
+        self._similarity_index: Optional[CourseSimilarityIndex] = None
+        self._similarity_build: Optional[asyncio.Task] = None
         self.load_courses()
     
     def load_courses(self) -> List[Course]:
         """Load courses from JSON file"""
         try:
             if os.path.exists(self.data_file):
+                mtime = os.path.getmtime(self.data_file)
                 with open(self.data_file, 'r', encoding='utf-8') as f:
                     courses_data = json.load(f)
                     
-                # Convert to Course objects
-                self.courses = []
-                for course_dict in courses_data:
-                    try:
-                        course = Course(**course_dict)
-                        self.courses.append(course)
-                    except Exception as e:
-                        print(f"Error loading course {course_dict.get('name', 'Unknown')}: {e}")
-                        continue
+                self._set_courses(self._parse_courses(courses_data))
+                self._mtime = self._modified_at = mtime
                         
                 print(f"Loaded {len(self.courses)} courses")
                 return self.courses
@@ -43,51 +50,203 @@ class CourseDataManager:
             print(f"Error loading courses: {e}")
             return self._create_sample_courses()
     
+    def _set_courses(self, courses: List[Course]):
+        """Replace the catalog and rebuild the indexes derived from it"""
+        search_index = CourseSearchIndex()
+        tag_index = CourseTagIndex()
+        for doc_id, course in enumerate(courses):
+            search_index.add(doc_id, course)
+            tag_index.add(doc_id, course)
+        
+        self.courses = courses
+        self.search_index = search_index
+        self.tag_index = tag_index
+    
+    def add_course(self, course: Course):
+        """Add a course to the in-memory catalog and index it incrementally"""
+        courses = self.courses + [course]
+        self.courses = courses
+        self.search_index.add(len(courses) - 1, course)
+        self.tag_index.add(len(courses) - 1, course)
+        # Last-Modified has one-second resolution, so always move it to a later second
+        self._modified_at = max(time.time(), int(self._modified_at or 0) + 1)
+    
+    def reload_if_modified(self) -> bool:
+        """
+        Reload courses if the data file changed since it was last loaded
+        
+        The course list is replaced with a new list object, so consumers
+        holding derived data can detect the change by identity.
+        
+        Returns:
+            True if the courses were reloaded
+        """
+        try:
+            mtime = os.path.getmtime(self.data_file)
+        except OSError:
+            return False
+        
+        if mtime == self._mtime:
+            return False
+        
+        try:
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                courses_data = json.load(f)
+        except Exception as e:
+            # Keep serving the current catalog if the file is mid-write or invalid
+            print(f"Error reloading courses: {e}")
+            return False
+        
+        self._set_courses(self._parse_courses(courses_data))
+        self._mtime = self._modified_at = mtime
+        print(f"Reloaded {len(self.courses)} courses from {self.data_file}")
+        return True
+    
     def get_all_courses(self) -> List[Course]:
-        """Get all available courses"""
+        """Get all available courses, reloading them if the data file changed"""
+        self.reload_if_modified()
         return self.courses
     
+    def get_catalog_body(self) -> PrecompressedBody:
+        """
+        Get the serialized /courses response for the current catalog
+        
+        The body and its compressed variants are built once per catalog
+        version and rebuilt automatically after the data file changes.
+        """
+        courses = self.get_all_courses()
+        if self._catalog_body is None or self._catalog_body[0] is not courses:
+            body = json.dumps(
+                {"courses": [course.model_dump() for course in courses], "total": len(courses)},
+                ensure_ascii=False,
+                separators=(",", ":")
+            ).encode("utf-8")
+            self._catalog_body = (courses, PrecompressedBody(body, last_modified=self._modified_at))
+        return self._catalog_body[1]
+    
+    def get_similarity_index(self) -> Optional[CourseSimilarityIndex]:
+        """
+        Get the course similarity index, rebuilding it in the background if stale
+        
+        The neighbour table takes seconds to build for large catalogs, so
+        after the catalog changes it is rebuilt in a worker thread while the
+        previous index keeps being served.
+        
+        Returns:
+            The newest built index (which may be for an older catalog), or
+            None until the first build finishes
+        """
+        courses = self.get_all_courses()
+        index = self._similarity_index
+        if index is None or index.courses is not courses:
+            building = self._similarity_build is not None and not self._similarity_build.done()
+            if not building:
+                try:
+                    self._similarity_build = asyncio.get_running_loop().create_task(self.refresh_similarity_index())
+                except RuntimeError:
+                    pass  # No event loop to build on; refresh_similarity_index must be awaited
+        return index
+    
+    async def refresh_similarity_index(self) -> Optional[CourseSimilarityIndex]:
+        """Build the similarity index for the current catalog in a worker thread and start serving it"""
+        courses = self.get_all_courses()
+        index = CourseSimilarityIndex()
+        try:
+            await asyncio.to_thread(index.build, courses)
+        except Exception as e:
+            # Keep serving the previous index
+            print(f"Error building course similarity index: {e}")
+            return None
+        
+        # Never replace a newer index with one for an older catalog
+        if self._similarity_index is None or self._similarity_index.courses is not self.courses:
+            self._similarity_index = index
+        return index
+    
     def get_courses_by_tags(self, tags: List[str]) -> List[Course]:
         """Get courses filtered by tags"""
         if not tags:
             return self.courses
         
-        filtered_courses = []
-        for course in self.courses:
-            if course.tags:
-                course_tags = [tag.lower() for tag in course.tags]
-                search_tags = [tag.lower() for tag in tags]
-                
-                # Check if any search tag matches any course tag
-                if any(search_tag in course_tags for search_tag in search_tags):
-                    filtered_courses.append(course)
+        # Courses matching any of the tags
+        courses = self.courses
+        bitmap = self.tag_index.query(any_tags=tags)
+        return [courses[doc_id] for doc_id in self.tag_index.doc_ids(bitmap)]
+    
+    def filter_courses(
+        self, 
+        all_tags: List[str] = None, 
+        any_tags: List[str] = None, 
+        exclude_tags: List[str] = None, 
+        limit: Optional[int] = None, 
+        offset: int = 0, 
+        facet_limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Filter courses with a boolean tag query and count tags in the result
+        
+        Args:
+            all_tags: Courses must have all of these tags
+            any_tags: Courses must have at least one of these tags
+            exclude_tags: Courses must have none of these tags
+            limit: Maximum number of courses to return (all if None)
+            offset: Number of matching courses to skip
+            facet_limit: Maximum number of tag facets to return (all if None)
+            
+        Returns:
+            Dictionary with the page of courses, total matches and tag facets
+        """
+        self.reload_if_modified()
+        
+        courses = self.courses
+        tag_index = self.tag_index
+        bitmap = tag_index.query(all_tags or [], any_tags or [], exclude_tags or [])
         
-        return filtered_courses
+        return {
+            "courses": [courses[doc_id] for doc_id in tag_index.doc_ids(bitmap, limit=limit, offset=offset)],
+            "total": bitmap.bit_count(),
+            "facets": [
+                {"tag": tag, "count": count}
+                for tag, count in tag_index.facets(bitmap, limit=facet_limit)
+            ]
+        }
     
-    def search_courses(self, query: str) -> List[Course]:
-        """Search courses by name, description, or tags"""
-        query = query.lower()
-        matching_courses = []
-        
-        for course in self.courses:
-            # Search in name
-            if query in course.name.lower():
-                matching_courses.append(course)
-                continue
+    def search_courses(
+        self, 
+        query: str, 
+        limit: Optional[int] = None, 
+        offset: int = 0
+    ) -> Tuple[List[Course], int]:
+        """
+        Search courses by name, description, or tags, ranked by relevance
+        
+        Args:
+            query: Search query; the last word also matches as a prefix
+            limit: Maximum number of courses to return (all if None)
+            offset: Number of ranked results to skip
             
-            # Search in description
-            if course.description and query in course.description.lower():
-                matching_courses.append(course)
+        Returns:
+            Tuple of (matching courses for the requested page, total matches)
+        """
+        self.reload_if_modified()
+        
+        ranked, total = self.search_index.search(query, limit=limit, offset=offset)
+        courses = self.courses
+        
+        return [courses[doc_id] for doc_id, _ in ranked], total
+    
+    def _parse_courses(self, courses_data: List[Dict[str, Any]]) -> List[Course]:
+        """Convert raw course dictionaries to Course objects, skipping invalid entries"""
+        courses = []
+        for course_dict in courses_data:
+            try:
+                course = Course(**course_dict)
+                courses.append(course)
+            except Exception as e:
+                print(f"Error loading course {course_dict.get('name', 'Unknown')}: {e}")
                 continue
-            
-            # Search in tags
-            if course.tags:
-                for tag in course.tags:
-                    if query in tag.lower():
-                        matching_courses.append(course)
-                        break
-        
-        return matching_courses
+        
+        return courses
     
     def _create_sample_courses(self) -> List[Course]:
         """Create sample course data if file doesn't exist"""
@@ -194,7 +353,7 @@ class CourseDataManager:
                 print(f"Error creating sample course: {e}")
                 continue
         
-        self.courses = courses
+        self._set_courses(courses)
         
         # Save sample data to file
         self._save_courses_to_file()
@@ -212,6 +371,8 @@ class CourseDataManager:
             
             with open(self.data_file, 'w', encoding='utf-8') as f:
                 json.dump(courses_data, f, indent=2, ensure_ascii=False)
+            
+            self._mtime = self._modified_at = os.path.getmtime(self.data_file)
                 
             print(f"Saved {len(self.courses)} courses to {self.data_file}")
             
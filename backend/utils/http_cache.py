@@ -0,0 +1,130 @@
+"""
+Conditional request and precompressed response helpers
+"""
+
+import gzip
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # Optional, brotli variants are skipped without it
+    brotli = None
+
+def etag_matches(request: Request, *etags: str) -> bool:
+    """Check if the request's If-None-Match header matches any of the ETags"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag.removeprefix("W/") in candidates for etag in etags)
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: quality}"""
+    encodings = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[coding.strip().lower()] = quality
+    return encodings
+
+class PrecompressedBody:
+    """
+    A response body serialized once, with precompressed variants
+    
+    Holds identity, gzip and (if the brotli package is installed) br
+    encodings of the same body. Each encoding gets its own strong ETag
+    derived from the content hash. `response` picks the best encoding
+    the client accepts and answers conditional requests with 304.
+    """
+    
+    # Preference order when the client accepts several encodings equally
+    ENCODINGS = ("br", "gzip", "identity")
+    
+    def __init__(
+        self,
+        body: bytes,
+        media_type: str = "application/json",
+        last_modified: Optional[float] = None,
+        cache_control: str = "public, no-cache"
+    ):
+        """Compress the body and compute its validators"""
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.last_modified = int(last_modified) if last_modified else None
+        
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants: Dict[str, bytes] = {"identity": body}
+        self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+        
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in self.variants
+        }
+    
+    def select_encoding(self, accept_encoding: str) -> str:
+        """Pick the smallest variant the client accepts"""
+        accepted = accepted_encodings(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_quality = "identity", 0.0
+        for encoding in self.ENCODINGS:
+            if encoding not in self.variants or encoding == "identity":
+                continue
+            quality = accepted.get(encoding, wildcard)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+    
+    def _not_modified_since(self, request: Request) -> bool:
+        """Check If-Modified-Since, which only applies without If-None-Match"""
+        if self.last_modified is None or "if-none-match" in request.headers:
+            return False
+        if_modified_since = request.headers.get("if-modified-since")
+        if not if_modified_since:
+            return False
+        try:
+            return self.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    
+    def response(self, request: Request) -> Response:
+        """
+        Build the response for a request
+        
+        Args:
+            request: Incoming request (Accept-Encoding and conditional headers are read)
+        
+        Returns:
+            304 if the client's copy is current, otherwise the best encoded variant
+        """
+        encoding = self.select_encoding(request.headers.get("accept-encoding", ""))
+        headers = {
+            "ETag": self.etags[encoding],
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if self.last_modified is not None:
+            headers["Last-Modified"] = formatdate(self.last_modified, usegmt=True)
+        
+        # Any variant's ETag identifies the same content
+        if etag_matches(request, *self.etags.values()) or self._not_modified_since(request):
+            return Response(status_code=304, headers=headers)
+        
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type=self.media_type, headers=headers)
@@ -0,0 +1,169 @@
+"""
+Inverted index with BM25 ranking for course search
+"""
+
+import bisect
+import heapq
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+from models.schemas import Course
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens"""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+class CourseSearchIndex:
+    """
+    Tokenized inverted index over course name, tags and description
+    
+    Each field's term frequencies are weighted by a field boost before
+    BM25 scoring (BM25F style), so matches in the name or tags rank above
+    matches in the description. The last query token also matches as a
+    prefix for type-ahead search. Documents can be added and removed
+    incrementally.
+    """
+    
+    FIELD_BOOSTS = {
+        "name": 3.0,
+        "tags": 2.0,
+        "description": 1.0,
+    }
+    
+    # Upper bound on terms a single prefix can expand to
+    MAX_PREFIX_EXPANSIONS = 50
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """Initialize an empty index"""
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_lengths: Dict[int, float] = {}
+        self.doc_terms: Dict[int, List[str]] = {}
+        self.total_length = 0.0
+        self.terms: List[str] = []  # Sorted vocabulary for prefix lookups
+    
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+    
+    def add(self, doc_id: int, course: Course):
+        """Index a course under the given document ID"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        
+        fields = {
+            "name": tokenize(course.name),
+            "tags": tokenize(" ".join(course.tags or [])),
+            "description": tokenize(course.description or ""),
+        }
+        
+        weighted_tf: Dict[str, float] = {}
+        doc_length = 0.0
+        for field, tokens in fields.items():
+            boost = self.FIELD_BOOSTS[field]
+            doc_length += boost * len(tokens)
+            for token in tokens:
+                weighted_tf[token] = weighted_tf.get(token, 0.0) + boost
+        
+        for term, tf in weighted_tf.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                bisect.insort(self.terms, term)
+            posting[doc_id] = tf
+        
+        self.doc_lengths[doc_id] = doc_length
+        self.doc_terms[doc_id] = list(weighted_tf)
+        self.total_length += doc_length
+    
+    def remove(self, doc_id: int):
+        """Remove a document from the index"""
+        doc_length = self.doc_lengths.pop(doc_id, None)
+        if doc_length is None:
+            return
+        
+        self.total_length -= doc_length
+        for term in self.doc_terms.pop(doc_id):
+            posting = self.postings[term]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+    
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Get indexed terms starting with the prefix"""
+        start = bisect.bisect_left(self.terms, prefix)
+        expansions = []
+        for term in self.terms[start:start + self.MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expansions.append(term)
+        return expansions
+    
+    def _score_term(self, term: str, scores: Dict[int, float], avg_length: float, weight: float = 1.0):
+        """Add the BM25 contribution of a term to the document scores"""
+        posting = self.postings.get(term)
+        if not posting:
+            return
+        
+        doc_count = len(self.doc_lengths)
+        idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+        
+        for doc_id, tf in posting.items():
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight * idf * tf * (self.k1 + 1) / (tf + norm)
+    
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        prefix: bool = True
+    ) -> Tuple[List[Tuple[int, float]], int]:
+        """
+        Search the index
+        
+        Args:
+            query: Free-text query
+            limit: Maximum number of results to return (all if None)
+            offset: Number of top results to skip
+            prefix: Match the last query token as a prefix
+        
+        Returns:
+            Tuple of ([(doc_id, score), ...] for the requested page, total matches)
+        """
+        tokens = tokenize(query)
+        if not tokens or not self.doc_lengths:
+            return [], 0
+        
+        avg_length = self.total_length / len(self.doc_lengths) or 1.0
+        scores: Dict[int, float] = {}
+        
+        for token in tokens[:-1]:
+            self._score_term(token, scores, avg_length)
+        
+        last = tokens[-1]
+        if prefix:
+            # Score the best matching expansion per document, exact term included
+            prefix_scores: Dict[int, float] = {}
+            for term in self._expand_prefix(last):
+                term_scores: Dict[int, float] = {}
+                # Exact matches rank slightly above completions
+                self._score_term(term, term_scores, avg_length, 1.0 if term == last else 0.9)
+                for doc_id, score in term_scores.items():
+                    if score > prefix_scores.get(doc_id, 0.0):
+                        prefix_scores[doc_id] = score
+            for doc_id, score in prefix_scores.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        else:
+            self._score_term(last, scores, avg_length)
+        
+        total = len(scores)
+        if limit is None:
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            return ranked[offset:], total
+        
+        ranked = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[offset:], total
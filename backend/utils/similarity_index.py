@@ -0,0 +1,175 @@
+"""
+Precomputed course-to-course similarity over TF-IDF vectors
+"""
+
+import math
+import zlib
+from typing import Dict, List, Optional, Tuple
+from models.schemas import Course
+from utils.search_index import CourseSearchIndex, tokenize
+
+try:
+    import numpy as np
+except ImportError:  # Optional, alternative courses are skipped without it
+    np = None
+
+class CourseSimilarityIndex:
+    """
+    Table of the k most similar courses for every course in the catalog
+    
+    Courses are TF-IDF vectors over name, tags and description, with the
+    same field boosts as search. While the catalog vocabulary has at most
+    `max_vocabulary` terms each term gets its own column; larger
+    vocabularies are hashed into `hashed_features` columns, which bounds
+    both the matrix size and the cost of the product. Cosine similarities are computed a block of
+    rows at a time as a matrix product and only the top k of each row are
+    kept, so the n x n similarity matrix is never held in memory.
+    """
+    
+    def __init__(
+        self,
+        k: int = 10,
+        max_vocabulary: int = 1024,
+        hashed_features: int = 256,
+        max_block_elements: int = 1 << 23
+    ):
+        """Initialize an empty index"""
+        self.k = k
+        self.max_vocabulary = max_vocabulary
+        self.hashed_features = hashed_features
+        self.max_block_elements = max_block_elements
+        self.courses: List[Course] = []  # Catalog the table was built for
+        self.doc_ids: Dict[str, int] = {}  # Lowercase course name -> first document ID
+        self.neighbours = None  # (n, k) document IDs, -1 where there are fewer than k similar courses
+        self.scores = None  # (n, k) cosine similarities
+    
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+    
+    def _vectorize(self, courses: List[Course]):
+        """Build the L2-normalized TF-IDF matrix, one row per course"""
+        rows: List[int] = []
+        terms: List[str] = []
+        frequencies: List[float] = []
+        document_frequency: Dict[str, int] = {}
+        
+        for doc_id, course in enumerate(courses):
+            fields = {
+                "name": tokenize(course.name),
+                "tags": tokenize(" ".join(course.tags or [])),
+                "description": tokenize(course.description or ""),
+            }
+            weighted_tf: Dict[str, float] = {}
+            for field, tokens in fields.items():
+                boost = CourseSearchIndex.FIELD_BOOSTS[field]
+                for token in tokens:
+                    weighted_tf[token] = weighted_tf.get(token, 0.0) + boost
+            
+            for term, tf in weighted_tf.items():
+                rows.append(doc_id)
+                terms.append(term)
+                frequencies.append(tf)
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        
+        if len(document_frequency) <= self.max_vocabulary:
+            columns = {term: column for column, term in enumerate(document_frequency)}
+            width = max(len(document_frequency), 1)
+        else:
+            # crc32 rather than hash() so the columns are stable across processes
+            columns = {term: zlib.crc32(term.encode("utf-8")) % self.hashed_features for term in document_frequency}
+            width = self.hashed_features
+        
+        count = len(courses)
+        idf = {term: math.log((1 + count) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        values = (1 + np.log(np.array(frequencies, dtype=np.float32))) * np.array(
+            [idf[term] for term in terms], dtype=np.float32
+        )
+        
+        matrix = np.zeros((count, width), dtype=np.float32)
+        # add.at so hashed terms sharing a column accumulate
+        np.add.at(matrix, (np.array(rows, dtype=np.intp), np.array([columns[term] for term in terms], dtype=np.intp)), values)
+        
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+    
+    def build(self, courses: List[Course]):
+        """
+        Compute the neighbour table for a catalog
+        
+        Args:
+            courses: Course catalog; document IDs are list positions
+        """
+        self.courses = courses
+        self.doc_ids = {}
+        for doc_id, course in enumerate(courses):
+            self.doc_ids.setdefault(course.name.lower(), doc_id)
+        
+        count = len(courses)
+        k = min(self.k, count - 1)
+        if np is None or k <= 0:
+            self.neighbours = self.scores = None
+            return
+        
+        matrix = self._vectorize(courses)
+        neighbours = np.full((count, k), -1, dtype=np.int32)
+        scores = np.zeros((count, k), dtype=np.float32)
+        block_size = max(1, self.max_block_elements // count)
+        
+        for start in range(0, count, block_size):
+            stop = min(start + block_size, count)
+            similarities = matrix[start:stop] @ matrix.T
+            similarities[np.arange(stop - start), np.arange(start, stop)] = -1.0  # A course is not its own alternative
+            
+            top = np.argpartition(similarities, count - k, axis=1)[:, count - k:]
+            top_scores = np.take_along_axis(similarities, top, axis=1)
+            # Best first, ties broken by document ID
+            order = np.lexsort((top, -top_scores), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            
+            top[top_scores <= 0] = -1
+            neighbours[start:stop] = top
+            scores[start:stop] = top_scores
+        
+        self.neighbours = neighbours
+        self.scores = scores
+    
+    def similar(self, doc_id: int, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Get the most similar courses to a course
+        
+        Args:
+            doc_id: Document ID of the course
+            limit: Maximum number of courses to return (up to k)
+        
+        Returns:
+            [(doc_id, cosine similarity), ...], most similar first
+        """
+        if self.neighbours is None or not 0 <= doc_id < len(self.neighbours):
+            return []
+        
+        results = []
+        for neighbour, score in zip(self.neighbours[doc_id][:limit], self.scores[doc_id][:limit]):
+            if neighbour < 0:
+                break
+            results.append((int(neighbour), float(score)))
+        return results
+    
+    def similar_courses(self, course: Course, limit: Optional[int] = None) -> List[Course]:
+        """
+        Get the courses of the indexed catalog most similar to a course
+        
+        Args:
+            course: Course to find alternatives for (matched by name)
+            limit: Maximum number of courses to return (up to k)
+        
+        Returns:
+            Similar courses, most similar first; empty if the course is not
+            in the indexed catalog or NumPy is not installed
+        """
+        doc_id = self.doc_ids.get(course.name.lower())
+        if doc_id is None:
+            return []
+        return [self.courses[neighbour] for neighbour, _ in self.similar(doc_id, limit)]
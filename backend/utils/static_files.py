@@ -0,0 +1,274 @@
+"""
+Static file responses with HTTP Range support
+"""
+
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import anyio
+from fastapi import Request, Response
+from starlette.types import Receive, Scope, Send
+from utils.http_cache import etag_matches
+
+# Requests asking for more ranges than this (after merging) get the whole file
+MAX_RANGES = 16
+
+def parse_range_header(range_header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header into sorted, merged (start, end) byte ranges
+    
+    Args:
+        range_header: Value of the Range header
+        size: Size of the file in bytes
+    
+    Returns:
+        Inclusive (start, end) ranges; an empty list if none can be
+        satisfied; None if the header is not a valid bytes range and
+        should be ignored
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    
+    ranges = []
+    for part in spec.split(","):
+        first, dash, last = part.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if not first:
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length == 0:
+                    continue
+                ranges.append((max(size - length, 0), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if end is not None and start > end:
+            return None
+        if start >= size:
+            continue  # Unsatisfiable, but others may be fine
+        ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+    
+    # Merge overlapping and adjacent ranges
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class RangeFileResponse(Response):
+    """
+    Streams byte ranges of a file
+    
+    Uses the ASGI zero-copy send extension when the server offers it, and
+    otherwise reads the ranges with os.pread in a worker thread. Reads
+    from `fd` instead of opening `path` when given one, and closes it
+    once the response is sent.
+    """
+    
+    chunk_size = 256 * 1024
+    
+    def __init__(
+        self,
+        path: str,
+        ranges: List[Tuple[int, int]],
+        size: int,
+        media_type: str,
+        headers: Dict[str, str],
+        status_code: int = 200,
+        fd: Optional[int] = None
+    ):
+        """Prepare headers, including the multipart framing for several ranges"""
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.fd = fd
+        self.ranges = ranges
+        self.parts: List[Tuple[bytes, int, int]] = []  # (preamble, start, end)
+        self.epilogue = b""
+        
+        if status_code == 206 and len(ranges) > 1:
+            boundary = secrets.token_hex(16)
+            for start, end in ranges:
+                preamble = (
+                    f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                self.parts.append((preamble, start, end))
+            self.epilogue = f"--{boundary}--\r\n".encode("latin-1")
+            content_type = f"multipart/byteranges; boundary={boundary}"
+            content_length = sum(len(preamble) + end - start + 1 + 2 for preamble, start, end in self.parts)
+            content_length += len(self.epilogue)
+        else:
+            start, end = ranges[0]
+            self.parts.append((b"", start, end))
+            content_type = media_type
+            content_length = end - start + 1
+            if status_code == 206:
+                self.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        
+        self.headers["Content-Type"] = content_type
+        self.headers["Content-Length"] = str(content_length)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Send the headers and stream each range"""
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        
+        zerocopy = "http.response.zerocopy" in scope.get("extensions", {})
+        fd = self.fd
+        if fd is None:
+            fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY)
+        try:
+            for preamble, start, end in self.parts:
+                if preamble:
+                    await send({"type": "http.response.body", "body": preamble, "more_body": True})
+                
+                if zerocopy:
+                    await send({
+                        "type": "http.response.zerocopy",
+                        "file": fd,
+                        "offset": start,
+                        "count": end - start + 1,
+                        "more_body": True
+                    })
+                else:
+                    offset = start
+                    while offset <= end:
+                        chunk = await anyio.to_thread.run_sync(
+                            os.pread, fd, min(self.chunk_size, end - offset + 1), offset
+                        )
+                        if not chunk:
+                            break
+                        offset += len(chunk)
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                
+                if self.epilogue:
+                    await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+            
+            await send({"type": "http.response.body", "body": self.epilogue, "more_body": False})
+        finally:
+            os.close(fd)
+
+class StaticFile:
+    """
+    A file resolved once at startup and served with Range support
+    
+    Answers If-None-Match with 304, serves single ranges as 206 with
+    Content-Range and several ranges as multipart/byteranges, and honours
+    If-Range so a client resuming a stale copy gets the whole new file.
+    
+    A file that may be deleted while it is served (such as a cache entry)
+    should be opened with `StaticFile.open`. The open descriptor is then
+    stat'ed and streamed, so the response is unaffected by the deletion.
+    Such an instance serves a single response.
+    """
+    
+    def __init__(
+        self,
+        path: Path,
+        media_type: str,
+        cache_control: str = "public, max-age=3600",
+        fd: Optional[int] = None
+    ):
+        """Stat the file (or the open descriptor) and compute its validators"""
+        stat = os.fstat(fd) if fd is not None else path.stat()
+        self.fd = fd
+        self.path = str(path)
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.size = stat.st_size
+        self.last_modified = int(stat.st_mtime)
+        self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    
+    @classmethod
+    def resolve(cls, candidates: Sequence[Path], media_type: str) -> Optional["StaticFile"]:
+        """Get the first existing file among the candidates, or None"""
+        for path in candidates:
+            if path.is_file():
+                return cls(path, media_type)
+        return None
+    
+    @classmethod
+    def open(cls, path: Path, media_type: str, cache_control: str = "public, max-age=3600") -> "StaticFile":
+        """
+        Open a file for a single response
+        
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return cls(path, media_type, cache_control, fd)
+        except BaseException:
+            os.close(fd)
+            raise
+    
+    def _take_fd(self) -> Optional[int]:
+        """Hand the open descriptor, if any, to the response being built"""
+        fd, self.fd = self.fd, None
+        return fd
+    
+    def _close_fd(self):
+        """Close the open descriptor of a response that sends no body"""
+        fd = self._take_fd()
+        if fd is not None:
+            os.close(fd)
+    
+    def _if_range_matches(self, if_range: str) -> bool:
+        """Check an If-Range validator, which requires a strong match"""
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            return if_range == self.etag
+        if if_range.startswith("W/"):
+            return False
+        try:
+            return int(parsedate_to_datetime(if_range).timestamp()) == self.last_modified
+        except (TypeError, ValueError):
+            return False
+    
+    def response(self, request: Request) -> Response:
+        """
+        Build the response for a request
+        
+        Args:
+            request: Incoming request (Range, If-Range and If-None-Match are read)
+        
+        Returns:
+            304, 416, 206 or the whole file
+        """
+        headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": self.cache_control,
+        }
+        
+        if etag_matches(request, self.etag):
+            self._close_fd()
+            return Response(status_code=304, headers=headers)
+        
+        ranges = None
+        range_header = request.headers.get("range")
+        if range_header and self.size:
+            if_range = request.headers.get("if-range")
+            if if_range is None or self._if_range_matches(if_range):
+                ranges = parse_range_header(range_header, self.size)
+        
+        if ranges == []:
+            headers["Content-Range"] = f"bytes */{self.size}"
+            self._close_fd()
+            return Response(status_code=416, headers=headers)
+        
+        if ranges and len(ranges) <= MAX_RANGES:
+            return RangeFileResponse(
+                self.path, ranges, self.size, self.media_type, headers, status_code=206, fd=self._take_fd()
+            )
+        
+        return RangeFileResponse(self.path, [(0, self.size - 1)], self.size, self.media_type, headers, fd=self._take_fd())
@@ -0,0 +1,133 @@
+"""
+Tag bitmap index for boolean course filtering and facet counts
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.schemas import Course
+
+class CourseTagIndex:
+    """
+    Maps each lowercased tag to a bitmap of course document IDs
+    
+    Bitmaps are Python integers with bit N set when document N has the
+    tag, so AND/OR/NOT queries are single big-integer operations and facet
+    counts are popcounts.
+    """
+    
+    def __init__(self):
+        """Initialize an empty index"""
+        self.bitmaps: Dict[str, int] = {}
+        self.labels: Dict[str, str] = {}  # Lowercased tag -> first seen spelling
+        self.doc_tags: Dict[int, List[str]] = {}
+        self.all_docs = 0
+    
+    def add(self, doc_id: int, course: Course):
+        """Index the tags of a course under the given document ID"""
+        if doc_id in self.doc_tags:
+            self.remove(doc_id)
+        
+        bit = 1 << doc_id
+        keys = []
+        for tag in course.tags or []:
+            key = tag.strip().lower()
+            if not key or key in keys:
+                continue
+            keys.append(key)
+            self.bitmaps[key] = self.bitmaps.get(key, 0) | bit
+            self.labels.setdefault(key, tag.strip())
+        
+        self.doc_tags[doc_id] = keys
+        self.all_docs |= bit
+    
+    def remove(self, doc_id: int):
+        """Remove a document from the index"""
+        keys = self.doc_tags.pop(doc_id, None)
+        if keys is None:
+            return
+        
+        mask = ~(1 << doc_id)
+        self.all_docs &= mask
+        for key in keys:
+            bitmap = self.bitmaps[key] & mask
+            if bitmap:
+                self.bitmaps[key] = bitmap
+            else:
+                del self.bitmaps[key]
+                del self.labels[key]
+    
+    def query(
+        self,
+        all_tags: Iterable[str] = (),
+        any_tags: Iterable[str] = (),
+        exclude_tags: Iterable[str] = ()
+    ) -> int:
+        """
+        Build the bitmap of documents matching a boolean tag query
+        
+        Args:
+            all_tags: Documents must have every one of these tags (AND)
+            any_tags: Documents must have at least one of these tags (OR)
+            exclude_tags: Documents must have none of these tags (NOT)
+        
+        Returns:
+            Bitmap of matching document IDs
+        """
+        result = self.all_docs
+        
+        for tag in all_tags:
+            result &= self.bitmaps.get(tag.strip().lower(), 0)
+        
+        any_tags = list(any_tags)
+        if any_tags:
+            union = 0
+            for tag in any_tags:
+                union |= self.bitmaps.get(tag.strip().lower(), 0)
+            result &= union
+        
+        for tag in exclude_tags:
+            result &= ~self.bitmaps.get(tag.strip().lower(), 0)
+        
+        return result
+    
+    def doc_ids(self, bitmap: int, limit: Optional[int] = None, offset: int = 0) -> List[int]:
+        """
+        Get the document IDs set in a bitmap, in ascending order
+        
+        Args:
+            bitmap: Bitmap of document IDs
+            limit: Maximum number of IDs to return (all if None)
+            offset: Number of set IDs to skip
+        """
+        bits = bin(bitmap)[:1:-1]  # Least significant bit first
+        doc_ids = []
+        position = bits.find("1")
+        skipped = 0
+        
+        while position != -1 and (limit is None or len(doc_ids) < limit):
+            if skipped < offset:
+                skipped += 1
+            else:
+                doc_ids.append(position)
+            position = bits.find("1", position + 1)
+        
+        return doc_ids
+    
+    def facets(self, bitmap: int, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Count matching documents per tag
+        
+        Args:
+            bitmap: Bitmap of documents to count within
+            limit: Maximum number of tags to return (all if None)
+        
+        Returns:
+            List of (tag label, count) for tags with matches, most common first
+        """
+        counts = []
+        for key, tag_bitmap in self.bitmaps.items():
+            count = (bitmap & tag_bitmap).bit_count()
+            if count:
+                counts.append((self.labels[key], count))
+        
+        counts.sort(key=lambda item: (-item[1], item[0].lower()))
+        return counts if limit is None else counts[:limit]
@@ -110,6 +110,7 @@ class TalkifyAPI {
       for (const baseURL of urls) {
         try {
           console.log(`🔗 Trying request to: ${baseURL}/next-question`);
+          const requestStart = Date.now();
           const response = await fetch(`${baseURL}/next-question`, {
             method: 'POST',
             headers: {
@@ -139,6 +140,12 @@ class TalkifyAPI {
             // Update current step
             this.currentStep = data.question_number;
 
+            // The server answers immediately and suggests how long to show the loader
+            const remainingDisplayMs = (data.suggested_min_display_ms || 0) - (Date.now() - requestStart);
+            if (remainingDisplayMs > 0) {
+              await new Promise(resolve => setTimeout(resolve, remainingDisplayMs));
+            }
+
             return {
               question: data.question,
               questionNumber: data.question_number,
@@ -219,6 +219,26 @@ class TextToSpeechService {
     }
   }
 
+  /**
+   * Fetch speech from the backend's cached TTS proxy
+   * @param {string} cleanText - The cleaned text to speak
+   * @returns {Promise<Response|null>} - Audio response, or null if the proxy is unavailable
+   */
+  async fetchProxySpeech(cleanText) {
+    try {
+      const params = new URLSearchParams({
+        text: cleanText,
+        model: this.selectedModel,
+        voice: this.selectedVoice,
+        response_format: 'wav'
+      });
+      return await this.makeRequestWithFallback(`/api/v1/tts?${params}`);
+    } catch (error) {
+      console.warn('⚠️ TTS proxy unavailable, synthesizing in the browser:', error.message);
+      return null;
+    }
+  }
+
   /**
    * Try to generate speech with fallback for rate limiting
    * @param {string} cleanText - The cleaned text to speak
@@ -226,6 +246,12 @@ class TextToSpeechService {
    * @returns {Promise<Response|null>} - Speech response or null if all failed
    */
   async speakWithFallback(cleanText, options) {
+    // Quiz questions are pre-synthesized and repeated texts are cached by the backend
+    const proxyResponse = await this.fetchProxySpeech(cleanText);
+    if (proxyResponse) {
+      return proxyResponse;
+    }
+
     try {
       // Try with current model first
       console.log(`🎤 Trying TTS with model: ${this.selectedModel}, voice: ${this.selectedVoice}`);